@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# name:     benchmarks/compare.py
+# desc:     Diff benchmark results against a stored baseline, flag regressions
+#
+# usage:    python -m benchmarks.compare baseline.json bench_results.json --threshold 10
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold, min_seconds=0.001):
+    """ Takes two results documents, returns a list of row dicts
+        A case regresses when its best time grew by more than threshold percent,
+        and by more than min_seconds so timer noise on tiny cases is ignored.
+    """
+    rows = []
+    for size, results in sorted(current["results"].items(), key=lambda item: int(item[0])):
+        for name, result in sorted(results.items()):
+            base = baseline["results"].get(size, {}).get(name)
+            row  = {"size": size, "case": name, "best": result["best"], "baseline": None,
+                    "change": None, "status": "new"}
+            if base is not None:
+                row["baseline"] = base["best"]
+                row["change"]   = (result["best"] - base["best"]) / base["best"] * 100 if base["best"] else 0.0
+                slower          = result["best"] - base["best"] > min_seconds
+                row["status"]   = "REGRESSION" if row["change"] > threshold and slower else "ok"
+            rows.append(row)
+    return rows
+
+
+def format_rows(rows):
+    """ Returns the rows as a text table """
+    lines = ["{:>9} {:<30} {:>12} {:>12} {:>9}  {}".format("size", "case", "baseline", "current", "change", "")]
+    for row in rows:
+        baseline    = "-" if row["baseline"] is None else "{:.6f}".format(row["baseline"])
+        change      = "-" if row["change"] is None else "{:+.1f}%".format(row["change"])
+        lines.append("{:>9} {:<30} {:>12} {:>12.6f} {:>9}  {}".format(
+            row["size"], row["case"], baseline, row["best"], change, row["status"]))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare benchmark results to a baseline")
+    parser.add_argument("baseline", help="stored baseline JSON")
+    parser.add_argument("current", help="new results JSON")
+    parser.add_argument("--threshold", help="percent slowdown that counts as a regression", type=float, default=10.0)
+    parser.add_argument("--min-seconds", help="ignore slowdowns smaller than this", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold, args.min_seconds)
+    print(format_rows(rows))
+    regressions = [row for row in rows if row["status"] == "REGRESSION"]
+    if regressions:
+        print("{} regression(s) above {}%".format(len(regressions), args.threshold))
+        sys.exit(1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# name:     benchmarks/generate.py
+# desc:     Write seeded, realistic jobs.txt/pocs.txt files for benchmarking
+
+import argparse
+from datetime import date, timedelta
+import os
+import random
+
+TITLES      = ["Python Developer", "Senior Automation Engineer", "Linux Server Admin", "Team Lead",
+               "DevOps Engineer", "Data Engineer", "Site Reliability Engineer", "Junior Developer",
+               "Backend Engineer", "Cloud Architect", "QA Engineer", "Full Stack Developer"]
+SKILLS      = ["python", "linux", "ansible", "docker", "kubernetes", "aws", "terraform", "bash",
+               "postgres", "redis", "javascript", "go", "rust", "java", "excel", "powershell"]
+COMPANIES   = ["Helical", "Redbull", "Blackrock", "JustInTime", "Run Fast", "United Music Federation",
+               "Happy Cow Dev Ltd", "DolphinExperience", "Company number 7", "Just Drink It",
+               "Some Great Place, LLC", "Whocares, Inc"]
+FIRST_NAMES = ["Frank", "Shannon", "Jason", "Harry", "Kyle", "James", "Julian", "Martin", "Haley",
+               "Ada", "Grace", "Linus", "Margaret", "Ken", "Dennis", "Barbara"]
+LAST_NAMES  = ["Zappa", "Docherty", "Bourne", "Styles", "Marshall", "Bishop", "Freeman", "Lovelace",
+               "Hopper", "Torvalds", "Hamilton", "Thompson", "Ritchie", "Liskov"]
+START_DATE  = date(2020, 1, 1)
+
+
+def random_date(rng, start=START_DATE, days=1460):
+    """ Returns a YYYYMMDD string within days of start """
+    return (start + timedelta(days=rng.randrange(days))).strftime("%Y%m%d")
+
+
+def random_name(rng):
+    return "{} {}".format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+
+
+def job_line(rng, record_number):
+    """ Returns one jobs.txt line """
+    company         = rng.choice(COMPANIES)
+    first_contact   = random_date(rng)
+    last_contact    = first_contact if rng.random() < 0.3 else random_date(rng)
+    return "; ".join([
+        str(record_number),
+        rng.choice(TITLES),
+        rng.choice(["y", "yes", "n", "no"]),
+        ", ".join(rng.sample(SKILLS, rng.randint(1, 5))),
+        company,
+        "{}.com/jobs/{}".format(company.split()[0].strip(",").lower(), rng.randrange(10000, 999999)),
+        random_name(rng) if rng.random() < 0.9 else "Null",
+        max(first_contact, last_contact),
+        min(first_contact, last_contact),
+        ])
+
+
+def poc_line(rng, record_number):
+    """ Returns one pocs.txt line """
+    name            = random_name(rng)
+    company         = rng.choice(COMPANIES)
+    digits          = "".join(str(rng.randrange(10)) for _ in range(10))
+    phone           = rng.choice(["{}-{}-{}", "{}{}{}", "{}.{}.{}", "({}) {} {}"]).format(
+                      digits[:3], digits[3:6], digits[6:])
+    first_contact   = random_date(rng)
+    last_contact    = random_date(rng)
+    return "; ".join([
+        str(record_number),
+        name,
+        company,
+        phone,
+        "{}@{}.com".format(name.replace(" ", ".").lower(), company.split()[0].strip(",").lower()),
+        min(first_contact, last_contact),
+        max(first_contact, last_contact),
+        ])
+
+
+def write_dataset(directory, size, seed=1):
+    """ Writes jobs.txt and pocs.txt with size records each into directory
+        The same seed and size always give the same files. Returns their paths.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, make_line in (("jobs.txt", job_line), ("pocs.txt", poc_line)):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding="utf-8") as f:
+            for record_number in range(1, size + 1):
+                f.write(make_line(rng, record_number))
+                f.write("\n")
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic jobs.txt/pocs.txt files")
+    parser.add_argument("--size", help="records per file", type=int, default=10000)
+    parser.add_argument("--seed", help="random seed", type=int, default=1)
+    parser.add_argument("--out", help="directory to write to", default="bench_data")
+    args = parser.parse_args()
+    for path in write_dataset(args.out, args.size, args.seed):
+        print(path)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# name:     benchmarks/run.py
+# desc:     Time job_seeker's hot paths on synthetic datasets, write JSON results
+#
+# usage:    python -m benchmarks.run --sizes 10000 100000 --output results.json
+
+import argparse
+import contextlib
+from datetime import datetime as dt
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import job_seeker
+from benchmarks.generate import write_dataset
+
+SIDECAR_SUFFIXES    = [job_seeker.INDEX_SUFFIX, job_seeker.LOG_SUFFIX, job_seeker.META_SUFFIX,
+                       job_seeker.LOCK_SUFFIX, job_seeker.SNAPSHOT_SUFFIX, job_seeker.FUZZY_SUFFIX,
+                       job_seeker.DUE_SUFFIX, job_seeker.STATS_SUFFIX]
+SELECTIVE_SEARCH    = "lovelace"
+# concurrent_appends runs this many writer processes, each appending this many records
+APPEND_WRITERS      = 4
+APPENDS_PER_WRITER  = 200
+APPEND_CODE         = ("import sys, job_seeker\n"
+                       "for i in range(int(sys.argv[2])):\n"
+                       "    job_seeker.append_lines(['0; Writer ' + str(i) + '; Co; 555; w@co.com; 2023; 2023'],\n"
+                       "                            sys.argv[1], renumber_taken=True)\n")
+
+
+def reset_sidecars(*paths):
+    """ Removes every sidecar job_seeker keeps beside the data files """
+    for path in paths:
+        for suffix in SIDECAR_SUFFIXES:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def dataset(data_dir, size, seed):
+    """ Returns (jobs_path, pocs_path) for size records, generating them once """
+    directory   = os.path.join(data_dir, "{}-{}".format(size, seed))
+    paths       = [os.path.join(directory, name) for name in ("jobs.txt", "pocs.txt")]
+    if not all(os.path.exists(path) for path in paths):
+        write_dataset(directory, size, seed)
+    reset_sidecars(*paths)
+    return paths
+
+
+def run_case(action, repeat, setup=None, operations=None):
+    """ Runs setup (untimed) then action repeat times, returns timing stats in seconds
+        Given how many operations an action does, the best rate per second is added.
+    """
+    times = []
+    for run in range(repeat):
+        state = setup(run) if setup is not None else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            action(state)
+            times.append(time.perf_counter() - start)
+    stats = {"best": min(times), "median": statistics.median(times), "runs": repeat}
+    if operations is not None:
+        stats["per_second"] = operations / stats["best"]
+    return stats
+
+
+def concurrent_appends(path):
+    """ Returns an action that runs APPEND_WRITERS processes at once, each
+        appending APPENDS_PER_WRITER records to path one group commit at a time
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def action(state):
+        procs = [subprocess.Popen([sys.executable, "-c", APPEND_CODE, path, str(APPENDS_PER_WRITER)], env=env)
+                 for _ in range(APPEND_WRITERS)]
+        for proc in procs:
+            if proc.wait() != 0:
+                raise RuntimeError("append writer failed")
+    return action
+
+
+def remove(path):
+    """ Returns a setup function that deletes path before each run """
+    def setup(run):
+        if os.path.exists(path):
+            os.remove(path)
+    return setup
+
+
+def cases(jobs, pocs, size):
+    """ Returns [(name, action, setup)] for one dataset, mutating cases last
+        A case may add how many operations its action does, to report a rate.
+    """
+    lines   = job_seeker.list_from_file(jobs)
+    middle  = size // 2
+
+    def update_input(run):
+        answers = ["", "", "", "bench{}@example.com".format(run), "", "", "y"]
+        return patch('builtins.input', side_effect=answers)
+
+    def update(mock_input):
+        with mock_input:
+            job_seeker.update_record("poc", middle, pocs)
+
+    def delete(record_number):
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(record_number, pocs, "poc")
+
+    return [
+        ("list_from_file",              lambda s: job_seeker.list_from_file(jobs),                      None),
+        ("builder",                     lambda s: [job_seeker.builder(l, "job") for l in lines],        None),
+        ("load_store",                  lambda s: job_seeker.load_store(jobs, "job"),                   None),
+        ("index_build",                 lambda s: job_seeker.load_index(jobs, "job"),
+                                        remove(job_seeker.index_path(jobs))),
+        ("parse_list_empty",            lambda s: job_seeker.parse_list(None, "job", "", filename=jobs), None),
+        ("parse_list_selective",        lambda s: job_seeker.parse_list(None, "job", SELECTIVE_SEARCH,
+                                                                        filename=jobs),                 None),
+        ("parse_list_selective_scan",   lambda s: list(job_seeker.iter_records(jobs, "job", SELECTIVE_SEARCH,
+                                                                              use_index=False)),        None),
+        ("parse_list_selective_lines",  lambda s: job_seeker.parse_list(lines, "job", SELECTIVE_SEARCH), None),
+        ("parse_list_record_number",    lambda s: job_seeker.parse_list(None, "job", middle, "record_number",
+                                                                        filename=jobs),                 None),
+        ("get_next_record_number_cold", lambda s: job_seeker.get_next_record_number(jobs),
+                                        remove(job_seeker.meta_path(jobs))),
+        ("get_next_record_number_warm", lambda s: job_seeker.get_next_record_number(jobs),            None),
+        ("update_record",               update,                                                         update_input),
+        ("delete_record",               delete,                                                         lambda run: run + 1),
+        ("concurrent_appends",          concurrent_appends(pocs),                                       None,
+                                        APPEND_WRITERS * APPENDS_PER_WRITER),
+        ]
+
+
+def run(sizes, repeat, seed, data_dir, only=None):
+    """ Runs every case on each dataset size, returns the results document """
+    results = {}
+    for size in sizes:
+        jobs, pocs      = dataset(data_dir, size, seed)
+        results[str(size)] = {}
+        for name, action, setup, *operations in cases(jobs, pocs, size):
+            if only and name not in only:
+                continue
+            result  = run_case(action, repeat, setup, *operations)
+            rate    = " {:.0f}/s".format(result["per_second"]) if "per_second" in result else ""
+            results[str(size)][name] = result
+            print("{:>9} {:<30} {:.6f}s{}".format(size, name, result["best"], rate), file=sys.stderr)
+        reset_sidecars(jobs, pocs)
+    return {
+        "meta": {
+            "date":     dt.now().isoformat(timespec="seconds"),
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "seed":     seed,
+            "repeat":   repeat,
+            },
+        "results": results,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark job_seeker on synthetic data")
+    parser.add_argument("--sizes", help="records per file", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", help="runs per case", type=int, default=3)
+    parser.add_argument("--seed", help="dataset seed", type=int, default=1)
+    parser.add_argument("--data-dir", help="where generated datasets are kept",
+                        default=os.path.join(tempfile.gettempdir(), "job_seeker_bench"))
+    parser.add_argument("--only", help="run just these cases", nargs="+", default=None)
+    parser.add_argument("--output", help="JSON results file", default="bench_results.json")
+    args = parser.parse_args()
+
+    document = run(args.sizes, args.repeat, args.seed, args.data_dir, args.only)
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(args.output)
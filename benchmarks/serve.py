@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# name:     benchmarks/serve.py
+# desc:     Compare cold CLI runs with the same reads answered by --serve
+#
+# usage:    python -m benchmarks.serve --sizes 10000 100000 --output serve_results.json
+
+import argparse
+from datetime import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import job_seeker
+from benchmarks.generate import write_dataset
+
+SCRIPT  = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_seeker.py")
+READS   = [
+    ("search",  ["-s", "lovelace", "--limit", "10"],                {"op": "search", "type": "job", "arg": "lovelace", "stop": 10}),
+    ("record",  ["-r", "77"],                                       {"op": "get", "type": "job", "arg": 77}),
+    ("query",   ["-j", "-q", "company=helical active=yes", "--limit", "10"],
+                                                                    {"op": "query", "type": "job", "arg": "company=helical active=yes", "stop": 10}),
+    ]
+
+
+def workdir(data_dir, size, seed):
+    """ Returns a directory holding data/jobs.txt and data/pocs.txt for size records """
+    directory = os.path.join(data_dir, "serve-{}-{}".format(size, seed))
+    if not os.path.exists(os.path.join(directory, "data", "pocs.txt")):
+        write_dataset(os.path.join(directory, "data"), size, seed)
+    return directory
+
+
+def stats(times):
+    return {"best": min(times), "median": statistics.median(times), "runs": len(times)}
+
+
+def time_cli(directory, argv, repeat):
+    """ Times repeat runs of the CLI, returns the stats """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT] + argv, cwd=directory, stdout=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+    return stats(times)
+
+
+def time_requests(socket_path, message, repeat):
+    """ Times repeat requests straight to the server socket, returns the stats """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        job_seeker.server_request(socket_path, [message])
+        times.append(time.perf_counter() - start)
+    return stats(times)
+
+
+def start_server(directory):
+    """ Starts --serve in directory, returns the process once it answers """
+    server      = subprocess.Popen([sys.executable, SCRIPT, "--serve"], cwd=directory, stdout=subprocess.DEVNULL)
+    socket_path = os.path.join(directory, "data", job_seeker.SERVER_SOCKET)
+    deadline    = time.monotonic() + 600
+    while job_seeker.server_request(socket_path, [{"op": "ping"}]) is None:
+        if server.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("--serve did not start")
+        time.sleep(0.05)
+    return server
+
+
+def run(sizes, repeat, seed, data_dir):
+    """ Times each read cold, forwarded by the CLI, and as a bare socket request """
+    results = {}
+    for size in sizes:
+        directory   = workdir(data_dir, size, seed)
+        socket_path = os.path.join(directory, "data", job_seeker.SERVER_SOCKET)
+        results[str(size)] = {}
+        for name, argv, message in READS:
+            # the first run builds the index, a cold run after that is the everyday case
+            time_cli(directory, argv + ["--no-server"], 1)
+            results[str(size)]["cli_cold_" + name] = time_cli(directory, argv + ["--no-server"], repeat)
+        server = start_server(directory)
+        try:
+            for name, argv, message in READS:
+                results[str(size)]["cli_forwarded_" + name] = time_cli(directory, argv, repeat)
+                results[str(size)]["socket_" + name]        = time_requests(socket_path, dict(message, engine="text"),
+                                                                            repeat * 20)
+        finally:
+            server.terminate()
+            server.wait()
+        for case, result in sorted(results[str(size)].items()):
+            print("{:>9} {:<30} {:.6f}s".format(size, case, result["median"]), file=sys.stderr)
+    return {
+        "meta": {
+            "date":     dt.now().isoformat(timespec="seconds"),
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "seed":     seed,
+            "repeat":   repeat,
+            },
+        "results": results,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark --serve against cold CLI runs")
+    parser.add_argument("--sizes", help="records per file", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", help="runs per case", type=int, default=5)
+    parser.add_argument("--seed", help="dataset seed", type=int, default=1)
+    parser.add_argument("--data-dir", help="where generated datasets are kept",
+                        default=os.path.join(tempfile.gettempdir(), "job_seeker_bench"))
+    parser.add_argument("--output", help="JSON results file", default="serve_results.json")
+    args = parser.parse_args()
+
+    document = run(args.sizes, args.repeat, args.seed, args.data_dir)
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(args.output)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# name:     benchmarks/startup.py
+# desc:     Time whole CLI runs from a cold start (no caches) and a warm one
+#
+# usage:    python -m benchmarks.startup --sizes 10000 100000 --output startup_results.json
+
+import argparse
+from datetime import datetime as dt
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from benchmarks.run import reset_sidecars
+from benchmarks.serve import time_cli, workdir
+
+COMMANDS = [
+    ("help",        ["--help"]),
+    ("list_jobs",   ["-j"]),
+    ("search_jobs", ["-j", "python"]),
+    ("search_both", ["-s", "lovelace"]),
+    ("record",      ["-r", "77"]),
+    ("query",       ["-j", "-q", "company=helical active=yes last_contact>=20230401"]),
+    ("join",        ["--join", "-s", "lovelace"]),
+    ]
+
+
+def run(sizes, repeat, seed, data_dir):
+    """ Times each command with every cache removed first (cold), then with
+        the caches a previous run left (warm)
+    """
+    results = {}
+    for size in sizes:
+        directory   = workdir(data_dir, size, seed)
+        data_files  = [os.path.join(directory, "data", name) for name in ("jobs.txt", "pocs.txt")]
+        results[str(size)] = {}
+        for name, argv in COMMANDS:
+            cold = []
+            for _ in range(repeat):
+                reset_sidecars(*data_files)
+                cold.append(time_cli(directory, argv + ["--no-server"], 1)["best"])
+            results[str(size)]["cold_" + name] = {"best": min(cold), "median": sorted(cold)[len(cold) // 2],
+                                                  "runs": repeat}
+            results[str(size)]["warm_" + name] = time_cli(directory, argv + ["--no-server"], repeat)
+        reset_sidecars(*data_files)
+        for case, result in sorted(results[str(size)].items()):
+            print("{:>9} {:<30} {:.6f}s".format(size, case, result["median"]), file=sys.stderr)
+    return {
+        "meta": {
+            "date":     dt.now().isoformat(timespec="seconds"),
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "seed":     seed,
+            "repeat":   repeat,
+            },
+        "results": results,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark job_seeker start up, cold and warm")
+    parser.add_argument("--sizes", help="records per file", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", help="runs per case", type=int, default=3)
+    parser.add_argument("--seed", help="dataset seed", type=int, default=1)
+    parser.add_argument("--data-dir", help="where generated datasets are kept",
+                        default=os.path.join(tempfile.gettempdir(), "job_seeker_bench"))
+    parser.add_argument("--output", help="JSON results file", default="startup_results.json")
+    args = parser.parse_args()
+
+    document = run(args.sizes, args.repeat, args.seed, args.data_dir)
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(args.output)
@@ -6,10 +6,34 @@
 # desc:     Track data on job applications
 
 import argparse
-from datetime import datetime as dt
+from array import array
+import atexit
+import bisect
+import collections
+import contextlib
+from datetime import datetime as dt, timedelta
+import functools
+import heapq
+import io
+import itertools
+import json
+import marshal
+import mmap
+import operator
 import os.path
+import re
+import shlex
 import sys
 import os
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows, writers there are not serialised
+    fcntl = None
 
 # Define data fields for both Job and POC
 JOB_FIELDS = [
@@ -24,130 +48,2840 @@ JOB_FIELDS = [
     "first_contact"
     ]
 
-POC_FIELDS = [
-    "record_number",
-    "name",
-    "company",
-    "phone",
-    "email",
-    "first_contact",
-    "last_contact"
-    ]
+POC_FIELDS = [
+    "record_number",
+    "name",
+    "company",
+    "phone",
+    "email",
+    "first_contact",
+    "last_contact"
+    ]
+
+# Sidecar search index kept next to each data file
+ENCODING        = "utf-8"
+INDEX_SUFFIX    = ".idx"
+INDEX_VERSION   = 4
+TOKEN_RE        = re.compile(r"\w+")
+
+# Lines appended after the index was built are read by every search until
+# there are this many bytes of them, then the index is built again
+INDEX_TAIL_BYTES    = 1 << 20
+# A search word on more than 1/INDEX_SCAN_FRACTION of the lines doesn't
+# narrow a search, reading that many lines one by one costs more than a scan
+INDEX_SCAN_FRACTION = 8
+FUZZY_TERM          = 1
+COMMON_TERM         = 2
+
+# Field queries: the index keeps INT_FIELDS sorted for range lookups with
+# bisect, and HASH_FIELDS bucketed by value for equality lookups
+QUERY_RE        = re.compile(r"(\w+)(>=|<=|!=|=|>|<)(.*)", re.S)
+QUERY_OPS       = {"=": operator.eq, "!=": operator.ne, ">=": operator.ge,
+                   "<=": operator.le, ">": operator.gt, "<": operator.lt}
+RANGE_OPS       = (">=", "<=", ">", "<")
+DATE_FIELDS     = ("last_contact", "first_contact")
+HASH_FIELDS     = ("active", "company")
+
+# --fuzzy ranks the words of FUZZY_FIELDS by the character trigrams they
+# share with the search, from a trigram index kept beside the search index
+FUZZY_SUFFIX    = ".tri"
+FUZZY_VERSION   = 1
+FUZZY_FIELDS    = ("title", "notes", "company", "poc_name", "name")
+FUZZY_THRESHOLD = 0.3
+
+# Updates and deletes are appended to a change log, folded back in by compaction
+LOG_SUFFIX          = ".log"
+COMPACT_LOG_BYTES   = 1 << 20
+
+# --archive moves cold jobs into gzip segments beside the data file,
+# data/jobs.txt.archive.000001.gz and on, each written once and never changed
+ARCHIVE_SUFFIX      = ".archive"
+
+# --due keeps each data file's follow-ups in a heap beside it, oldest contact
+# first, patched by every write through append_lines, commit_change, _rewrite
+# or the SQLite engine, and rebuilt after anything else
+DUE_SUFFIX          = ".due"
+DUE_VERSION         = 3
+DUE_DAYS            = 14
+DUE_TOP             = 10
+DUE_DATE_RE         = re.compile(r"(\d{4})(?:[-/.]?(\d{1,2})(?:[-/.]?(\d{1,2}))?)?")
+
+# --stats reads counts kept beside each data file, patched the same way as
+# the follow-up queue, and --stats --check counts again to look for drift
+STATS_SUFFIX        = ".stats"
+STATS_VERSION       = 3
+
+# --dedupe only matches phone numbers with at least this many digits
+MIN_PHONE_DIGITS    = 7
+
+# Batch updates and deletes rewrite the data file in one pass, after
+# showing this many of the changed records and asking once
+BATCH_PREVIEW       = 10
+
+# Every change to a data file happens under an exclusive lock on its lock file
+LOCK_SUFFIX         = ".lock"
+
+# The highest record number handed out is cached beside each data file
+META_SUFFIX         = ".meta"
+
+# Parsed records are cached as a marshal'd RecordStore beside each data file
+SNAPSHOT_SUFFIX     = ".snap"
+SNAPSHOT_VERSION    = 1
+
+# Raw byte scanning reads the data file through mmap in newline aligned chunks
+SCAN_CHUNK      = 1 << 20
+
+# --export writes JSONL or CSV in chunks of about this many bytes
+EXPORT_FORMATS  = ("jsonl", "csv")
+EXPORT_CHUNK    = 1 << 20
+
+# Storage engines: ; separated text files by default, or SQLite databases
+ENGINE_ENV      = "JOB_SEEKER_ENGINE"
+SQLITE_SUFFIX   = ".db"
+FTS_MIN_SEARCH  = 3
+
+# SQLite selects up to this many ranges through the record_number index in one
+# query, more are filtered in a scan, well under the bound parameter limit
+SQLITE_MAX_RANGES = 400
+
+# --watch polls the data files' stat data, and checks this much before the
+# last offset read hasn't been rewritten when a file changes
+WATCH_INTERVAL      = 1.0
+TAIL_CHECK_BYTES    = 4096
+
+# --serve listens on this Unix socket in the data directory
+SERVER_SOCKET       = "job_seeker.sock"
+SERVER_CACHE_SIZE   = 256
+SERVER_TIMEOUT      = 5
+
+# Files big enough to give each CPU this much to scan are split between processes
+PARALLEL_RANGE_BYTES    = 8 << 20
+RANGES_PER_WORKER       = 4
+
+# --profile, or this environment variable set to "text" or "json"
+PROFILE_ENV         = "JOB_SEEKER_PROFILE"
+PROFILE_DUMP_ENV    = "JOB_SEEKER_PROFILE_DUMP"
+PROFILE_MEMORY_ENV  = "JOB_SEEKER_PROFILE_MEMORY"
+
+
+# Columnar storage: whole numbers go in array columns, repeated strings are interned
+INT_FIELDS      = ("record_number", "last_contact", "first_contact")
+INTERN_FIELDS   = ("active", "company")
+INT_RE          = re.compile(r"0|[1-9][0-9]{0,17}")
+RAW_VALUE       = -1
+
+
+class RecordStore:
+    """Stores many Job or POC records column by column
+
+    Each field is one column. INT_FIELDS columns are array("q") of whole
+    numbers, and any value that doesn't round trip through int(), such as
+    "Null" or None, is kept in raw with RAW_VALUE in the column. Job and POC
+    objects are views onto a row.
+    """
+
+    def __init__(self, view_class):
+        self.view_class = view_class
+        self.fields     = list(view_class.fields)
+        self.positions  = {field: idx for idx, field in enumerate(self.fields)}
+        self.is_int     = [field in INT_FIELDS for field in self.fields]
+        self.intern     = [field in INTERN_FIELDS for field in self.fields]
+        self.columns    = [array("q") if is_int else [] for is_int in self.is_int]
+        self.raw        = {}
+        self.size       = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for row in range(self.size):
+            yield self.view(row)
+
+    def append(self, values):
+        """ Takes values in field order, stores them as a new row and returns its number """
+        if len(values) < len(self.fields):
+            raise IndexError("{} values for {} fields".format(len(values), len(self.fields)))
+        row = self.size
+        for idx, column in enumerate(self.columns):
+            value = values[idx]
+            if self.is_int[idx]:
+                if isinstance(value, str) and INT_RE.fullmatch(value):
+                    column.append(int(value))
+                else:
+                    column.append(RAW_VALUE)
+                    self.raw[(idx, row)] = value
+            elif self.intern[idx] and isinstance(value, str):
+                column.append(sys.intern(value))
+            else:
+                column.append(value)
+        self.size += 1
+        return row
+
+    def get(self, row, field):
+        """ Returns the value of field in row """
+        idx     = self.positions[field]
+        value   = self.columns[idx][row]
+        if self.is_int[idx]:
+            return self.raw[(idx, row)] if value == RAW_VALUE else str(value)
+        return value
+
+    def set(self, row, field, value):
+        """ Sets the value of field in row """
+        idx = self.positions[field]
+        self.raw.pop((idx, row), None)
+        if self.is_int[idx]:
+            if isinstance(value, str) and INT_RE.fullmatch(value):
+                self.columns[idx][row] = int(value)
+            else:
+                self.columns[idx][row] = RAW_VALUE
+                self.raw[(idx, row)] = value
+        elif self.intern[idx] and isinstance(value, str):
+            self.columns[idx][row] = sys.intern(value)
+        else:
+            self.columns[idx][row] = value
+
+    def view(self, row):
+        """ Returns a Job or POC view of row """
+        return self.view_class.view(self, row)
+
+    def snapshot(self):
+        """ Returns the store's contents in a form marshal can save """
+        return {
+            "fields":   self.fields,
+            "size":     self.size,
+            "columns":  [column.tobytes() if is_int else column for column, is_int in zip(self.columns, self.is_int)],
+            "raw":      self.raw,
+            }
+
+    @classmethod
+    def from_snapshot(cls, view_class, snapshot):
+        """ Takes a view class and a snapshot(), returns the RecordStore it was taken of """
+        store = cls(view_class)
+        if snapshot["fields"] != store.fields:
+            raise ValueError("snapshot fields don't match")
+        store.columns   = [array("q", column) if is_int else column
+                           for column, is_int in zip(snapshot["columns"], store.is_int)]
+        store.raw       = snapshot["raw"]
+        store.size      = snapshot["size"]
+        return store
+
+
+class Row:
+    """Stores a single Job or POC record, for records built on their own
+
+    It answers the same get/set calls as a RecordStore, for row 0, without
+    the cost of setting up columns.
+    """
+    __slots__ = ("view_class", "values")
+
+    def __init__(self, view_class, values):
+        if len(values) < len(view_class.fields):
+            raise IndexError("{} values for {} fields".format(len(values), len(view_class.fields)))
+        self.view_class = view_class
+        self.values     = values
+
+    def get(self, row, field):
+        return self.values[self.view_class.positions[field]]
+
+    def set(self, row, field, value):
+        self.values[self.view_class.positions[field]] = value
+
+    def view(self, row=0):
+        return self.view_class.view(self, row)
+
+
+class RecordView:
+    """Base for Job and POC, a view of one row of a RecordStore or Row"""
+    __slots__   = ("_store", "_row")
+    fields      = []
+    positions   = {}
+    defaults    = {}
+    dated       = ()
+
+    def __init__(self, data={}):
+        values  = []
+        today   = None
+        for field in self.fields:
+            if field in data:
+                values.append(data[field])
+            elif field in self.dated:
+                # only worked out when a date is missing
+                today = today or convert_date(dt.now())
+                values.append(today)
+            else:
+                values.append(self.defaults.get(field))
+        self._store = Row(type(self), values)
+        self._row   = 0
+
+    @classmethod
+    def view(cls, store, row):
+        """ Returns a view of row in store, without copying it """
+        record          = cls.__new__(cls)
+        record._store   = store
+        record._row     = row
+        return record
+
+    def __str__(self):
+        field_values = ["{}: {}".format(field, getattr(self, field)) for field in self.fields]
+        return "\n".join(field_values)
+
+
+class Job(RecordView):
+    """Stores the job req data"""
+    __slots__   = ()
+    fields      = JOB_FIELDS
+    defaults    = {"active": "y"}
+    dated       = ("last_contact", "first_contact")
+
+
+class POC(RecordView):
+    """Stores the contact info for each Point of Contact"""
+    __slots__   = ()
+    fields      = POC_FIELDS
+    dated       = ("first_contact", "last_contact")
+
+
+def field_property(field):
+    """ Returns a property reading and writing field in a view's row """
+    def fget(self):
+        return self._store.get(self._row, field)
+
+    def fset(self, value):
+        self._store.set(self._row, field, value)
+
+    return property(fget, fset)
+
+
+for _view_class in (Job, POC):
+    _view_class.positions = {field: idx for idx, field in enumerate(_view_class.fields)}
+    for _field in _view_class.fields:
+        setattr(_view_class, _field, field_property(_field))
+
+
+def record_class(_list_type):
+    """ Takes "job" or "poc", returns the matching view class """
+    return Job if _list_type == "job" else POC
+
+
+def load_store(filename, _list_type):
+    """ Takes a data file, returns a RecordStore holding all of its records
+        The parsed records are snapshotted beside the file, and while the
+        file and its change log are unchanged they are loaded from there.
+    """
+    store = open_snapshot(filename, _list_type)
+    if store is None:
+        signature   = data_signature(filename)
+        store       = RecordStore(record_class(_list_type))
+        for line in read_lines(filename):
+            store.append(string_to_list(line))
+        save_snapshot(filename, store, signature)
+    return store
+
+
+def write_cache(path, data):
+    """ Writes bytes to path through a temporary file renamed over it, so a
+        reader sees the old contents or the new. Caches can always be built
+        again, so if it can't be written, say in a read-only data dir, the
+        old file is left and False returned.
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def read_cache(path, version, signature):
+    """ Returns the marshalled cache at path, or None if it isn't the given version,
+        wasn't saved against signature or can't be read
+    """
+    try:
+        with open(path, 'rb') as f:
+            cache = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if isinstance(cache, dict) and cache.get("version") == version and cache.get("signature") == signature:
+        return cache
+    return None
+
+
+def save_cache(path, cache, signature):
+    """ Saves a cache dict to path, marshalled, against a signature """
+    write_cache(path, marshal.dumps(dict(cache, signature=signature)))
+
+
+def snapshot_path(filename):
+    """ Takes a data filename, returns the path of its parsed record snapshot """
+    return filename + SNAPSHOT_SUFFIX
+
+
+def open_snapshot(filename, _list_type):
+    """ Returns the RecordStore snapshotted for filename if it is still current, else None """
+    snapshot = read_cache(snapshot_path(filename), SNAPSHOT_VERSION, data_signature(filename))
+    if snapshot is None or snapshot.get("path") != os.path.abspath(filename):
+        return None
+    try:
+        return RecordStore.from_snapshot(record_class(_list_type), snapshot["store"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def save_snapshot(filename, store, signature):
+    """ Saves store as filename's snapshot, current as of signature """
+    save_cache(snapshot_path(filename), {"version": SNAPSHOT_VERSION, "path": os.path.abspath(filename),
+                                         "store": store.snapshot()}, signature)
+
+
+def read_lines(filename):
+    """ Takes a file, yields each line that is not a comment or empty
+        Changes in the file's change log are applied on the way through.
+    """
+    changes = read_log(filename)
+    if not changes:
+        with open(filename, 'r', encoding=ENCODING) as f:
+            for line in f:
+                line = line.strip()
+                if len(line) > 0 and not line.startswith("#"):
+                    yield line
+        return
+    # the log finds records by where their line starts in the data file
+    offset = 0
+    with open(filename, 'rb') as f:
+        for raw in f:
+            start   = offset
+            offset += len(raw)
+            line    = raw.decode(ENCODING).strip()
+            if len(line) > 0 and not line.startswith("#"):
+                if start in changes:
+                    line = changes[start][1]
+                    if line is None:
+                        continue
+                yield line
+
+
+def list_from_file(filename):
+    """Takes a file, removes comments/empty lines, and returns a list of each line."""
+    return open_engine(filename).load()
+
+
+def is_yes(prompt):
+    """ Takes a prompt, returns True/False based on user input """
+    yes_choices = ["y", "yes", "yep", "yeah", "yup", "sure", "ok", "okay"]
+    return prompt.lower() in yes_choices
+
+
+def is_inactive(value):
+    """ Takes a job's active value, returns True only if it says n or no.
+        Null, a blank or anything else leaves the job active.
+    """
+    return (value or "").strip().lower() in ("n", "no")
+
+
+def convert_date(date):
+    """ Takes a datetime.datetime object and returns a YYYYMMDD string """
+    return "{}{:0>2}{:0>2}".format(date.year, date.month, date.day)
+
+
+def builder(line, _list_type, store=None):
+    """ Takes a line from a file and returns a Job or POC object
+        The record goes into store if given, else into a store of its own.
+    """
+    if store is None:
+        return Row(record_class(_list_type), string_to_list(line)).view()
+    return store.view(store.append(string_to_list(line)))
+
+
+def filter_lines(lines, search):
+    """ Takes lines and a search string, yields the lines that contain it """
+    if search == "":
+        yield from lines
+        return
+    needle = search.lower()
+    for line in lines:
+        if needle in line.lower():
+            yield line
+
+
+def folds_to_ascii(chunk):
+    """ Takes bytes, returns True if they hold U+0130 or U+212A
+        These are the only characters whose str.lower() contains ASCII, and
+        the single byte tests are much cheaper than searching for either.
+    """
+    return ((b"\xc4" in chunk and b"\xc4\xb0" in chunk) or
+            (b"\xe2" in chunk and b"\xe2\x84\xaa" in chunk))
+
+
+def scan_chunk(chunk, needle, search, base=0):
+    """ Takes a chunk of whole lines as bytes, found at base in the file,
+        yields (offset, line) for the lines that contain search.
+        needle is search lowered and ASCII encoded. Only lines holding a byte
+        match are decoded.
+    """
+    lowered_search = search.lower()
+    if folds_to_ascii(chunk):
+        # bytes.lower() can't fold these the way str.lower() does
+        for raw in chunk.split(b"\n"):
+            line = raw.decode(ENCODING).strip()
+            if len(line) > 0 and not line.startswith("#") and lowered_search in line.lower():
+                yield base, line
+            base += len(raw) + 1
+        return
+    # A byte match is a str match, unless the match is in whitespace that strip() drops
+    recheck = needle != needle.strip()
+    lowered = chunk.lower()
+    pos     = lowered.find(needle)
+    while pos != -1:
+        start   = lowered.rfind(b"\n", 0, pos) + 1
+        end     = lowered.find(b"\n", pos)
+        if end == -1:
+            end = len(lowered)
+        line = chunk[start:end].decode(ENCODING).strip()
+        if len(line) > 0 and not line.startswith("#"):
+            if not recheck or lowered_search in line.lower():
+                yield base + start, line
+        pos = lowered.find(needle, end)
+
+
+def apply_changes(hits, changes, matches):
+    """ Takes (offset, line) hits from the base file in file order, the change
+        log and a test of a line, yields the hits as they read with the log
+        applied. Replaced records passing the test are slotted in at their old offset.
+    """
+    if not changes:
+        yield from hits
+        return
+    replaced    = sorted((offset, line) for offset, (_, line) in changes.items()
+                         if line is not None and matches(line))
+    unchanged   = ((offset, line) for offset, line in hits if offset not in changes)
+    yield from heapq.merge(unchanged, replaced)
+
+
+def scan_file(filename, search, workers=None):
+    """ Takes a data file and a search string, yields the matching lines in file order
+        The file is memory mapped and searched as raw bytes, case-insensitively.
+        Searches that bytes.lower() can't fold (non-ASCII) go through filter_lines.
+        workers is how many processes scan the file, by default scan_workers() picks.
+    """
+    try:
+        needle = search.lower().encode("ascii")
+    except UnicodeEncodeError:
+        needle = b""
+    if needle == b"" or b"\n" in needle:
+        yield from filter_lines(read_lines(filename), search)
+        return
+    if workers is None:
+        workers = scan_workers(os.path.getsize(filename))
+    if workers > 1:
+        hits = parallel_offsets(filename, needle, search, workers)
+    else:
+        hits = scan_offsets(filename, needle, search)
+    lowered_search = search.lower()
+    for _, line in apply_changes(hits, read_log(filename), lambda line: lowered_search in line.lower()):
+        yield line
+
+
+def scan_offsets(filename, needle, search, start=0, end=None):
+    """ Takes a data file, yields (offset, line) for each base file line holding needle
+        start and end limit the scan to a newline aligned byte range.
+    """
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end  = size if end is None else min(end, size)
+        if start >= end:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while start < end:
+                stop = mm.find(b"\n", min(start + SCAN_CHUNK, end), end)
+                stop = end if stop == -1 else stop + 1
+                yield from scan_chunk(mm[start:stop], needle, search, start)
+                start = stop
+
+
+def usable_cpus():
+    """ Returns how many CPUs this process may run on """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def scan_workers(size):
+    """ Takes a file size, returns how many processes should scan it, 1 meaning serial """
+    return max(1, min(usable_cpus(), size // PARALLEL_RANGE_BYTES))
+
+
+def byte_ranges(filename, count):
+    """ Takes a file, returns up to count (start, end) byte ranges covering it,
+        each starting at the beginning of a line.
+    """
+    size    = os.path.getsize(filename)
+    bounds  = [0]
+    with open(filename, 'rb') as f:
+        for part in range(1, count):
+            f.seek(size * part // count)
+            f.readline()
+            start = f.tell()
+            if start >= size:
+                break
+            if start > bounds[-1]:
+                bounds.append(start)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def scan_range(filename, needle, search, start, end):
+    """ Runs in a worker process, returns scan_offsets() for one byte range as a list """
+    return list(scan_offsets(filename, needle, search, start, end))
+
+
+def parallel_offsets(filename, needle, search, workers):
+    """ Takes a data file, yields (offset, line) for each base file line holding needle
+        The file is split into newline aligned ranges that a pool of workers
+        processes scan at once. Results are yielded in file order, and ranges
+        not started yet are cancelled if the consumer stops early.
+    """
+    import concurrent.futures
+    ranges = byte_ranges(filename, workers * RANGES_PER_WORKER)
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(scan_range, filename, needle, search, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def build_records(lines, _list_type, store=None):
+    """ Takes lines, yields a Job or POC object for each
+        Without a store each record is built on its own, so memory stays flat.
+    """
+    for line in lines:
+        yield builder(line, _list_type, store)
+
+
+def iter_records(filename, _list_type, search, _option=None, use_index=True, store=None, workers=None,
+                 include_archive=False):
+    """ Takes a data file and a search, yields the matching Job or POC objects
+        Lines are read, filtered and built one at a time, so a consumer that
+        stops early stops the file read too. use_index and workers are passed
+        to the storage engine's search. With include_archive the matches in
+        the file's archive segments follow.
+    """
+    engine = open_engine(filename, _list_type)
+    if _option is not None:
+        lines   = engine.select([(search, search)])
+        matches = lambda line: record_number_of(line) == search
+    elif search == "" and use_index:
+        # everything is wanted, the snapshot has it already parsed
+        yield from engine.load_store()
+        lines   = []
+        matches = None
+    else:
+        lines   = engine.search(search, use_index, workers)
+        needle  = search.lower()
+        matches = lambda line: needle in line.lower()
+    yield from build_records(lines, _list_type, store)
+    if include_archive:
+        yield from build_records(archive_lines(filename, matches), _list_type, store)
+
+
+def parse_list(_list, _list_type, search, _option=None, filename=None):
+    """ Takes a list of strings, and the element to search, and returns a list of RECORDS that match search term"""
+    """ If _option is not None, then we are searching for a specific record number"""
+    """ If _option is None, then we return the entire list of records"""
+    """ If filename is given, _list is ignored and the file and its index are used"""
+    store = RecordStore(record_class(_list_type))
+    if filename is not None:
+        return list(iter_records(filename, _list_type, search, _option, store=store))
+    if _option is not None:
+        lines = (line for line in _list if record_number_of(line) == search)
+    else:
+        lines = filter_lines(_list, search)
+    return list(build_records(lines, _list_type, store))
+
+
+def print_records(records, limit=None, offset=0):
+    """ Takes (label, record) pairs, prints the requested page, returns how many printed """
+    stop    = None if limit is None else offset + limit
+    found   = 0
+    for label, record in itertools.islice(records, offset, stop):
+        print(label, record, "\n")
+        found += 1
+    return found
+
+
+def labelled(label, records):
+    """ Takes a label and records, yields (label, record) pairs for print_records """
+    for record in records:
+        yield label, record
+
+
+def append_to_file(line, filename):
+    """ Takes a line and a filename, appends the line to the file """
+    open_engine(filename).insert([line])
+
+
+def renumber(line, record_number):
+    """ Takes a record line, returns it with its record number replaced """
+    return "{}{}".format(record_number, line[line.index(";"):])
+
+
+def append_lines(lines, filename, renumber_taken=False):
+    """ Appends lines to filename as a group commit: one lock, one write, one fsync
+        With renumber_taken, a line whose record number is missing or already
+        used is given the next free one, allocated under the lock so two
+        writers never get the same number. Returns the lines as written.
+    """
+    with summarised_write(filename) as changes:
+        next_number = get_next_record_number(filename)
+        if renumber_taken:
+            written     = []
+            for line in lines:
+                record_number = record_number_of(line)
+                if record_number is None or record_number < next_number:
+                    record_number   = next_number
+                    line            = renumber(line, record_number)
+                next_number = max(next_number, record_number + 1)
+                written.append(line)
+            lines = written
+
+        with open(filename, 'ab') as f:
+            data = bytearray(b"\n")
+            for line in lines:
+                data += line.encode(ENCODING) + b"\n"
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        record_numbers = [record_number_of(line) for line in lines]
+        save_high_water(filename, max([next_number - 1] + [rn for rn in record_numbers if rn is not None]))
+        changes.extend((None, line) for line in lines)
+    return lines
+
+
+def string_to_list(data, sep = ';'):
+    """ Takes a ; separated string and converts it to a list """ 
+    return list(map(str.strip, data.split(sep)))
+
+def dict_to_string(data, sep = ';'):
+    """ Takes a dict and converts it to a sep separated string """ 
+    return sep.join([str(e) for e in data.values()])
+
+# The search index is a sidecar (data/jobs.txt.idx) read with seeks, never
+# loaded whole. It starts with the length of a marshal'd header, 8 bytes,
+# then the header, which says where each region after it starts. Lines are
+# numbered in file order, and the regions are:
+#     offsets             where each line starts in the data file, array("q")
+#     terms               every distinct word, lowercased and sorted, between "\n"s
+#     term_postings       where each word's lines start in postings, array("q")
+#     flags               a byte per word, FUZZY_TERM if it is in one of
+#                         FUZZY_FIELDS, COMMON_TERM if it is on too many
+#                         lines to narrow a search and so has no postings
+#     postings            line numbers, array("I")
+#     numbers             each line's record number, between "\n"s
+#     <field>.keys        an INT_FIELDS field's values in order, array("q")
+#     <field>.lines       the line each of those is on, array("I")
+#     <field>.values      a HASH_FIELDS field's distinct values, between "\n"s
+#     <field>.postings    where each value's lines start in postings, array("q")
+# A search word is looked for in terms with bytes.find(), one pass over the
+# words rather than the file. Record numbers aren't words, a search word of
+# digits is looked for in numbers as well. The index covers the data file
+# up to the last newline it had when built. Lines appended after that are
+# read by every search until there are INDEX_TAIL_BYTES of them, and it is
+# built again then, or when the file is replaced or the TAIL_CHECK_BYTES
+# before that point change. Updates and deletes never touch it, the change
+# log is applied over it as lines are read.
+
+def file_signature(filename):
+    """ Takes a filename, returns (size, mtime_ns) or None if it can't be read """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def data_signature(filename):
+    """ Takes a data file, returns the signatures of it and its change log """
+    return (file_signature(filename), file_signature(log_path(filename)))
+
+
+def index_path(filename):
+    """ Takes a data filename, returns the path of its search index """
+    return filename + INDEX_SUFFIX
+
+
+def record_number_of(line):
+    """ Takes a record line, returns its record number or None """
+    try:
+        return int(line.split(";", 1)[0])
+    except ValueError:
+        return None
+
+
+def tokenize(text):
+    """ Takes a string, returns the set of lowercase word tokens in it """
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+def newline_joined(words):
+    """ Takes strings, returns them as a region of words, each followed by "\n",
+        after a "\n" of its own
+    """
+    return ("\n" + "".join(word + "\n" for word in words)).encode(ENCODING)
+
+
+def build_index(filename, _list_type):
+    """ Takes a data file, reads it once and returns a fresh search index,
+        held in memory until save_index() writes it out
+    """
+    fields          = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+    fuzzy_values_of = operator.itemgetter(*[idx for idx, field in enumerate(fields) if field in FUZZY_FIELDS])
+    # values repeat, so each field's keys are worked out once per distinct value
+    keyed           = [(idx, field, {}) for idx, field in enumerate(fields)
+                       if idx > 0 and (field in INT_FIELDS or field in HASH_FIELDS)]
+    offsets         = array("q")
+    numbers         = []
+    term_lines      = collections.defaultdict(list)
+    fuzzy_values    = set()
+    sorted_keys     = {field: [] for field in fields if field in INT_FIELDS}
+    value_lines     = {field: collections.defaultdict(list) for field in fields if field in HASH_FIELDS}
+    with open(filename, 'rb') as f:
+        stat    = os.fstat(f.fileno())
+        covered = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                # a partly written last line is read as part of the tail
+                break
+            line = raw.decode(ENCODING).strip()
+            if len(line) > 0 and not line.startswith("#"):
+                number  = len(offsets)
+                values  = line.split(";")
+                first   = values[0].strip()
+                offsets.append(covered)
+                if INT_RE.fullmatch(first):
+                    numbers.append(first)
+                    sorted_keys["record_number"].append((int(first), number))
+                    words = line[len(values[0]) + 1:]
+                else:
+                    numbers.append("")
+                    words = line
+                for term in set(TOKEN_RE.findall(words.lower())):
+                    term_lines[term].append(number)
+                if len(values) == len(fields):
+                    fuzzy_values.update(fuzzy_values_of(values))
+                else:
+                    fuzzy_values.update(fuzzy_words(line, fields))
+                for idx, field, keys in keyed:
+                    if idx < len(values):
+                        value = values[idx]
+                        if value not in keys:
+                            keys[value] = field_key(field, value.strip())
+                        key = keys[value]
+                        if key is None:
+                            continue
+                        if field in sorted_keys:
+                            sorted_keys[field].append((key, number))
+                        else:
+                            value_lines[field][key].append(number)
+            covered += len(raw)
+        start = max(0, covered - TAIL_CHECK_BYTES)
+        f.seek(start)
+        crc = zlib.crc32(f.read(covered - start))
+
+    # a word on too many lines to narrow a search keeps no postings
+    limit           = max(INDEX_SCAN_FRACTION, len(offsets) // INDEX_SCAN_FRACTION)
+    fuzzy_terms     = tokenize(" ".join(fuzzy_values))
+    terms           = sorted(term_lines)
+    flags           = bytearray(len(terms))
+    postings        = array("I")
+    term_postings   = array("q", [0])
+    for number, term in enumerate(terms):
+        lines = term_lines[term]
+        if len(lines) > limit:
+            flags[number] |= COMMON_TERM
+        else:
+            postings.fromlist(lines)
+        if term in fuzzy_terms:
+            flags[number] |= FUZZY_TERM
+        term_postings.append(len(postings))
+    regions = [
+        ("offsets",         offsets.tobytes()),
+        ("terms",           newline_joined(terms)),
+        ("term_postings",   term_postings.tobytes()),
+        ("flags",           bytes(flags)),
+        ("numbers",         newline_joined(numbers)),
+        ]
+    for field, pairs in sorted_keys.items():
+        pairs.sort()
+        regions.append((field + ".keys",    array("q", [key for key, _ in pairs]).tobytes()))
+        regions.append((field + ".lines",   array("I", [number for _, number in pairs]).tobytes()))
+    for field, lines in value_lines.items():
+        values = sorted(lines)
+        starts = array("q", [len(postings)])
+        for value in values:
+            postings.fromlist(lines[value])
+            starts.append(len(postings))
+        regions.append((field + ".values",      newline_joined(values)))
+        regions.append((field + ".postings",    starts.tobytes()))
+    regions.append(("postings", postings.tobytes()))
+
+    index = {
+        "version":      INDEX_VERSION,
+        "fields":       list(fields),
+        "lines":        len(offsets),
+        # what the file looked like, and how much of it is covered
+        "signature":    (stat.st_size, stat.st_mtime_ns),
+        "stamp":        (stat.st_dev, stat.st_ino, covered, crc),
+        "regions":      {},
+        }
+    position = 0
+    for name, data in regions:
+        index["regions"][name] = (position, len(data))
+        position += len(data)
+    header = marshal.dumps(index)
+    index["base"] = 8 + len(header)
+    index["data"] = b"".join([array("q", [len(header)]).tobytes(), header] + [data for _, data in regions])
+    return index
+
+
+def save_index(filename, index):
+    """ Writes out an index from build_index(), returns False if it couldn't
+        The index keeps its data in memory, so it works either way.
+    """
+    index["path"] = index_path(filename)
+    return write_cache(index["path"], index["data"])
+
+
+def open_index(filename):
+    """ Returns the header of filename's saved index if it still covers the
+        file, with fewer than INDEX_TAIL_BYTES appended since, else None
+    """
+    path = index_path(filename)
+    try:
+        with open(path, 'rb') as f:
+            length  = array("q", f.read(8))[0]
+            index   = marshal.loads(f.read(length))
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+    index["base"] = 8 + length
+    index["path"] = path
+    return index if index_covers(filename, index) else None
+
+
+def index_covers(filename, index):
+    """ Returns True if filename still starts with what index was built from
+        A file modified without growing was rewritten, not appended to. One
+        that grew is taken to have been appended to if the TAIL_CHECK_BYTES
+        before what the index covers are unchanged.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return False
+    device, inode, covered, crc = index["stamp"]
+    if (stat.st_dev, stat.st_ino) != (device, inode) or not covered <= stat.st_size <= covered + INDEX_TAIL_BYTES:
+        return False
+    if (stat.st_size, stat.st_mtime_ns) == index["signature"]:
+        return True
+    if stat.st_size <= index["signature"][0]:
+        return False
+    with open(filename, 'rb') as f:
+        start = max(0, covered - TAIL_CHECK_BYTES)
+        f.seek(start)
+        return zlib.crc32(f.read(covered - start)) == crc
+
+
+def load_index(filename, _list_type):
+    """ Returns an up to date index for filename, rebuilding it if stale """
+    index = open_index(filename)
+    if index is None:
+        index = build_index(filename, _list_type)
+        save_index(filename, index)
+    return index
+
+
+def read_region(index, name, typecode=None, first=0, count=None):
+    """ Returns a region of the index as bytes, or given a typecode as an
+        array of count items from item first on, reading only those
+    """
+    start, length   = index["regions"][name]
+    size            = 1 if typecode is None else array(typecode).itemsize
+    if count is None:
+        count = length // size - first
+    start += index["base"] + first * size
+    if "data" in index:
+        data = index["data"][start:start + count * size]
+    else:
+        with open(index["path"], 'rb') as f:
+            f.seek(start)
+            data = f.read(count * size)
+    if typecode is None:
+        return data
+    items = array(typecode)
+    items.frombytes(data)
+    return items
+
+
+def word_numbers(words, part):
+    """ Takes a region of words and a lowercase string, yields the position
+        in the region of each word containing it
+    """
+    needle  = part.encode(ENCODING)
+    number  = -1
+    counted = 0
+    pos     = words.find(needle)
+    while pos != -1:
+        number  += words.count(b"\n", counted, pos)
+        counted  = pos
+        yield number
+        pos = words.find(needle, words.find(b"\n", pos))
+
+
+def word_number(words, word):
+    """ Takes a region of words and a word, returns its position or None """
+    pos = words.find(b"\n" + word.encode(ENCODING) + b"\n")
+    return None if pos == -1 else words.count(b"\n", 0, pos)
+
+
+def postings_of(index, region, number):
+    """ Returns the lines of the number'th entry of a postings start region """
+    first, last = read_region(index, region, "q", number, 2)
+    return read_region(index, "postings", "I", first, last - first)
+
+
+def index_limit(index):
+    """ Returns how many lines the index may pick before a scan is cheaper """
+    return max(INDEX_SCAN_FRACTION, index["lines"] // INDEX_SCAN_FRACTION)
+
+
+def term_lines_of(index, flags, number):
+    """ Returns the lines of the number'th word, or None for a COMMON_TERM """
+    if flags[number] & COMMON_TERM:
+        return None
+    return postings_of(index, "term_postings", number)
+
+
+def token_lines(index, terms, token, limit):
+    """ Takes an index, its terms region and a search token, returns the set
+        of lines with a word containing the token, or a record number if it
+        is digits, or None if there are more than limit
+    """
+    found = set()
+    flags = None
+    for number in word_numbers(terms, token):
+        if flags is None:
+            flags = read_region(index, "flags")
+        lines = term_lines_of(index, flags, number)
+        if lines is None:
+            return None
+        found.update(lines)
+        if len(found) > limit:
+            return None
+    if token.isdigit():
+        for number in word_numbers(read_region(index, "numbers"), token):
+            found.add(number)
+            if len(found) > limit:
+                return None
+    return found
+
+
+def term_candidates(index, tokens):
+    """ Takes an index and search tokens, returns the set of lines having, for
+        every token, a word that contains it, or None if no token narrows
+        the lines down to index_limit()
+    """
+    limit       = index_limit(index)
+    terms       = read_region(index, "terms")
+    candidates  = None
+    for token in tokens:
+        found = token_lines(index, terms, token, limit)
+        if found is None:
+            continue
+        candidates = found if candidates is None else candidates & found
+        if not candidates:
+            return set()
+    return candidates
+
+
+def search_index(filename, _list_type, search):
+    """ Takes a data file and a search string, yields the matching lines in file order
+        A search with no word characters, or whose words are on too many
+        lines to narrow it down, scans the file.
+    """
+    tokens      = tokenize(search)
+    index       = load_index(filename, _list_type) if tokens else None
+    candidates  = None if index is None else term_candidates(index, tokens)
+    if candidates is None:
+        yield from scan_file(filename, search)
+        return
+
+    # The index narrows the field, the substring test keeps today's results
+    needle  = search.lower()
+    matches = lambda line: needle in line.lower()
+    for line in read_candidates(filename, index, candidates, matches):
+        if matches(line):
+            yield line
+
+
+def read_candidates(filename, index, candidates, matches):
+    """ Takes a data file, its index, a set of lines and a test of a line,
+        yields those lines, then the ones the index doesn't cover, in file
+        order with the change log applied. A changed record is yielded as it
+        now reads if it passes the test.
+    """
+    for _, line in apply_changes(read_offsets(filename, index, candidates), read_log(filename), matches):
+        yield line
+
+
+def read_offsets(filename, index, lines):
+    """ Takes a data file, its index and a set of lines, yields (offset, line)
+        for each as the data file has it, then for the lines after what the
+        index covers, in file order
+    """
+    if lines:
+        numbers = sorted(lines)
+        if len(numbers) * 1024 < index["lines"]:
+            offsets = [read_region(index, "offsets", "q", number, 1)[0] for number in numbers]
+        else:
+            every   = read_region(index, "offsets", "q")
+            offsets = [every[number] for number in numbers]
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in offsets:
+                yield offset, mm[offset:mm.find(b"\n", offset)].decode(ENCODING).strip()
+    yield from unindexed_lines(filename, index)
+
+
+def unindexed_lines(filename, index):
+    """ Yields (offset, line) for the lines after what the index covers """
+    offset = index["stamp"][2]
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    for raw in data.split(b"\n"):
+        line = raw.decode(ENCODING).strip()
+        if len(line) > 0 and not line.startswith("#"):
+            yield offset, line
+        offset += len(raw) + 1
+
+
+def bisect_region(index, name, key, right=False):
+    """ Takes an index, an array("q") region and a key, returns where key
+        goes in the region like bisect_left(), or bisect_right() if right.
+        The items are a fixed 8 bytes, so only the ones probed are read.
+    """
+    start, length   = index["regions"][name]
+    start          += index["base"]
+    low, high       = 0, length // 8
+    with contextlib.ExitStack() as stack:
+        if "data" in index:
+            read = lambda number: index["data"][start + number * 8:start + number * 8 + 8]
+        else:
+            f = stack.enter_context(open(index["path"], 'rb'))
+            read = lambda number: os.pread(f.fileno(), 8, start + number * 8)
+        while low < high:
+            middle  = (low + high) // 2
+            item    = array("q", read(middle))[0]
+            if item < key or (right and item == key):
+                low = middle + 1
+            else:
+                high = middle
+    return low
+
+
+def key_bounds(index, field, op, key):
+    """ Returns (start, end), where the values of an INT_FIELDS field that
+        compare with key by op, one of =, >=, >, <=, <, are in its sorted keys
+    """
+    region  = field + ".keys"
+    start   = 0
+    end     = index["regions"][region][1] // 8
+    if op in ("=", ">="):
+        start = bisect_region(index, region, key)
+    elif op == ">":
+        start = bisect_region(index, region, key, right=True)
+    if op in ("=", "<="):
+        end = bisect_region(index, region, key, right=True)
+    elif op == "<":
+        end = bisect_region(index, region, key)
+    return start, end
+
+
+def sorted_lines(index, field, start, end):
+    """ Returns the set of lines of an INT_FIELDS field's sorted keys from start to end """
+    return set(read_region(index, field + ".lines", "I", start, max(0, end - start)))
+
+
+def record_lines(filename, _list_type, record_number):
+    """ Takes a data file and a record number, returns [(offset, line)] for
+        the records with that number, in file order with the change log applied.
+        A missing number (None) or a flag (True/False) matches no record.
+    """
+    if record_number is None or isinstance(record_number, bool):
+        return []
+    index   = load_index(filename, _list_type)
+    matches = lambda line: record_number_of(line) == record_number
+    lines   = sorted_lines(index, "record_number", *key_bounds(index, "record_number", "=", record_number))
+    hits    = read_offsets(filename, index, lines)
+    return [(offset, line) for offset, line in apply_changes(hits, read_log(filename), matches) if matches(line)]
+
+
+def find_record(filename, _list_type, record_number):
+    """ Takes a data file and a record number, returns (offset, line) for the
+        last record with that number, the offset where it starts in the data
+        file, or (None, None)
+    """
+    found = record_lines(filename, _list_type, record_number)
+    return found[-1] if found else (None, None)
+
+
+# A field query is a list of words: field=value, field!=value, or a range
+# like last_contact>=20230401 on a number or date field. A word without an
+# operator is a substring search, as -s does. parse_query() turns the words
+# into (field, op, key) clauses, compile_query() into a test for a line, and
+# query_index() answers them from the index in O(log n + k) where it can.
+
+def field_key(field, value):
+    """ Takes a field and a value, returns the value as queries compare it
+        active is "y" or "n", record numbers are ints, contact dates are
+        YYYYMMDD ints (None if the value isn't one) and text is lowercase.
+    """
+    if field == "active":
+        return "y" if is_yes(value) else "n"
+    if field in INT_FIELDS:
+        if not INT_RE.fullmatch(value) or (field in DATE_FIELDS and len(value) != 8):
+            return None
+        return int(value)
+    return value.lower()
+
+
+def parse_query(query, fields):
+    """ Takes a query string and the fields it may use, returns a list of
+        (field, op, key) clauses, field None for a substring search.
+        Raises ValueError naming the problem if the query doesn't make sense.
+    """
+    try:
+        words = shlex.split(query)
+    except ValueError as e:
+        raise ValueError("can't read query: {}".format(e))
+    clauses = []
+    for word in words:
+        match = QUERY_RE.fullmatch(word)
+        if match is None:
+            clauses.append((None, "~", word.lower()))
+            continue
+        field, op, value = match.groups()
+        if field not in fields:
+            raise ValueError("unknown field {!r}, use one of {}".format(field, ", ".join(fields)))
+        if op in RANGE_OPS and field not in INT_FIELDS:
+            raise ValueError("{} can't be compared with {}, only {}".format(
+                             field, op, ", ".join(f for f in fields if f in INT_FIELDS)))
+        key = field_key(field, value.strip())
+        if key is None:
+            raise ValueError("{} {!r} is not a {}".format(
+                             field, value, "YYYYMMDD date" if field in DATE_FIELDS else "whole number"))
+        clauses.append((field, op, key))
+    return clauses
+
+
+def compile_query(clauses, fields):
+    """ Takes parsed clauses, returns a function of a record line that is True
+        when the line satisfies all of them
+    """
+    tests = []
+    for field, op, key in clauses:
+        if field is None:
+            tests.append((None, None, key))
+        else:
+            tests.append((fields.index(field), QUERY_OPS[op], key))
+
+    def matches(line):
+        values = string_to_list(line)
+        for idx, compare, key in tests:
+            if idx is None:
+                if key not in line.lower():
+                    return False
+                continue
+            if idx >= len(values):
+                return False
+            value = field_key(fields[idx], values[idx])
+            if value is None or not compare(value, key):
+                return False
+        return True
+
+    return matches
+
+
+def clause_candidates(index, field, op, key):
+    """ Returns the set of lines the index says may satisfy a clause, or None
+        if the index can't narrow it down
+    """
+    if field is None:
+        tokens = tokenize(key)
+        return term_candidates(index, tokens) if tokens else None
+    if field + ".keys" in index["regions"] and op != "!=":
+        start, end = key_bounds(index, field, op, key)
+        return sorted_lines(index, field, start, end) if end - start <= index_limit(index) else None
+    if field + ".values" in index["regions"] and op == "=":
+        number = word_number(read_region(index, field + ".values"), key)
+        return set() if number is None else set(postings_of(index, field + ".postings", number))
+    return None
+
+
+def query_index(filename, _list_type, clauses):
+    """ Takes a data file and parsed clauses, yields the matching lines in file order
+        The clauses the index can answer pick the candidates, smallest first,
+        and every candidate is tested against all clauses. If none can, the
+        whole file is read.
+    """
+    fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+    matches = compile_query(clauses, fields)
+    index   = load_index(filename, _list_type)
+    found   = [clause_candidates(index, *clause) for clause in clauses]
+    found   = sorted((candidates for candidates in found if candidates is not None), key=len)
+    if found:
+        candidates = set(found[0])
+        for other in found[1:]:
+            candidates &= other
+        lines = read_candidates(filename, index, candidates, matches)
+    else:
+        lines = read_lines(filename)
+    for line in lines:
+        if matches(line):
+            yield line
+
+
+def select_index(filename, _list_type, ranges):
+    """ Takes a data file and sorted (first, last) record number ranges, yields
+        the lines of the records in them in file order, found by bisecting
+        the index's sorted record numbers
+    """
+    index       = load_index(filename, _list_type)
+    candidates  = set()
+    for first, last in ranges:
+        start   = key_bounds(index, "record_number", ">=", first)[0]
+        end     = key_bounds(index, "record_number", "<=", last)[1]
+        candidates.update(sorted_lines(index, "record_number", start, end))
+    matches = lambda line: in_ranges(ranges, record_number_of(line))
+    for line in read_candidates(filename, index, candidates, matches):
+        if matches(line):
+            yield line
+
+
+# Fuzzy search matches words spelled differently from the search, "harry"
+# finds "Hary". The trigram index (data/pocs.txt.tri) lists every distinct
+# word the search index has in FUZZY_FIELDS, and for each trigram of a
+# word padded with spaces, the ids of the words having it, saved as the
+# bytes of an array("i"). A search word's trigrams pick the candidate words,
+# those sharing enough of them are scored by Jaccard similarity, the search
+# index's postings turn the close ones into records, and each record is
+# scored by the close words it holds. The words are
+# taken from the search index, so a stale trigram index is rebuilt without
+# reading the data file.
+
+def trigrams(word):
+    """ Takes a word, returns the set of its character trigrams
+        Padding counts the start of the word twice and the end once.
+    """
+    padded = "  {} ".format(word)
+    return {padded[idx:idx + 3] for idx in range(len(padded) - 2)}
+
+
+def trigram_path(filename):
+    """ Takes a data filename, returns the path of its trigram index """
+    return filename + FUZZY_SUFFIX
+
+
+def build_trigrams(words):
+    """ Takes words, returns a trigram index of the distinct ones """
+    words   = sorted(set(words))
+    sizes   = array("i")
+    grams   = {}
+    for word_id, word in enumerate(words):
+        word_grams = trigrams(word)
+        sizes.append(len(word_grams))
+        for gram in word_grams:
+            grams.setdefault(gram, array("i")).append(word_id)
+    return {
+        "version":  FUZZY_VERSION,
+        "words":    words,
+        "sizes":    sizes,
+        "grams":    {gram: word_ids.tobytes() for gram, word_ids in grams.items()},
+        }
+
+
+def load_trigrams(filename, index):
+    """ Takes a data file and its up to date search index, returns the trigram
+        index of its words, rebuilding it if the search index has changed since
+    """
+    trigram_index = read_cache(trigram_path(filename), FUZZY_VERSION, index["stamp"])
+    if trigram_index is not None:
+        trigram_index["sizes"] = array("i", trigram_index["sizes"])
+        return trigram_index
+    terms           = read_region(index, "terms").decode(ENCODING).split("\n")[1:-1]
+    trigram_index   = build_trigrams(term for term, flags in zip(terms, read_region(index, "flags"))
+                                     if flags & FUZZY_TERM)
+    save_cache(trigram_path(filename), dict(trigram_index, sizes=trigram_index["sizes"].tobytes()), index["stamp"])
+    return trigram_index
+
+
+def similar_words(trigram_index, word, threshold=FUZZY_THRESHOLD):
+    """ Takes a trigram index and a word, yields (indexed word, similarity)
+        for each indexed word at least threshold similar to it
+    """
+    grams   = trigrams(word)
+    shared  = collections.Counter()
+    for gram in grams:
+        word_ids = trigram_index["grams"].get(gram)
+        if word_ids is not None:
+            shared.update(array("i", word_ids))
+    # the union is at least len(grams), so fewer shared trigrams can't reach the threshold
+    least   = threshold * len(grams)
+    words   = trigram_index["words"]
+    sizes   = trigram_index["sizes"]
+    for word_id, common in shared.items():
+        if common >= least:
+            similarity = common / (len(grams) + sizes[word_id] - common)
+            if similarity >= threshold:
+                yield words[word_id], similarity
+
+
+def fuzzy_words(line, fields):
+    """ Takes a record line, returns the set of words in its FUZZY_FIELDS """
+    words = set()
+    for idx, value in enumerate(string_to_list(line)):
+        if fields[min(idx, len(fields) - 1)] in FUZZY_FIELDS:
+            words |= tokenize(value)
+    return words
+
+
+def similar_to_search(trigram_indexes, search, threshold=FUZZY_THRESHOLD):
+    """ Takes trigram indexes and a search, returns a {word: similarity} of
+        the close words from any of them for each of the search's words
+    """
+    similar = []
+    for token in sorted(tokenize(search)):
+        close = {}
+        for trigram_index in trigram_indexes:
+            close.update(similar_words(trigram_index, token, threshold))
+        similar.append(close)
+    return similar
+
+
+def fuzzy_score(similar, words, threshold=FUZZY_THRESHOLD):
+    """ Takes similar_to_search() and a record's words, returns the mean over
+        the search's words of the similarity of the record's closest word,
+        or None if that is below threshold
+    """
+    if not similar:
+        return None
+    score = sum(max([close[word] for word in words if word in close], default=0.0)
+                for close in similar) / len(similar)
+    return score if score >= threshold else None
+
+
+def fuzzy_lines(lines, fields, similar, threshold=FUZZY_THRESHOLD):
+    """ Takes lines and similar_to_search(), returns (score, line) for the
+        lines close enough, best first and in file order among equals
+    """
+    scored = ((fuzzy_score(similar, fuzzy_words(line, fields), threshold), line) for line in lines)
+    return sorted(((score, line) for score, line in scored if score is not None), key=lambda pair: -pair[0])
+
+
+def fuzzy_index(filename, _list_type, search, threshold=FUZZY_THRESHOLD):
+    """ Takes a data file and a search, returns (score, line) for each record
+        with words like the search's, best first and in file order among equals
+        The index's postings find the records holding a close word, records in
+        the change log or after what the index covers are scored as they read.
+    """
+    fields          = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+    index           = load_index(filename, _list_type)
+    new_lines       = [line for _, line in read_log(filename).values() if line is not None]
+    new_lines      += [line for _, line in unindexed_lines(filename, index)]
+    new_words       = set()
+    for line in new_lines:
+        new_words |= fuzzy_words(line, fields)
+    similar         = similar_to_search([load_trigrams(filename, index), build_trigrams(new_words)],
+                                        search, threshold)
+    terms           = read_region(index, "terms")
+    flags           = read_region(index, "flags")
+    candidates      = set()
+    for word in {word for close in similar for word in close}:
+        number = word_number(terms, word)
+        if number is not None:
+            lines = term_lines_of(index, flags, number)
+            if lines is None:
+                candidates = None
+                break
+            candidates.update(lines)
+    if candidates is None:
+        # a close word is on too many lines to pick them out, every record is scored
+        lines = read_lines(filename)
+    else:
+        # changed and unindexed records are all scored, they may have a close word
+        lines = read_candidates(filename, index, candidates, lambda line: True)
+    return fuzzy_lines(lines, fields, similar, threshold)
+
+
+def fuzzy_records(filename, _list_type, search, store=None):
+    """ Takes a data file and a search, yields (score, Job or POC) for the
+        records with words like the search's, best first
+    """
+    for score, line in open_engine(filename, _list_type).fuzzy(search):
+        yield score, builder(line, _list_type, store)
+
+
+# Updates and deletes never rewrite the data file. They are appended to a
+# change log (data/jobs.txt.log), which starts with the device and inode
+# of the data file it was written for, then has one entry per line:
+#     stamp; <device>; <inode>
+#     update; <offset>; <old crc32>; <crc32>; <new record line>
+#     delete; <offset>; <old crc32>; <crc32>; <record number>
+# offset is where the record sits in the data file, old crc32 covers the
+# line it replaced and crc32 the last field, so a torn write is skipped.
+# An entry only applies while the line at its offset, with the entries
+# before it applied, is that record and still has that crc32, and a log
+# stamped for another file is ignored, so a data file replaced or edited
+# behind the log's back never has the wrong records changed. Readers apply
+# the log as they go, and compact() folds it back into the data file.
+
+# Writers serialise on an fcntl.flock() of data/jobs.txt.lock. flock locks
+# belong to an open file, so a second thread in the same process waits like
+# any other writer, while nested calls in one thread reuse the lock they hold.
+
+_held_locks = set()
+
+
+@contextlib.contextmanager
+def locked(filename):
+    """ Holds filename's exclusive write lock for the duration of the block """
+    key = (filename, threading.get_ident())
+    if key in _held_locks:
+        yield
+        return
+    with open(filename + LOCK_SUFFIX, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        _held_locks.add(key)
+        try:
+            yield
+        finally:
+            _held_locks.discard(key)
+            # closing the file releases the flock
+
+
+def commit_change(filename, _list_type, old_line, new_line):
+    """ Logs old_line's record as replaced by new_line, or deleted if new_line is None
+        Returns False, changing nothing, if the record no longer reads old_line,
+        meaning another writer got there first.
+    """
+    with summarised_write(filename) as changes:
+        for offset, current_line in record_lines(filename, _list_type, record_number_of(old_line)):
+            if current_line == old_line:
+                log_change(filename, offset, old_line, new_line)
+                changes.append((old_line, new_line))
+                return True
+    return False
+
+
+def log_path(filename):
+    """ Takes a data filename, returns the path of its change log """
+    return filename + LOG_SUFFIX
+
+
+def log_stamp(filename):
+    """ Takes a data file, returns the first line of a change log written for
+        it as it is now, or None if it is missing
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return "stamp; {}; {}\n".format(stat.st_dev, stat.st_ino)
+
+
+def line_crc(line):
+    """ Takes a record line, returns the crc32 a log entry keeps of it """
+    return "{:08x}".format(zlib.crc32(line.encode(ENCODING)))
+
+
+def read_log(filename):
+    """ Takes a data file, returns {offset: (record_number, line)} from its change
+        log, offset being where the record's line starts in the data file.
+        Later entries win, and a deleted record's line is None. Entries that
+        don't match the line at their offset are skipped, and a log written
+        for another data file is ignored.
+    """
+    changes = {}
+    try:
+        f = open(log_path(filename), 'r', encoding=ENCODING)
+    except FileNotFoundError:
+        return changes
+    with f:
+        if f.readline() != log_stamp(filename):
+            return changes
+        entries = [change for change in map(parse_log_entry, f) if change is not None]
+    if not entries or os.path.getsize(filename) == 0:
+        return changes
+    current = {}
+    with open(filename, 'rb') as data, mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for record_number, offset, old_crc, line in entries:
+            if offset not in current:
+                end             = mm.find(b"\n", offset)
+                current[offset] = mm[offset:len(mm) if end == -1 else end].decode(ENCODING).strip()
+            now = current[offset]
+            if now is None or record_number_of(now) != record_number or line_crc(now) != old_crc:
+                continue
+            current[offset] = line
+            changes[offset] = (record_number, line)
+    return changes
+
+
+def parse_log_entry(entry):
+    """ Takes a change log entry, returns (record_number, offset, old crc32, line),
+        line None for a delete, or None if the entry is torn or unknown
+    """
+    parts = entry.rstrip("\n").split("; ", 4)
+    if len(parts) != 5 or line_crc(parts[4]) != parts[3] or not parts[1].isdigit():
+        return None
+    op, offset, old_crc, payload = parts[0], int(parts[1]), parts[2], parts[4]
+    if op == "update":
+        return record_number_of(payload), offset, old_crc, payload
+    if op == "delete" and payload.isdigit():
+        return int(payload), offset, old_crc, None
+    return None
+
+
+def log_change(filename, offset, old_line, new_line):
+    """ Logs old_line's record, at offset in the data file, as replaced by
+        new_line, or deleted if new_line is None. The index is left alone,
+        readers apply the log over it. A log written for another data file
+        is started again.
+    """
+    record_number = record_number_of(old_line)
+    if new_line is None:
+        op, payload = "delete", str(record_number)
+    else:
+        op, payload = "update", new_line
+    entry = "{}; {}; {}; {}; {}\n".format(op, offset, line_crc(old_line), line_crc(payload), payload)
+    stamp = log_stamp(filename)
+    with open(log_path(filename), 'rb+' if os.path.exists(log_path(filename)) else 'wb+') as f:
+        if f.readline().decode(ENCODING, "replace") != stamp:
+            f.seek(0)
+            f.truncate()
+            entry = stamp + entry
+        # start on a fresh line if a previous write was torn
+        elif f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                entry = "\n" + entry
+        f.seek(0, os.SEEK_END)
+        f.write(entry.encode(ENCODING))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def compact(filename):
+    """ Folds the change log into the data file, returns False if there was no log
+        The merged file is written beside the original and renamed over it, so
+        a crash leaves either the old file and log or the new file.
+    """
+    with locked(filename):
+        return _compact(filename)
+
+
+def _compact(filename):
+    """ Does the work of compact() once the lock is held """
+    if not os.path.exists(log_path(filename)):
+        return False
+    _rewrite(filename, {})
+    return True
+
+
+def rewrite_changes(filename, changes):
+    """ Takes (old_line, new_line) changes, new_line None for a delete, and
+        applies them all in one pass that writes a new data file and renames
+        it over the old one. A record that no longer reads old_line is left
+        as it is. Returns the record numbers of the changes left alone, once
+        per change, so records sharing a number are counted apart.
+    """
+    edits = {}
+    for old_line, new_line in changes:
+        edits.setdefault(old_line, []).append(new_line)
+    with locked(filename):
+        return _rewrite(filename, edits)
+
+
+def _rewrite(filename, edits):
+    """ Writes filename again with its change log and edits, {old_line:
+        [new_line, ...]}, folded in, once the lock is held. Each new_line is
+        used by one line reading old_line, in file order. Returns the record
+        numbers of the edits that didn't find their old_line. The new
+        file's index is built by the next search that needs it, the follow-up
+        queue and statistics are patched with the edits made.
+    """
+    with summarised_write(filename) as changes:
+        log         = read_log(filename)
+        # deleted records keep their numbers, they are not handed out again
+        high_water  = get_next_record_number(filename) - 1
+        pending     = {old_line: list(new_lines) for old_line, new_lines in edits.items()}
+        tmp_path    = "{}.{}.tmp".format(filename, os.getpid())
+        offset      = 0
+        with open(filename, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for raw in src:
+                start   = offset
+                offset += len(raw)
+                line    = raw.decode(ENCODING).strip()
+                if len(line) == 0:
+                    continue
+                if not line.startswith("#"):
+                    if start in log:
+                        line = log[start][1]
+                        if line is None:
+                            continue
+                    if pending.get(line):
+                        new_line = pending[line].pop(0)
+                        changes.append((line, new_line))
+                        line = new_line
+                        if line is None:
+                            continue
+                dst.write(line.encode(ENCODING) + b"\n")
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, filename)
+        save_high_water(filename, high_water)
+        # the log is stamped for the old file, readers ignore it from here on
+        if os.path.exists(log_path(filename)):
+            os.remove(log_path(filename))
+    return [record_number_of(old_line) for old_line, new_lines in pending.items() for _ in new_lines]
+
+
+def maybe_compact(filename):
+    """ Compacts the data file once its change log passes COMPACT_LOG_BYTES """
+    signature = file_signature(log_path(filename))
+    if signature is not None and signature[0] >= COMPACT_LOG_BYTES:
+        compact(filename)
+
+
+class TailFollower:
+    """Follows a text data file and its change log as writers add to them
+
+    Each poll() reads only what was appended to either file since the last
+    one, from the byte offset it had reached, so its cost follows the size
+    of the change. A poll that finds a file replaced, truncated, modified
+    without growing, or changed in the TAIL_CHECK_BYTES before that offset
+    reads both files again from the start, the log's offsets pointing into
+    the data file.
+    """
+
+    def __init__(self, filename, _list_type):
+        self.filename   = filename
+        self._list_type = _list_type
+        # path -> (device, inode, size, mtime_ns, offset, crc32 before offset)
+        self.positions  = {filename: None, log_path(filename): None}
+
+    def unchanged(self, path):
+        """ Returns True if path still holds what was read of it """
+        position = self.positions[path]
+        if position is None:
+            return True
+        device, inode, size, mtime, offset, crc = position
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_dev, stat.st_ino) != (device, inode) or stat.st_size < offset:
+            return False
+        if (stat.st_size, stat.st_mtime_ns) == (size, mtime):
+            return True
+        # modified without growing means rewritten, not appended to
+        if stat.st_size <= size:
+            return False
+        with open(path, 'rb') as f:
+            start = max(0, offset - TAIL_CHECK_BYTES)
+            f.seek(start)
+            return zlib.crc32(f.read(offset - start)) == crc
+
+    def log_current(self):
+        """ Returns True if the change log was written for the data file as it is now """
+        try:
+            with open(log_path(self.filename), 'r', encoding=ENCODING) as f:
+                return f.readline() == log_stamp(self.filename)
+        except OSError:
+            return False
+
+    def read_tail(self, path):
+        """ Returns [(offset, line bytes)] for the whole lines appended to path
+            since the last read, a partly written last line is left for later
+        """
+        position = self.positions[path]
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self.positions[path] = None
+            return []
+        with f:
+            stat = os.fstat(f.fileno())
+            if position is not None and (stat.st_size, stat.st_mtime_ns) == position[2:4]:
+                return []
+            offset  = 0 if position is None else position[4]
+            f.seek(offset)
+            data    = f.read(stat.st_size - offset)
+            data    = data[:data.rfind(b"\n") + 1]
+            end     = offset + len(data)
+            start   = max(0, end - TAIL_CHECK_BYTES)
+            f.seek(start)
+            self.positions[path] = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns,
+                                    end, zlib.crc32(f.read(end - start)))
+        lines = []
+        for raw in data.split(b"\n")[:-1]:
+            lines.append((offset, raw))
+            offset += len(raw) + 1
+        return lines
+
+    def poll(self):
+        """ Returns (reloaded, {record number: line, None if deleted}) for the
+            records changed since the last poll, reloaded True if the files
+            were read from the start
+        """
+        reloaded = self.positions[self.filename] is None or not all(map(self.unchanged, self.positions))
+        if reloaded:
+            self.positions = dict.fromkeys(self.positions)
+        changes = {}
+        for _, raw in self.read_tail(self.filename):
+            line = raw.decode(ENCODING).strip()
+            if line and not line.startswith("#") and record_number_of(line) is not None:
+                changes[record_number_of(line)] = line
+        log = self.read_tail(log_path(self.filename))
+        if log and self.log_current():
+            for _, raw in log:
+                change = parse_log_entry(raw.decode(ENCODING))
+                if change is not None:
+                    changes[change[0]] = change[3]
+        return reloaded, changes
+
+
+class ReloadFollower:
+    """Follows a storage engine that can't be read from an offset, by loading
+    it again whenever the stat data of its files changes
+    """
+
+    def __init__(self, engine, paths):
+        self.engine     = engine
+        self.paths      = paths
+        self.signature  = None
+
+    def poll(self):
+        """ Returns (reloaded, {record number: line}) as TailFollower.poll() does """
+        signature = [file_signature(path) for path in self.paths]
+        if signature == self.signature:
+            return False, {}
+        self.signature = signature
+        return True, {record_number_of(line): line for line in self.engine.load()}
+
+
+def watch(sections, interval=WATCH_INTERVAL, polls=None):
+    """ Takes (label, _list_type, follower, matches) sections, matches a test of
+        a record line, prints each record as it comes to match, polling every
+        interval seconds until interrupted, or polls times
+    """
+    shown   = [{} for _ in sections]
+    rounds  = itertools.count() if polls is None else range(polls)
+    for poll in rounds:
+        if poll:
+            time.sleep(interval)
+        for (label, _list_type, follower, matches), seen in zip(sections, shown):
+            reloaded, changes = follower.poll()
+            if reloaded:
+                for record_number in [rn for rn in seen if rn not in changes]:
+                    del seen[record_number]
+            for record_number, line in changes.items():
+                if line is None or not matches(line):
+                    seen.pop(record_number, None)
+                elif seen.get(record_number) != line:
+                    seen[record_number] = line
+                    print_records([(label, builder(line, _list_type))])
+        sys.stdout.flush()
+
+
+# Everything above reads and writes ; separated text files. A storage engine
+# puts load/get/search/insert/update/delete behind one interface, so the
+# commands below work the same on a text file or an SQLite database, picked
+# by open_engine() from the file name.
+
+class TextEngine:
+    """Stores records as ; separated lines in a text file, the default engine"""
+    name = "text"
+
+    def __init__(self, filename, _list_type=None):
+        self.filename   = filename
+        self._list_type = _list_type
+
+    def load(self):
+        """ Returns every record line, with the change log applied """
+        return list(read_lines(self.filename))
+
+    def load_store(self):
+        """ Returns a RecordStore of every record """
+        return load_store(self.filename, self._list_type)
+
+    def get(self, record_number):
+        """ Returns the line of record_number, or None """
+        return find_record(self.filename, self._list_type, record_number)[1]
+
+    def search(self, search, use_index=True, workers=None):
+        """ Yields the lines containing search, in file order """
+        if search != "" and use_index:
+            return search_index(self.filename, self._list_type, search)
+        return scan_file(self.filename, search, workers)
+
+    def query(self, clauses):
+        """ Yields the lines matching parsed query clauses, in file order """
+        return query_index(self.filename, self._list_type, clauses)
+
+    def fuzzy(self, search, threshold=FUZZY_THRESHOLD):
+        """ Returns (score, line) for the records with words like the search's, best first """
+        return fuzzy_index(self.filename, self._list_type, search, threshold)
+
+    def follow(self):
+        """ Returns a follower whose poll() reports the records changed since the last """
+        return TailFollower(self.filename, self._list_type)
+
+    def insert(self, lines, renumber_taken=False):
+        """ Adds lines in one commit, returns them as written """
+        return append_lines(lines, self.filename, renumber_taken)
+
+    def update(self, old_line, new_line):
+        """ Replaces old_line, returns False if someone else changed it first """
+        return commit_change(self.filename, self._list_type, old_line, new_line)
+
+    def delete(self, old_line):
+        """ Deletes old_line, returns False if someone else changed it first """
+        return commit_change(self.filename, self._list_type, old_line, None)
+
+    def select(self, ranges):
+        """ Yields the lines of the records numbered in sorted (first, last) ranges, in file order """
+        return select_index(self.filename, self._list_type, ranges)
+
+    def change_many(self, changes):
+        """ Applies (old_line, new_line) changes, new_line None for a delete, in
+            one rewrite, returns the record numbers someone else changed first
+        """
+        return rewrite_changes(self.filename, changes)
+
+    def next_record_number(self):
+        return get_next_record_number(self.filename)
+
+    def set_high_water(self, high_water):
+        """ Makes sure record numbers up to high_water are never handed out """
+        with locked(self.filename):
+            save_high_water(self.filename, max(high_water, get_next_record_number(self.filename) - 1))
+
+    def compact(self):
+        return compact(self.filename)
+
+    def maybe_compact(self):
+        maybe_compact(self.filename)
+
+
+class SqliteEngine:
+    """Stores records in an SQLite database, one row per record
+
+    The records table has a column per field, with record_number an INTEGER
+    and the rest TEXT, and keeps file order in its id. record_number, company,
+    the name and the contact dates are indexed. When SQLite has the FTS5
+    trigram tokenizer, records_fts holds each whole line for substring
+    searches, and every match is checked again so results are the same as
+    the text engine's. Field queries become WHERE clauses that can use the
+    indexes, and are checked again the same way.
+    """
+    name = "sqlite"
+
+    def __init__(self, filename, _list_type=None):
+        self.filename = filename
+        with self.connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            stored = self.read_meta(conn, "list_type")
+            if stored is None:
+                if _list_type is None:
+                    raise ValueError("{} is not a job_seeker database".format(filename))
+                self.create(conn, _list_type)
+                stored = _list_type
+            self._list_type = stored
+            self.fields     = list(JOB_FIELDS if stored == "job" else POC_FIELDS)
+            self.fts        = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'records_fts'").fetchone() is not None
+
+    @contextlib.contextmanager
+    def connect(self):
+        """ Yields a connection in autocommit mode, closed afterwards """
+        import sqlite3
+        conn = sqlite3.connect(self.filename, timeout=60, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Yields a connection holding the database's write lock until the block ends """
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def create(self, conn, _list_type):
+        """ Creates the tables and indexes for _list_type records """
+        import sqlite3
+        fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+        columns = ", ".join('"{}" {}'.format(field, "INTEGER" if field == "record_number" else "TEXT")
+                            for field in fields)
+        conn.execute("CREATE TABLE records (id INTEGER PRIMARY KEY, {})".format(columns))
+        for field in ("record_number", "first_contact", "last_contact"):
+            conn.execute('CREATE INDEX records_{0} ON records ("{0}")'.format(field))
+        # names are matched without regard to case
+        for field in ("company", "name", "poc_name"):
+            if field in fields:
+                conn.execute('CREATE INDEX records_{0} ON records ("{0}" COLLATE NOCASE)'.format(field))
+        try:
+            conn.execute("CREATE VIRTUAL TABLE records_fts USING fts5(line, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            # no FTS5, or too old for the trigram tokenizer: searches read every row
+            pass
+        conn.execute("INSERT INTO meta VALUES ('list_type', ?)", (_list_type,))
+
+    def read_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def line_of(self, row):
+        """ Takes a records row without its id, returns the record line """
+        return "; ".join("" if value is None else str(value) for value in row)
+
+    def values_of(self, line):
+        """ Takes a record line, returns its values in field order """
+        return split_fields(line, self.fields)
+
+    def rows(self, conn, where="", params=()):
+        """ Yields (id, line) for the records rows matching where, in file order """
+        query = "SELECT * FROM records {} ORDER BY id".format(where)
+        for row in conn.execute(query, params):
+            yield row[0], self.line_of(row[1:])
+
+    def load(self):
+        """ Returns every record line """
+        with self.connect() as conn:
+            return [line for _, line in self.rows(conn)]
+
+    def load_store(self):
+        """ Returns a RecordStore of every record """
+        store = RecordStore(record_class(self._list_type))
+        for line in self.load():
+            store.append(self.values_of(line))
+        return store
+
+    def get(self, record_number):
+        """ Returns the line of record_number, or None """
+        if record_number is None or isinstance(record_number, bool):
+            return None
+        with self.connect() as conn:
+            return self.get_row(conn, record_number)[1]
+
+    def get_row(self, conn, record_number):
+        """ Returns (id, line) of record_number's row, or (None, None)
+            If the number is on several rows the last one wins, like the text index.
+        """
+        row = conn.execute("SELECT * FROM records WHERE record_number = ? ORDER BY id DESC LIMIT 1",
+                           (record_number,)).fetchone()
+        return (None, None) if row is None else (row[0], self.line_of(row[1:]))
+
+    def search(self, search, use_index=True, workers=None):
+        """ Yields the lines containing search, in file order """
+        needle = search.lower()
+        with self.connect() as conn:
+            if search == "":
+                rows = self.rows(conn)
+            elif self.fts and use_index and len(search) >= FTS_MIN_SEARCH:
+                phrase  = '"{}"'.format(search.replace('"', '""'))
+                rows    = self.rows(conn, "WHERE id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)",
+                                    (phrase,))
+            else:
+                rows = self.rows(conn)
+            for _, line in rows:
+                if needle in line.lower():
+                    yield line
+
+    def query(self, clauses):
+        """ Yields the lines matching parsed query clauses, in file order
+            The WHERE clause only has to let every match through, the clauses
+            themselves decide. NOCASE only folds ASCII, so other names aren't
+            left to it.
+        """
+        matches = compile_query(clauses, self.fields)
+        where   = []
+        params  = []
+        for field, op, key in clauses:
+            if field is None:
+                if self.fts and len(key) >= FTS_MIN_SEARCH:
+                    where.append("id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+                    params.append('"{}"'.format(key.replace('"', '""')))
+            elif field in INT_FIELDS:
+                if op != "!=":
+                    # dates are TEXT, for YYYYMMDD text order is date order
+                    where.append('"{}" {} ?'.format(field, op))
+                    params.append(key if field == "record_number" else str(key))
+            elif op == "=" and field != "active" and is_ascii(key):
+                where.append('"{}" = ? COLLATE NOCASE'.format(field))
+                params.append(key)
+        with self.connect() as conn:
+            rows = self.rows(conn, "WHERE " + " AND ".join(where) if where else "", params)
+            for _, line in rows:
+                if matches(line):
+                    yield line
+
+    def fuzzy(self, search, threshold=FUZZY_THRESHOLD):
+        """ Returns (score, line) for the records with words like the search's, best first
+            There is no trigram sidecar, the words are gathered from every row each time.
+        """
+        lines   = self.load()
+        words   = set()
+        for line in lines:
+            words |= fuzzy_words(line, self.fields)
+        similar = similar_to_search([build_trigrams(words)], search, threshold)
+        return fuzzy_lines(lines, self.fields, similar, threshold)
+
+    def follow(self):
+        """ Returns a follower whose poll() reports the records changed since the last
+            Any change to the database file or its write-ahead log reloads every row.
+        """
+        return ReloadFollower(self, [self.filename, self.filename + "-wal"])
+
+    def insert(self, lines, renumber_taken=False):
+        """ Adds lines in one transaction, returns them as written
+            With renumber_taken, record numbers are handed out as append_lines does.
+        """
+        placeholders = ", ".join("?" * len(self.fields))
+        with summarised_write(self.filename) as changes, self.transaction() as conn:
+            high_water  = self.high_water(conn)
+            written     = []
+            for line in lines:
+                record_number = record_number_of(line)
+                if renumber_taken and (record_number is None or record_number <= high_water):
+                    record_number   = high_water + 1
+                    line            = renumber(line, record_number)
+                if record_number is not None:
+                    high_water = max(high_water, record_number)
+                cursor = conn.execute("INSERT INTO records ({}) VALUES ({})".format(
+                                      ", ".join('"{}"'.format(field) for field in self.fields), placeholders),
+                                      self.values_of(line))
+                if self.fts:
+                    conn.execute("INSERT INTO records_fts (rowid, line) VALUES (?, ?)", (cursor.lastrowid, line))
+                written.append(line)
+            self.save_high_water(conn, high_water)
+            changes.extend((None, line) for line in written)
+        return written
+
+    def update(self, old_line, new_line):
+        """ Replaces old_line, returns False if someone else changed it first """
+        return self.change(old_line, new_line)
+
+    def delete(self, old_line):
+        """ Deletes old_line, returns False if someone else changed it first """
+        return self.change(old_line, None)
+
+    def change(self, old_line, new_line):
+        """ Replaces old_line's row with new_line, or deletes it if new_line is None """
+        with summarised_write(self.filename) as changes, self.transaction() as conn:
+            if not self.change_row(conn, old_line, new_line):
+                return False
+            changes.append((old_line, new_line))
+        return True
+
+    def change_row(self, conn, old_line, new_line):
+        """ Does the work of change() inside a transaction """
+        # the first row still reading old_line, so rows sharing a number change one by one
+        row_id = next((row_id for row_id, line in self.rows(conn, "WHERE record_number = ?",
+                                                            (record_number_of(old_line),))
+                       if line == old_line), None)
+        if row_id is None:
+            return False
+        if self.fts:
+            conn.execute("DELETE FROM records_fts WHERE rowid = ?", (row_id,))
+        if new_line is None:
+            conn.execute("DELETE FROM records WHERE id = ?", (row_id,))
+            return True
+        assignments = ", ".join('"{}" = ?'.format(field) for field in self.fields)
+        conn.execute("UPDATE records SET {} WHERE id = ?".format(assignments),
+                     self.values_of(new_line) + [row_id])
+        if self.fts:
+            conn.execute("INSERT INTO records_fts (rowid, line) VALUES (?, ?)", (row_id, new_line))
+        return True
+
+    def select(self, ranges):
+        """ Yields the lines of the records numbered in sorted (first, last) ranges, in file order """
+        if not ranges:
+            return
+        with self.connect() as conn:
+            if len(ranges) > SQLITE_MAX_RANGES:
+                for _, line in self.rows(conn, "WHERE typeof(record_number) = 'integer'"):
+                    if in_ranges(ranges, record_number_of(line)):
+                        yield line
+                return
+            where   = "WHERE " + " OR ".join(["record_number BETWEEN ? AND ?"] * len(ranges))
+            params  = [bound for first_last in ranges for bound in first_last]
+            for _, line in self.rows(conn, where, params):
+                yield line
+
+    def change_many(self, changes):
+        """ Applies (old_line, new_line) changes, new_line None for a delete, in
+            one transaction, returns the record numbers someone else changed first
+        """
+        left_alone = []
+        with summarised_write(self.filename) as made, self.transaction() as conn:
+            for old_line, new_line in changes:
+                if self.change_row(conn, old_line, new_line):
+                    made.append((old_line, new_line))
+                else:
+                    left_alone.append(record_number_of(old_line))
+        return left_alone
+
+    def high_water(self, conn):
+        """ Returns the highest record number ever handed out """
+        stored  = self.read_meta(conn, "high_water")
+        highest = conn.execute("SELECT MAX(record_number) FROM records WHERE typeof(record_number) = 'integer'").fetchone()[0]
+        return max(int(stored or 0), highest or 0)
+
+    def save_high_water(self, conn, high_water):
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('high_water', ?)", (str(high_water),))
+
+    def next_record_number(self):
+        with self.connect() as conn:
+            return self.high_water(conn) + 1
+
+    def set_high_water(self, high_water):
+        """ Makes sure record numbers up to high_water are never handed out """
+        with self.transaction() as conn:
+            self.save_high_water(conn, max(high_water, self.high_water(conn)))
+
+    def compact(self):
+        """ Rebuilds the database file without its free pages """
+        with self.connect() as conn:
+            conn.execute("VACUUM")
+        return True
+
+    def maybe_compact(self):
+        pass
+
+
+def is_ascii(text):
+    """ Takes a string, returns True if it is all ASCII """
+    try:
+        text.encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def query_records(filename, _list_type, query, store=None, include_archive=False):
+    """ Takes a data file and a field query, returns a generator of the
+        matching Job or POC objects, followed with include_archive by those
+        in its archive segments. Raises ValueError for a bad query.
+    """
+    fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+    clauses = parse_query(query, fields)
+    lines   = open_engine(filename, _list_type).query(clauses)
+    if include_archive:
+        lines = itertools.chain(lines, archive_lines(filename, compile_query(clauses, fields)))
+    return build_records(lines, _list_type, store)
+
+
+# Archiving keeps the data file small: cold jobs are moved to gzip segments
+# that later writes never touch, and only --include-archive reads them,
+# decompressing one segment at a time as it streams through.
+
+def archive_segments(filename):
+    """ Takes a data filename, returns the paths of its archive segments, oldest first """
+    directory, name = os.path.split(filename)
+    prefix          = name + ARCHIVE_SUFFIX + "."
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return []
+    return [os.path.join(directory, segment) for segment in sorted(names)
+            if segment.startswith(prefix) and segment.endswith(".gz") and segment[len(prefix):-3].isdigit()]
+
+
+def archive_lines(filename, matches=None):
+    """ Takes a data filename and a test of a line, yields the archived lines
+        passing it, or all of them, segment by segment
+    """
+    import gzip
+    for path in archive_segments(filename):
+        with gzip.open(path, 'rt', encoding=ENCODING) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and (matches is None or matches(line)):
+                    yield line
+
+
+def archive_jobs(filename, days=None):
+    """ Moves the inactive jobs, and given days those last contacted more than
+        that many days ago, to a new archive segment, returns (how many, segment path)
+        The segment is written before the jobs leave the data file, both under
+        the file's lock, so a job is never in neither.
+    """
+    import gzip
+    engine  = open_engine(filename, "job")
+    active  = JOB_FIELDS.index("active")
+    last    = JOB_FIELDS.index("last_contact")
+    cutoff  = None if days is None else int(convert_date(dt.now() - timedelta(days=days)))
+
+    def cold(line):
+        values  = split_fields(line, JOB_FIELDS)
+        contact = field_key("last_contact", values[last] or "")
+        return (is_inactive(values[active])
+                or (cutoff is not None and contact is not None and contact < cutoff))
+
+    with locked(filename):
+        lines = [line for line in engine.search("") if cold(line)]
+        if not lines:
+            return 0, None
+        segments    = archive_segments(filename)
+        number      = int(os.path.basename(segments[-1]).rsplit(".", 2)[1]) + 1 if segments else 1
+        path        = "{}{}.{:06d}.gz".format(filename, ARCHIVE_SUFFIX, number)
+        tmp_path    = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6) as stream:
+                for chunk in range(0, len(lines), 1000):
+                    stream.write("".join(line + "\n" for line in lines[chunk:chunk + 1000]).encode(ENCODING))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        engine.change_many([(line, None) for line in lines])
+    return len(lines), path
+
+
+def normalise_date(value):
+    """ Takes a contact date as typed, YYYYMMDD, YYYY-MM-DD, YYYYMM or just YYYY,
+        returns it as a YYYYMMDD int, a missing month or day taken as the first,
+        or None if it isn't a date
+    """
+    match = DUE_DATE_RE.fullmatch((value or "").strip())
+    if match is None:
+        return None
+    year, month, day = int(match.group(1)), int(match.group(2) or 1), int(match.group(3) or 1)
+    try:
+        dt(year, month, day)
+    except ValueError:
+        return None
+    return year * 10000 + month * 100 + day
+
+
+def date_of(date):
+    """ Takes a YYYYMMDD int, returns it as a datetime """
+    return dt(date // 10000, date // 100 % 100, date % 100)
+
+
+def follow_up_date(line, fields):
+    """ Takes a record line, returns the date its follow-up counts from, the last
+        contact or failing that the first, or None if it has neither or is a job
+        no longer active
+    """
+    values = dict(zip(fields, split_fields(line, fields)))
+    if "active" in values and is_inactive(values["active"]):
+        return None
+    return normalise_date(values["last_contact"]) or normalise_date(values["first_contact"])
+
+
+def due_path(filename):
+    """ Takes a data filename, returns the path of its follow-up queue """
+    return filename + DUE_SUFFIX
+
+
+def build_due_queue(lines, fields):
+    """ Takes record lines, returns their follow-up queue: record number -> date,
+        and a heap of (date, record number)
+    """
+    dates = {}
+    for line in lines:
+        record_number   = record_number_of(line)
+        date            = follow_up_date(line, fields)
+        if record_number is not None and date is not None:
+            dates[record_number] = date
+    heap = [(date, record_number) for record_number, date in dates.items()]
+    heapq.heapify(heap)
+    return {"version": DUE_VERSION, "fields": list(fields), "dates": dates, "heap": heap}
+
+
+def read_due_queue(filename, signature):
+    """ Returns filename's saved follow-up queue, or None if it wasn't saved
+        against signature or can't be read
+    """
+    return read_cache(due_path(filename), DUE_VERSION, signature)
+
+
+def load_due_queue(filename, _list_type):
+    """ Returns filename's follow-up queue, rebuilding it in one pass if the
+        file has changed since it was saved. The rebuild holds the lock, so no
+        write lands between reading the file and saving the queue.
+    """
+    queue = read_due_queue(filename, data_signature(filename))
+    if queue is not None:
+        return queue
+    with locked(filename):
+        signature   = data_signature(filename)
+        queue       = read_due_queue(filename, signature)
+        if queue is None:
+            fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+            queue   = build_due_queue(open_engine(filename, _list_type).search(""), fields)
+            save_cache(due_path(filename), queue, signature)
+    return queue
+
+
+def patch_due_queue(filename, changes, signature):
+    """ Takes (old_line, new_line) changes, old_line None for an insert and
+        new_line None for a delete, made to a data file whose signature was
+        signature just before, patches the file's follow-up queue if it was
+        up to date, returns True if it was
+        Replaced dates are left in the heap and skipped when read, until they
+        outnumber the live ones.
+    """
+    queue = read_due_queue(filename, signature)
+    if queue is None:
+        return False
+    dates = queue["dates"]
+    for old_line, new_line in changes:
+        record_number   = record_number_of(new_line if old_line is None else old_line)
+        date            = None if new_line is None else follow_up_date(new_line, queue["fields"])
+        if record_number is None or dates.get(record_number) == date:
+            continue
+        if date is None:
+            del dates[record_number]
+        else:
+            dates[record_number] = date
+            heapq.heappush(queue["heap"], (date, record_number))
+    if len(queue["heap"]) > 2 * len(dates) + DUE_TOP:
+        queue["heap"] = [(date, record_number) for record_number, date in dates.items()]
+        heapq.heapify(queue["heap"])
+    save_cache(due_path(filename), queue, data_signature(filename))
+    return True
+
+
+def due_entries(queue, cutoff):
+    """ Takes a follow-up queue, yields its (date, record number) entries dated on
+        or before cutoff, oldest first, reading only as much of the heap as that
+        takes rather than sorting it
+    """
+    heap, dates = queue["heap"], queue["dates"]
+    frontier    = [(heap[0], 0)] if heap else []
+    seen        = set()
+    while frontier:
+        (date, record_number), position = heapq.heappop(frontier)
+        if date > cutoff:
+            return
+        if dates.get(record_number) == date and record_number not in seen:
+            seen.add(record_number)
+            yield date, record_number
+        for child in (2 * position + 1, 2 * position + 2):
+            if child < len(heap):
+                heapq.heappush(frontier, (heap[child], child))
+
+
+def due_follow_ups(sections, days=DUE_DAYS, top=DUE_TOP, today=None):
+    """ Takes (label, _list_type, filename) sections, returns up to top
+        (days overdue, label, record) for the records last contacted more than
+        days ago, most overdue first
+    """
+    today       = today or dt.now()
+    cutoff      = int(convert_date(today - timedelta(days=days)))
+    entries     = []
+    for label, _list_type, filename in sections:
+        queue = load_due_queue(filename, _list_type)
+        entries.append([(date, label, _list_type, filename, record_number)
+                        for date, record_number in itertools.islice(due_entries(queue, cutoff), top)])
+    chosen      = list(itertools.islice(heapq.merge(*entries), top))
+    lines       = {}
+    for label, _list_type, filename in sections:
+        wanted = sorted(entry[4] for entry in chosen if entry[3] == filename)
+        if wanted:
+            for line in open_engine(filename, _list_type).select([(number, number) for number in wanted]):
+                lines[(filename, record_number_of(line))] = line
+    follow_ups  = []
+    for date, label, _list_type, filename, record_number in chosen:
+        line = lines.get((filename, record_number))
+        if line is not None:
+            overdue = (today - date_of(date)).days - days
+            follow_ups.append((overdue, label, builder(line, _list_type)))
+    return follow_ups
+
+
+def stats_path(filename):
+    """ Takes a data filename, returns the path of its statistics """
+    return filename + STATS_SUFFIX
+
+
+def tally(counts, key, amount):
+    """ Adds amount to counts[key], dropping the key once it comes to nothing """
+    counts[key] = counts.get(key, 0) + amount
+    if counts[key] == 0:
+        del counts[key]
+
+
+def count_record(stats, line, fields, sign=1):
+    """ Adds a record line to statistics, or given sign -1 takes it away """
+    values = dict(zip(fields, split_fields(line, fields)))
+    stats["records"] += sign
+    if "active" in values:
+        tally(stats["active"], "n" if is_inactive(values["active"]) else "y", sign)
+    tally(stats["companies"], (values["company"] or "").strip(), sign)
+    first, last = normalise_date(values["first_contact"]), normalise_date(values["last_contact"])
+    if first is not None:
+        tally(stats["months"], first // 100, sign)
+    if first is not None and last is not None:
+        stats["gap_days"]   += sign * (date_of(last) - date_of(first)).days
+        stats["gaps"]       += sign
+
+
+def count_records(lines, fields):
+    """ Takes record lines, returns their statistics: how many, active -> how
+        many, company -> how many, YYYYMM of first contact -> how many, and the
+        total days between first and last contact over the records with both
+    """
+    stats = {"version": STATS_VERSION, "fields": list(fields), "records": 0, "active": {}, "companies": {},
+             "months": {}, "gap_days": 0, "gaps": 0}
+    for line in lines:
+        if record_number_of(line) is not None:
+            count_record(stats, line, fields)
+    return stats
+
+
+def read_stats(filename, signature):
+    """ Returns filename's saved statistics, or None if they weren't saved
+        against signature or can't be read
+    """
+    return read_cache(stats_path(filename), STATS_VERSION, signature)
+
+
+def load_stats(filename, _list_type):
+    """ Returns filename's statistics, counting them again in one pass if the
+        file has changed since they were saved. The count holds the lock, as
+        the follow-up queue's rebuild does.
+    """
+    stats = read_stats(filename, data_signature(filename))
+    if stats is not None:
+        return stats
+    with locked(filename):
+        signature   = data_signature(filename)
+        stats       = read_stats(filename, signature)
+        if stats is None:
+            fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+            stats   = count_records(open_engine(filename, _list_type).search(""), fields)
+            save_cache(stats_path(filename), stats, signature)
+    return stats
+
+
+def patch_stats(filename, changes, signature):
+    """ Takes (old_line, new_line) changes, old_line None for an insert and
+        new_line None for a delete, made to a data file whose signature was
+        signature just before, patches the file's statistics if they were up
+        to date, returns True if they were
+    """
+    stats = read_stats(filename, signature)
+    if stats is None:
+        return False
+    for old_line, new_line in changes:
+        for line, sign in ((old_line, -1), (new_line, 1)):
+            if line is not None and record_number_of(line) is not None:
+                count_record(stats, line, stats["fields"], sign)
+    save_cache(stats_path(filename), stats, data_signature(filename))
+    return True
+
+
+def patch_summaries(filename, changes, signature):
+    """ Brings a data file's follow-up queue and statistics up to date with
+        (old_line, new_line) changes made under its lock, when they were up to
+        date with the file before them. No changes just moves them onto the
+        file's signature now, after a rewrite that changed no records.
+    """
+    patch_due_queue(filename, changes, signature)
+    patch_stats(filename, changes, signature)
+
+
+@contextlib.contextmanager
+def summarised_write(filename):
+    """ Holds filename's lock for a write and yields a list for the block to
+        add its (old_line, new_line) changes to, which then patch the file's
+        follow-up queue and statistics. If the block raises they are left
+        alone, to be counted again when next read.
+    """
+    with locked(filename):
+        signature   = data_signature(filename)
+        changes     = []
+        yield changes
+        patch_summaries(filename, changes, signature)
+
+
+def stats_drift(saved, counted):
+    """ Takes saved and freshly counted statistics, returns a line for each
+        number that differs
+    """
+    drift = []
+    for key in ("records", "gap_days", "gaps"):
+        if saved.get(key) != counted[key]:
+            drift.append("{}: saved {}, counted {}".format(key, saved.get(key), counted[key]))
+    for key in ("active", "companies", "months"):
+        saved_counts = saved.get(key, {})
+        for value in sorted(set(saved_counts) | set(counted[key]), key=str):
+            if saved_counts.get(value, 0) != counted[key].get(value, 0):
+                drift.append("{} {!r}: saved {}, counted {}".format(key, value, saved_counts.get(value, 0),
+                                                                    counted[key].get(value, 0)))
+    return drift
+
+
+def check_stats(filename, _list_type):
+    """ Counts filename's statistics again from scratch and saves them, returns
+        (state, drift): "checked" and the drift from the saved ones, or
+        "stale" if they were saved for the file as it was before some other
+        change, or "missing" if there were none, with no drift for either
+    """
+    with locked(filename):
+        signature   = data_signature(filename)
+        saved       = read_cache(stats_path(filename), STATS_VERSION, signature)
+        stale       = saved is None and os.path.exists(stats_path(filename))
+        fields      = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+        counted     = count_records(open_engine(filename, _list_type).search(""), fields)
+        save_cache(stats_path(filename), counted, signature)
+    if saved is None:
+        return ("stale" if stale else "missing"), []
+    return "checked", stats_drift(saved, counted)
+
+
+def print_stats(job_stats, poc_stats):
+    """ Prints the pipeline statistics of the jobs and contacts """
+    active, inactive = job_stats["active"].get("y", 0), job_stats["active"].get("n", 0)
+    print(f"Jobs: {job_stats['records']}, active {active}, inactive {inactive}"
+          + (f" ({active / (active + inactive):.0%} active)" if active + inactive else ""))
+    print(f"Contacts: {poc_stats['records']}")
+    for label, stats in (("jobs", job_stats), ("contacts", poc_stats)):
+        if stats["gaps"]:
+            print(f"Average days from first to last contact, {label}: {stats['gap_days'] / stats['gaps']:.1f}")
+    print("\nApplications per company:")
+    for company, count in sorted(job_stats["companies"].items(), key=lambda item: (-item[1], item[0])):
+        print(f"{count:>8}  {company or '(none)'}")
+    print("\nContacts per month, by first contact:")
+    for month, count in sorted(poc_stats["months"].items()):
+        print(f"{count:>8}  {month // 100}-{month % 100:02d}")
+
+
+# --dedupe finds the contacts that are the same person by the keys two of
+# their records would share, grouping them in one pass over the contacts,
+# and merges each group into its first record in one rewrite.
 
+def contact_keys(values, fields):
+    """ Takes a contact's values, yields the keys two records of the same
+        person would share: the email in lowercase, the last ten digits of
+        the phone, and the name together with the company, since a name
+        alone is shared by different people
+    """
+    data    = dict(zip(fields, values))
+    email   = (data.get("email") or "").strip().lower()
+    if "@" in email:
+        yield "email", email
+    digits  = "".join(filter(str.isdigit, data.get("phone") or ""))
+    if len(digits) >= MIN_PHONE_DIGITS:
+        yield "phone", digits[-10:]
+    name    = normalise_name(data.get("name") or "")
+    if name:
+        yield "name", name, normalise_name(data.get("company") or "")
 
-class Job:
-    """Stores the job req data"""
-    def __init__(self, job_data={}):
-        
-        for field in JOB_FIELDS:
-            setattr(self, field, job_data.get(field, None))
 
-        # Set default values for specific attributes
-        self.active = job_data.get("active", "y")
-        self.last_contact = job_data.get("last_contact", convert_date(dt.now()))
-        self.first_contact = job_data.get("first_contact", convert_date(dt.now()))
+def duplicate_groups(lines, fields):
+    """ Takes contact lines, returns the groups of lines that share a key, in
+        file order. One pass buckets every key by the first line having it,
+        and lines sharing a key are joined with union-find, so groups chain
+        through any key.
+    """
+    seen    = []
+    parent  = []
+    owners  = {}
 
+    def find(row):
+        while parent[row] != row:
+            parent[row]     = parent[parent[row]]
+            row             = parent[row]
+        return row
 
-    def __str__(self):
-        field_values = ["{}: {}".format(field, getattr(self, field)) for field in JOB_FIELDS]
-        return "\n".join(field_values)
+    for row, line in enumerate(lines):
+        seen.append(line)
+        parent.append(row)
+        for key in contact_keys(split_fields(line, fields), fields):
+            owner = owners.setdefault(key, row)
+            if owner != row:
+                first, second = sorted((find(owner), find(row)))
+                parent[second] = first
+    groups = {}
+    for row, line in enumerate(seen):
+        groups.setdefault(find(row), []).append(line)
+    return [group for group in groups.values() if len(group) > 1]
 
 
-class POC:
-    """Stores the contact info for each Point of Contact"""
+def merge_contacts(lines, fields):
+    """ Takes the lines of one person's records, returns the first with its
+        empty or Null fields filled from the others, the earliest
+        first_contact and the latest last_contact
+    """
+    rows    = [split_fields(line, fields) for line in lines]
+    merged  = list(rows[0])
+    for values in rows[1:]:
+        for idx, value in enumerate(values):
+            if merged[idx] in (None, "", "Null") and value not in (None, ""):
+                merged[idx] = value
+    # dates are compared as --due reads them, the one picked is kept as typed
+    for field, pick in (("first_contact", min), ("last_contact", max)):
+        idx     = fields.index(field)
+        dates   = [(normalise_date(values[idx]), values[idx]) for values in rows]
+        dates   = [date for date in dates if date[0] is not None]
+        if dates:
+            merged[idx] = pick(dates)[1]
+    return "; ".join("Null" if value is None else value for value in merged)
 
-    def __init__(self, data={}):
 
-        for field in POC_FIELDS:
-            setattr(self, field, data.get(field, None))
+def dedupe_contacts(file):
+    """ Reports the groups of POC records that are the same person and,
+        once confirmed, merges each into its first record in one rewrite
+    """
+    engine  = open_engine(file, "poc")
+    groups  = duplicate_groups(engine.search(""), POC_FIELDS)
+    if not groups:
+        print("No duplicate contacts found")
+        return
+    changes = []
+    for group in groups:
+        merged = merge_contacts(group, POC_FIELDS)
+        print("Duplicates:")
+        for line in group:
+            print(line)
+        print(f"Merged:\n{merged}\n")
+        if merged != group[0]:
+            changes.append((group[0], merged))
+        changes.extend((line, None) for line in group[1:])
+    duplicates = sum(len(group) - 1 for group in groups)
+    if not is_yes(input(f"Merge these {len(groups)} group(s), removing {duplicates} duplicate(s)? ")):
+        print("Merge cancelled")
+        return
+    left_alone = engine.change_many(changes)
+    print(f"Merged {len(groups)} group(s)")
+    if left_alone:
+        print(f"{len(left_alone)} changed by someone else and left alone: {', '.join(map(str, sorted(left_alone)))}")
 
-        # Set default values for specific attributes
-        self.first_contact = data.get("first_contact", convert_date(dt.now()))
-        self.last_contact = data.get("last_contact", convert_date(dt.now()))
 
-    def __str__(self):
-        """Returns a formatted string with the POC info"""
-        field_values = ["{}: {}".format(field, getattr(self, field)) for field in POC_FIELDS]
-        return "\n".join(field_values)
-    
+# --join matches each job's poc_name to a contact with one pass over the
+# contacts to build a hash table, then one pass over the jobs, so it costs
+# O(jobs + contacts) rather than comparing every job with every contact.
 
-def list_from_file(filename):
-    """Takes a file, removes comments/empty lines, and returns a list of each line."""
-    lines = []
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if len(line) > 0 and not line.startswith("#"):
-                lines.append(line)
-    return lines
+def normalise_name(name):
+    """ Takes a name, returns it lowercase with single spaces, "" for no name """
+    name = " ".join(str(name).casefold().split())
+    return "" if name in ("null", "none", "n/a") else name
 
 
-def is_yes(prompt):
-    """ Takes a prompt, returns True/False based on user input """
-    yes_choices = ["y", "yes", "yep", "yeah", "yup", "sure", "ok", "okay"]
-    return prompt.lower() in yes_choices
+def contact_table(pocs):
+    """ Takes POC records, returns {normalised name: (POC, {normalised company: POC})}
+        Where several contacts share a name, or a name and company, the one
+        contacted last is kept, so a lookup never has to choose between them.
+    """
+    table = {}
+    for poc in pocs:
+        name = normalise_name(poc.name)
+        if not name:
+            continue
+        company         = normalise_name(poc.company)
+        best, companies = table.get(name, (None, {}))
+        companies[company] = later_contact(companies.get(company), poc)
+        table[name]     = (later_contact(best, poc), companies)
+    return table
 
 
-def convert_date(date):
-    """ Takes a datetime.datetime object and returns a YYYYMMDD string """
-    return "{}{:0>2}{:0>2}".format(date.year, date.month, date.day)
+def later_contact(current, poc):
+    """ Returns whichever of two POCs was contacted last, current on a tie
+        The dates are compared with normalise_date(), one that isn't a date
+        counting as earliest.
+    """
+    if current is None or (normalise_date(poc.last_contact) or 0) > (normalise_date(current.last_contact) or 0):
+        return poc
+    return current
 
 
-def builder(line, _list_type):
-    """ Takes a line from a file and returns a Job or POC object """
-    _list = string_to_list(line)
-    
-    if _list_type == "job":
-        _fields = JOB_FIELDS
-    else:
-        _fields = POC_FIELDS
-    
-    data = {field: _list[idx] for idx, field in enumerate(_fields)}
-    if _list_type == "job":
-        return Job(data)
-    else:
-        return POC(data)
-    
+def find_contact(table, name, company):
+    """ Returns the POC in table for a job's poc_name and company, or None
+        A contact of that name at the job's company wins over one elsewhere.
+    """
+    entry = table.get(normalise_name(name))
+    if entry is None:
+        return None
+    best, companies = entry
+    return companies.get(normalise_name(company), best)
 
 
-def parse_list(_list, _list_type, search, _option=None):
-    """ Takes a list of strings, and the element to search, and returns a list of RECORDS that match search term"""
-    """ If _option is not None, then we are searching for a specific record number"""
-    """ If _option is None, then we return the entire list of records"""
-    items = []
-    
-    if _option is not None:
-        for element in _list:
-            if int(element.split(";")[0]) == search:
-                items.append(builder(element, _list_type))
-        return items 
-    else:
-        for element in _list:
-            if search.lower() in element.lower() or search == "":
-                items.append(builder(element, _list_type))
-    return items
+def join_contacts(jobs, table, unmatched):
+    """ Takes jobs and a contact_table, yields each job's text with its
+        contact's details added. Jobs with no contact are added to unmatched.
+    """
+    for job in jobs:
+        poc = find_contact(table, job.poc_name, job.company)
+        if poc is None:
+            unmatched.append(job.record_number)
+            yield "{}\ncontact: no match for {}".format(job, job.poc_name)
+        else:
+            yield "{}\ncontact: {} {}, {}\nphone: {}\nemail: {}".format(
+                  job, poc.record_number, poc.name, poc.company, poc.phone, poc.email)
 
 
-def append_to_file(line, filename):
-    """ Takes a line and a filename, appends the line to the file """
-    with open(filename, 'a') as f:
-        f.write("\n" + line + "\n")
+def open_engine(filename, _list_type=None):
+    """ Takes a data file, returns the storage engine for it
+        Files ending in SQLITE_SUFFIX are SQLite databases, the rest text.
+    """
+    if filename.endswith(SQLITE_SUFFIX):
+        return SqliteEngine(filename, _list_type)
+    return TextEngine(filename, _list_type)
 
-        
-def string_to_list(data, sep = ';'):
-    """ Takes a ; separated string and converts it to a list """ 
-    return [ e.strip() for e in data.split(sep) ]
 
-def dict_to_string(data, sep = ';'):
-    """ Takes a dict and converts it to a sep separated string """ 
-    return sep.join([str(e) for e in data.values()])
+def migrate(source, target, _list_type):
+    """ Copies every record from data file source into target, which may use
+        the other engine, keeping record numbers. Refuses, returning None, if
+        target already has records. Returns the number of records copied.
+    """
+    if os.path.exists(target) and os.path.getsize(target) > 0:
+        if open_engine(target, _list_type).load():
+            return None
+    elif not target.endswith(SQLITE_SUFFIX):
+        # the text engine appends to an existing file
+        open(target, 'a').close()
+    source_engine   = open_engine(source, _list_type)
+    target_engine   = open_engine(target, _list_type)
+    lines           = source_engine.load()
+    if lines:
+        target_engine.insert(lines)
+    target_engine.set_high_water(source_engine.next_record_number() - 1)
+    return len(lines)
+
 
 def create_new_record(job_or_poc, file_path):
     """ This function manages the creation of a new record """
-    fields = JOB_FIELDS if job_or_poc == "job" else POC_FIELDS
+    fields = list(JOB_FIELDS if job_or_poc == "job" else POC_FIELDS)
     # this is a little hacky, we are passing our new record_number
     # as the first field name so we can use that when we build the data
-    fields[0] = get_next_record_number(file_path)    
+    fields[0] = open_engine(file_path, job_or_poc).next_record_number()
     # get the data from the user
     input_data = get_user_data(fields)    
     # convert the data to a string
@@ -185,6 +2919,155 @@ def get_user_data(fields):
 
 
 
+def read_import_rows(path):
+    """ Takes a CSV (with a header row) or JSONL file, yields (row_number, data, error)
+        for each row, data None and error a message for a line that isn't JSON
+    """
+    import csv
+    with open(path, 'r', encoding=ENCODING, newline='') as f:
+        if path.lower().endswith(".csv"):
+            # row 1 is the header
+            for row_number, row in enumerate(csv.DictReader(f), start=2):
+                yield row_number, row, None
+        else:
+            for row_number, text in enumerate(f, start=1):
+                if text.strip():
+                    try:
+                        yield row_number, json.loads(text), None
+                    except ValueError as e:
+                        yield row_number, None, "not valid JSON ({})".format(e)
+
+
+def validate_row(data, fields, today):
+    """ Takes a dict of field values, returns (line, errors) ready for append_lines
+        The rules are get_user_data's: no semicolons, missing values become
+        "Null", missing dates become today, and dates must be YYYYMMDD.
+    """
+    if not isinstance(data, dict):
+        return None, ["not an object of field values"]
+    errors  = []
+    # csv.DictReader files the values past the header's columns under None
+    if None in data:
+        errors.append("more columns than the header")
+    unknown = set(data) - set(fields) - {None}
+    if unknown:
+        errors.append("unknown field(s) {}".format(", ".join(sorted(unknown))))
+    # record numbers are always handed out by append_lines
+    values = ["0"]
+    for field in fields[1:]:
+        value = data.get(field)
+        value = "" if value is None else str(value).strip()
+        if field == "first_contact" or field == "last_contact":
+            if value == "":
+                value = today
+            elif len(value) != 8 or not value.isdigit() or not valid_date(value):
+                errors.append("{} {!r} is not a YYYYMMDD date".format(field, value))
+        elif value == "":
+            value = "Null"
+        if ";" in value or "\n" in value:
+            errors.append("{} has a semicolon or line break".format(field))
+        values.append(value)
+    return "; ".join(values), errors
+
+
+def valid_date(value):
+    """ Takes a YYYYMMDD string, returns True if it is a real date """
+    try:
+        dt.strptime(value, "%Y%m%d")
+    except ValueError:
+        return False
+    return True
+
+
+def import_records(path, filename, _list_type):
+    """ Takes a CSV or JSONL file and validates every row, then appends them all
+        to filename in one group commit with a contiguous block of record numbers.
+        Nothing is written if any row is invalid. Returns (lines written, errors).
+    """
+    fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+    today   = convert_date(dt.now())
+    lines   = []
+    errors  = []
+    for row_number, data, error in read_import_rows(path):
+        line, row_errors = validate_row(data, fields, today) if error is None else (None, [error])
+        errors.extend("row {}: {}".format(row_number, error) for error in row_errors)
+        lines.append(line)
+    if errors or not lines:
+        return [], errors
+    return open_engine(filename, _list_type).insert(lines, renumber_taken=True), errors
+
+
+def split_fields(line, fields):
+    """ Takes a record line, returns its values in field order, None for missing ones
+        Extra columns stay part of the last field, as the index treats them.
+    """
+    values  = string_to_list(line)
+    last    = len(fields) - 1
+    if len(values) > last + 1:
+        values = values[:last] + ["; ".join(values[last:])]
+    return values + [None] * (len(fields) - len(values))
+
+
+def export_lines(lines, fields, export_format, stream):
+    """ Takes record lines, writes them to the binary stream as JSONL or CSV
+        with a header row, in writes of about EXPORT_CHUNK bytes, returns how
+        many were written. Only one chunk is held at a time.
+    """
+    import csv
+    buffer  = io.StringIO()
+    writer  = csv.writer(buffer, lineterminator="\n")
+    count   = 0
+    if export_format == "csv":
+        writer.writerow(fields)
+    for line in lines:
+        values = split_fields(line, fields)
+        if export_format == "csv":
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False))
+            buffer.write("\n")
+        count += 1
+        if buffer.tell() >= EXPORT_CHUNK:
+            stream.write(buffer.getvalue().encode(ENCODING))
+            buffer.seek(0)
+            buffer.truncate()
+    stream.write(buffer.getvalue().encode(ENCODING))
+    return count
+
+
+@contextlib.contextmanager
+def export_stream(path, compress=False):
+    """ Yields a binary stream writing to path, or stdout for "-", gzip
+        compressed if asked
+    """
+    if path == "-":
+        sys.stdout.flush()
+        target = sys.stdout.buffer
+    else:
+        target = open(path, 'wb')
+    try:
+        if compress:
+            import gzip
+            # level 6 is most of 9's compression at a fraction of the time
+            with gzip.GzipFile(fileobj=target, mode='wb', compresslevel=6) as stream:
+                yield stream
+        else:
+            yield target
+    finally:
+        target.flush()
+        if path != "-":
+            target.close()
+
+
+def export_records(lines, _list_type, export_format, path="-", compress=False):
+    """ Takes record lines, writes them to path (stdout for "-") as JSONL or
+        CSV, returns how many were written
+    """
+    fields = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+    with export_stream(path, compress) as stream:
+        return export_lines(lines, fields, export_format, stream)
+
+
 def insert_new_item(line, file, job_or_poc):
     """ Inserts the new line into the given file """ 
     # print out the new records values
@@ -205,15 +3088,13 @@ def insert_new_item(line, file, job_or_poc):
             
     if _answer == True:
         try:
-            # Check if POC or Job
-            if job_or_poc == "job":
-                # Append the new job to the job file using the append_to_file function
-                append_to_file(line, file)
-            elif job_or_poc == "poc":
-                # Append the new poc to the poc file using the append_to_file function
-                append_to_file(line, file)
+            # The record number is checked again under the lock, in case
+            # another writer took it while we were asking
+            written = open_engine(file, job_or_poc).insert([line], renumber_taken=True)[0]
             # confirm the new record was added
             print(f"New {job_or_poc} added to database")
+            if written != line:
+                print(f"as record {record_number_of(written)}")
         except:
             print("Error writing to file")
     else:
@@ -223,16 +3104,56 @@ def insert_new_item(line, file, job_or_poc):
 
 
 def get_next_record_number(file):
-    """ Get the next record number for a job or POC """
-    record_numbers = []
-    with open(file, 'r') as f:
-        for line in f:
+    """ Get the next record number for a job or POC
+        The answer comes from the cached high water mark while that still
+        matches the file, otherwise the file is scanned and the cache redone.
+    """
+    high_water = read_high_water(file)
+    if high_water is None:
+        signature   = file_signature(file)
+        high_water  = scan_high_water(file)
+        save_high_water(file, high_water, signature)
+    return high_water + 1
+
+
+def scan_high_water(file):
+    """ Takes a data file, returns the highest record number in it or its
+        archive segments, or 0. Archived records keep their numbers, so the
+        segments count even though only the .meta cache remembers them otherwise.
+    """
+    high_water = 0
+    with open(file, 'r', encoding=ENCODING) as f:
+        for line in itertools.chain(f, archive_lines(file)):
             line = line.strip()
-            if ';' in line:
-                data = line.split(";")
-                record_numbers.append(int(data[0].strip()))
-    max_record_number = max(record_numbers, default=0)
-    return max_record_number + 1
+            if ';' in line and not line.startswith("#"):
+                record_number = record_number_of(line)
+                if record_number is not None and record_number > high_water:
+                    high_water = record_number
+    return high_water
+
+
+def meta_path(filename):
+    """ Takes a data filename, returns the path of its high water mark cache """
+    return filename + META_SUFFIX
+
+
+def read_high_water(filename):
+    """ Returns the cached high water mark for filename, or None if stale or unreadable """
+    try:
+        with open(meta_path(filename), 'r', encoding=ENCODING) as f:
+            meta = json.load(f)
+        if tuple(meta["signature"]) != file_signature(filename):
+            return None
+        return int(meta["high_water"])
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+
+def save_high_water(filename, high_water, signature=None):
+    """ Caches filename's high water mark against a signature, by default its current one """
+    if signature is None:
+        signature = file_signature(filename)
+    write_cache(meta_path(filename), json.dumps({"signature": signature, "high_water": high_water}).encode(ENCODING))
 
 
 
@@ -240,17 +3161,13 @@ def update_record(job_or_poc, record_number, file):
     """ Update an existing job or POC record """
     updated_data = {}
     fields = JOB_FIELDS if job_or_poc == "job" else POC_FIELDS
-    filepath = file
-
-    records = list_from_file(filepath)
+    engine = open_engine(file, job_or_poc)
 
-    for i, line in enumerate(records):
-        if line.startswith(str(record_number)):
-            current_record = string_to_list(line)
-            break
-    else:
+    current_line = engine.get(record_number)
+    if current_line is None:
         print(f"No {job_or_poc} found with record number {record_number}")
         return
+    current_record = string_to_list(current_line)
 
     print(f"Current {job_or_poc}:")
     print("; ".join(current_record))
@@ -289,57 +3206,532 @@ def update_record(job_or_poc, record_number, file):
         print("Please answer the question")
             
     if _answer == True:
-        records[i] = updated_item
-        with open(filepath, 'w') as f:
-            f.write("\n".join(records))
-        print(f"{job_or_poc.capitalize()} updated")
+        if engine.update(current_line, updated_item):
+            print(f"{job_or_poc.capitalize()} updated")
+            engine.maybe_compact()
+        else:
+            print(f"{job_or_poc.capitalize()} was changed by someone else, update cancelled")
     else:
         print("Update cancelled")
 
 
 def delete_record(record_number, file, job_or_poc):
     """ Delete an existing job or POC record """
-    
-    records = list_from_file(file)
-    line_to_delete = None
-    for i, line in enumerate(records):
-        if line.startswith(str(record_number)):
-            line_to_delete = i
-            break
-    
-    if line_to_delete is None:
+    engine = open_engine(file, job_or_poc)
+
+    deleted_record = engine.get(record_number)
+    if deleted_record is None:
         print(f"No {job_or_poc} found with record number {record_number}")
         return
 
-    deleted_record = records[line_to_delete]
     print(f"Deleting {job_or_poc}:")
     print(deleted_record)
 
     if is_yes(input(f"Delete this {job_or_poc}?")):
-        del records[line_to_delete]
-        with open(file, 'w') as f:
-            f.write("\n".join(records))
-        print(f"{job_or_poc.capitalize()} deleted")
+        if engine.delete(deleted_record):
+            print(f"{job_or_poc.capitalize()} deleted")
+            engine.maybe_compact()
+        else:
+            print(f"{job_or_poc.capitalize()} was changed by someone else, deletion cancelled")
     else:
         print("Deletion cancelled")
 
 
+def parse_ranges(spec):
+    """ Takes record numbers like "3,5,9-200", returns them as sorted,
+        merged (first, last) ranges. Raises ValueError naming the problem.
+    """
+    ranges = []
+    for part in spec.split(","):
+        first, dash, last = part.strip().partition("-")
+        if not INT_RE.fullmatch(first) or (dash and not INT_RE.fullmatch(last)):
+            raise ValueError("{!r} is not a record number or a range like 9-200".format(part.strip()))
+        ranges.append((int(first), int(last) if dash else int(first)))
+        if ranges[-1][1] < ranges[-1][0]:
+            raise ValueError("{!r} counts backwards".format(part.strip()))
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def in_ranges(ranges, record_number):
+    """ Returns True if record_number is in one of the sorted, merged ranges """
+    if record_number is None:
+        return False
+    pos = bisect.bisect_right(ranges, (record_number, float("inf")))
+    return pos > 0 and ranges[pos - 1][1] >= record_number
+
+
+def format_ranges(ranges):
+    """ Takes (first, last) ranges, returns them written as parse_ranges() reads them """
+    return ",".join(str(first) if first == last else "{}-{}".format(first, last) for first, last in ranges)
+
+
+def parse_assignments(words, fields):
+    """ Takes field=value words, returns {field: value}
+        The rules are get_user_data's, and record numbers can't be set.
+        Raises ValueError naming the problem.
+    """
+    assignments = {}
+    for word in words:
+        field, equals, value = word.partition("=")
+        field, value = field.strip(), value.strip()
+        if not equals or field not in fields[1:]:
+            raise ValueError("can't set {!r}, use field=value with one of {}".format(word, ", ".join(fields[1:])))
+        if ";" in value or "\n" in value:
+            raise ValueError("{} has a semicolon or line break".format(field))
+        if field in DATE_FIELDS and (len(value) != 8 or not value.isdigit() or not valid_date(value)):
+            raise ValueError("{} {!r} is not a YYYYMMDD date".format(field, value))
+        assignments[field] = value or "Null"
+    return assignments
+
+
+def assign_fields(line, assignments, fields):
+    """ Takes a record line and {field: value}, returns the line with those fields set """
+    values = ["Null" if value is None else value for value in split_fields(line, fields)]
+    for field, value in assignments.items():
+        values[fields.index(field)] = value
+    return "; ".join(values)
+
+
+def batch_change(job_or_poc, ranges, file, assignments=None):
+    """ Deletes the job or POC records numbered in ranges or, given
+        assignments, sets those fields on each. One confirmation covers them
+        all, and they are applied in one pass over the data.
+    """
+    fields  = JOB_FIELDS if job_or_poc == "job" else POC_FIELDS
+    engine  = open_engine(file, job_or_poc)
+    changes = []
+    for line in engine.select(ranges):
+        new_line = None if assignments is None else assign_fields(line, assignments, fields)
+        if new_line != line:
+            changes.append((line, new_line))
+    if not changes:
+        print(f"No {job_or_poc} to change with record numbers {format_ranges(ranges)}")
+        return
+
+    print(f"{'Deleting' if assignments is None else 'Updated'} {job_or_poc}s:")
+    for old_line, new_line in changes[:BATCH_PREVIEW]:
+        print(old_line if new_line is None else new_line)
+    if len(changes) > BATCH_PREVIEW:
+        print(f"... and {len(changes) - BATCH_PREVIEW} more")
+    if not is_yes(input(f"{'Delete' if assignments is None else 'Update'} these {len(changes)} {job_or_poc}(s)? ")):
+        print(f"{'Deletion' if assignments is None else 'Update'} cancelled")
+        return
+
+    left_alone = engine.change_many(changes)
+    print(f"{len(changes) - len(left_alone)} {job_or_poc}(s) {'deleted' if assignments is None else 'updated'}")
+    if left_alone:
+        print(f"{len(left_alone)} changed by someone else and left alone: {', '.join(map(str, sorted(left_alone)))}")
+
+
+# --serve keeps both data files in memory and answers requests on a Unix
+# socket, one JSON object per line each way:
+#     {"op": "search", "type": "job", "arg": "python", "stop": 10, "engine": "text"}
+#     {"ok": true, "lines": ["3; Junior Developer; ..."]}
+# Reads are "search", "query" and "get" (arg is a record number), answered
+# from memory. Writes are "add" with a "record" of field values, "update"
+# with a "record_number" and the fields to change, and "delete" with a
+# "record_number"; they go through the storage engine like any other writer.
+# Every request compares the files' signatures with the loaded copy first,
+# so changes made by anyone are picked up.
+
+class DataServer:
+    """Holds the job and POC data in memory for --serve and answers requests"""
+
+    def __init__(self, files, engine_name):
+        self.files          = files
+        self.engine_name    = engine_name
+        self.lines          = {}
+        self.numbers        = {}
+        self.signatures     = {}
+        self.cache          = {}
+
+    def data(self, _list_type):
+        """ Returns the lines of _list_type's file, reloading them if the file changed """
+        filename    = self.files[_list_type]
+        signature   = data_signature(filename)
+        if self.signatures.get(_list_type) != signature:
+            lines                           = open_engine(filename, _list_type).load()
+            self.lines[_list_type]          = lines
+            self.numbers[_list_type]        = {record_number_of(line): line for line in lines}
+            self.signatures[_list_type]     = signature
+            self.cache                      = {}
+        return self.lines[_list_type]
+
+    def respond(self, raw):
+        """ Takes one request line, returns the response line, as bytes
+            Read responses are cached until the data changes.
+        """
+        try:
+            message = json.loads(raw.decode(ENCODING))
+            if message.get("op") in ("search", "query", "get"):
+                self.data(message.get("type"))
+                key = (message.get("type"), message.get("op"), message.get("arg"), message.get("stop"),
+                       message.get("engine"))
+                if key not in self.cache:
+                    if len(self.cache) >= SERVER_CACHE_SIZE:
+                        self.cache = {}
+                    self.cache[key] = json.dumps(self.handle(message)).encode(ENCODING) + b"\n"
+                return self.cache[key]
+            response = self.handle(message)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {"ok": False, "error": str(e)}
+        return json.dumps(response).encode(ENCODING) + b"\n"
+
+    def handle(self, message):
+        """ Takes a request dict, returns the response dict """
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True, "engine": self.engine_name, "pid": os.getpid()}
+        if message.get("engine", self.engine_name) != self.engine_name:
+            return {"ok": False, "error": "this server uses the {} engine".format(self.engine_name)}
+        _list_type = message.get("type")
+        if _list_type not in self.files:
+            return {"ok": False, "error": "type must be one of {}".format(", ".join(sorted(self.files)))}
+        fields  = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+        lines   = self.data(_list_type)
+        if op == "search":
+            needle  = str(message.get("arg", "")).lower()
+            found   = (line for line in lines if needle in line.lower())
+        elif op == "query":
+            found = filter(compile_query(parse_query(message["arg"], fields), fields), lines)
+        elif op == "get":
+            line    = self.numbers[_list_type].get(int(message["arg"]))
+            found   = [] if line is None else [line]
+        elif op == "add":
+            line, errors = validate_row(message["record"], fields, convert_date(dt.now()))
+            if errors:
+                return {"ok": False, "error": "; ".join(errors)}
+            return {"ok": True, "lines": open_engine(self.files[_list_type], _list_type).insert([line], renumber_taken=True)}
+        elif op in ("update", "delete"):
+            return self.change(_list_type, fields, op, message)
+        else:
+            return {"ok": False, "error": "unknown op {!r}".format(op)}
+        return {"ok": True, "lines": list(itertools.islice(found, message.get("stop")))}
+
+    def change(self, _list_type, fields, op, message):
+        """ Updates or deletes a record for handle() """
+        engine          = open_engine(self.files[_list_type], _list_type)
+        record_number   = int(message["record_number"])
+        current_line    = engine.get(record_number)
+        if current_line is None:
+            return {"ok": False, "error": "no {} with record number {}".format(_list_type, record_number)}
+        if op == "delete":
+            new_line = None
+        else:
+            # only the fields sent are checked, the rest are kept as they are
+            record          = message.get("record", {})
+            line, errors    = validate_row(record, fields, convert_date(dt.now()))
+            if errors:
+                return {"ok": False, "error": "; ".join(errors)}
+            values      = [str(record_number)]
+            for field, sent, current in zip(fields[1:], string_to_list(line)[1:], split_fields(current_line, fields)[1:]):
+                values.append(sent if field in record else "Null" if current is None else current)
+            new_line    = "; ".join(values)
+        changed = engine.update(current_line, new_line) if new_line is not None else engine.delete(current_line)
+        if not changed:
+            return {"ok": False, "error": "{} {} was changed by someone else".format(_list_type, record_number)}
+        engine.maybe_compact()
+        return {"ok": True, "lines": [] if new_line is None else [new_line]}
+
+
+def serve(files, engine_name, socket_path):
+    """ Loads files, a {type: data file} dict, and answers requests on
+        socket_path until interrupted. Returns False if a server already
+        answers there.
+    """
+    import asyncio
+    import signal
+    if server_request(socket_path, [{"op": "ping"}]) is not None:
+        return False
+    if os.path.exists(socket_path):
+        # left behind by a server that didn't shut down cleanly
+        os.remove(socket_path)
+    server = DataServer(files, engine_name)
+    for _list_type in files:
+        server.data(_list_type)
+
+    async def client_connected(reader, writer):
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                writer.write(server.respond(raw))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    listener = loop.run_until_complete(asyncio.start_unix_server(client_connected, path=socket_path))
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        loop.run_until_complete(listener.wait_closed())
+        loop.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+    return True
+
+
+def server_request(socket_path, messages, timeout=SERVER_TIMEOUT):
+    """ Sends messages to the --serve server at socket_path, returns its
+        responses, or None if there is no server answering there
+    """
+    if socket_path is None or not os.path.exists(socket_path):
+        return None
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(b"".join(json.dumps(message).encode(ENCODING) + b"\n" for message in messages))
+            with sock.makefile('rb') as f:
+                return [json.loads(f.readline().decode(ENCODING)) for _ in messages]
+    except (OSError, ValueError):
+        return None
+
+
+def forward(socket_path, engine_name, sections, limit=None, offset=0):
+    """ Asks the --serve server for sections of (label, type, op, arg) and
+        prints them as print_records would. Returns how many were printed,
+        or None, having printed nothing, if the server couldn't answer.
+    """
+    stop        = None if limit is None else offset + limit
+    messages    = [{"op": op, "type": _list_type, "arg": arg, "stop": stop, "engine": engine_name}
+                   for label, _list_type, op, arg in sections]
+    responses   = server_request(socket_path, messages)
+    if responses is None or not all(response.get("ok") for response in responses):
+        return None
+    records = itertools.chain(*[labelled(label, build_records(response["lines"], _list_type))
+                                for (label, _list_type, _, _), response in zip(sections, responses)])
+    return print_records(records, limit, offset)
+
+
+# Profiling works by swapping the functions below for timed wrappers in the
+# module's namespace, and putting them back afterwards. Calls between them go
+# through the module globals, so the wrappers see every phase, and with
+# profiling off nothing is wrapped and nothing is paid.
+#     (function name, phase, counter, is a generator)
+PROFILED = (
+    ("read_lines",      "read",     "lines_read",       True),
+    ("read_offsets",    "read",     "lines_read",       True),
+    ("scan_offsets",    "read",     "lines_read",       True),
+    ("parallel_offsets", "read",    "lines_read",       True),
+    ("read_log",        "read",     None,               False),
+    ("string_to_list",  "split",    None,               False),
+    ("builder",         "build",    "objects_built",    False),
+    ("filter_lines",    "filter",   "lines_matched",    True),
+    ("scan_file",       "filter",   "lines_matched",    True),
+    ("search_index",    "filter",   "lines_matched",    True),
+    ("query_index",     "filter",   "lines_matched",    True),
+    ("select_index",    "filter",   "lines_matched",    True),
+    ("load_index",      "index",    None,               False),
+    ("save_index",      "index",    None,               False),
+    ("print_records",   "print",    None,               False),
+    ("append_lines",    "write",    None,               False),
+    ("log_change",      "write",    None,               False),
+    )
+
+
+class Profiler:
+    """Collects per-phase timings and counters
+
+    Phase times are exclusive: while one phase runs inside another, say
+    split inside build, its time is taken off the outer phase. Counters only
+    count in the outermost call of their phase, so a search that falls back
+    from the index to a scan still counts each matched line once.
+    """
+
+    def __init__(self):
+        self.seconds    = {}
+        self.calls      = {}
+        self.counters   = {"lines_read": 0, "lines_matched": 0, "objects_built": 0, "bytes_written": 0}
+        self.depth      = {}
+        self.children   = []
+        self.started    = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Times the block as part of phase name """
+        start               = time.perf_counter()
+        self.depth[name]    = self.depth.get(name, 0) + 1
+        self.children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed             = time.perf_counter() - start
+            self.depth[name]   -= 1
+            self.seconds[name]  = self.seconds.get(name, 0.0) + elapsed - self.children.pop()
+            if self.children:
+                self.children[-1] += elapsed
+
+    def count(self, counter, phase, amount=1):
+        """ Adds amount to counter, if called from the outermost call of phase """
+        if self.depth.get(phase) == 1:
+            self.counters[counter] += amount
+
+    def summary(self):
+        """ Returns the timings and counters as a dict """
+        total = time.perf_counter() - self.started
+        return {
+            "total":    total,
+            "phases":   {name: {"seconds": seconds, "calls": self.calls.get(name, 0)}
+                         for name, seconds in sorted(self.seconds.items())},
+            "other":    total - sum(self.seconds.values()),
+            "counters": dict(self.counters),
+            }
+
+
+class CountingWriter:
+    """Passes writes through to a stream, counting the bytes for a Profiler"""
+
+    def __init__(self, stream, profiler):
+        self.stream     = stream
+        self.profiler   = profiler
+
+    def write(self, text):
+        self.profiler.counters["bytes_written"] += len(text.encode(ENCODING, "replace"))
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def profile_call(profiler, phase, counter, func):
+    """ Returns func wrapped to run as part of phase """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler.calls[phase] = profiler.calls.get(phase, 0) + 1
+        with profiler.phase(phase):
+            result = func(*args, **kwargs)
+            if counter is not None:
+                profiler.count(counter, phase)
+        return result
+    return wrapper
+
+
+def profile_generator(profiler, phase, counter, func):
+    """ Returns generator function func wrapped so each item it makes is timed
+        as part of phase. Time spent by the consumer between items is not.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler.calls[phase] = profiler.calls.get(phase, 0) + 1
+        items = func(*args, **kwargs)
+        while True:
+            with profiler.phase(phase):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                if counter is not None:
+                    profiler.count(counter, phase)
+            yield item
+    return wrapper
+
+
+def install_profiler(profiler, namespace=None):
+    """ Swaps the PROFILED functions in namespace, by default this module's,
+        for wrappers reporting to profiler. Returns the originals for
+        remove_profiler().
+    """
+    namespace = globals() if namespace is None else namespace
+    originals = {}
+    for name, phase, counter, is_generator in PROFILED:
+        originals[name] = namespace[name]
+        wrap            = profile_generator if is_generator else profile_call
+        namespace[name] = wrap(profiler, phase, counter, originals[name])
+    return originals
+
+
+def remove_profiler(originals, namespace=None):
+    """ Puts back the functions install_profiler() replaced """
+    namespace = globals() if namespace is None else namespace
+    namespace.update(originals)
+
+
+def format_profile(summary):
+    """ Takes a Profiler summary, returns it as a text table """
+    lines = ["profile: {:.6f}s total".format(summary["total"]),
+             "  {:<10} {:>12} {:>8}".format("phase", "seconds", "calls")]
+    for name, phase in summary["phases"].items():
+        lines.append("  {:<10} {:>12.6f} {:>8}".format(name, phase["seconds"], phase["calls"]))
+    lines.append("  {:<10} {:>12.6f}".format("other", summary["other"]))
+    for name, value in summary["counters"].items():
+        lines.append("  {:<16} {:>12}".format(name, value))
+    memory = summary.get("memory")
+    if memory:
+        lines.append("  {:<16} {:>12}".format("peak_bytes", memory["peak_bytes"]))
+        for site in memory["top"]:
+            lines.append("    {:>10}  {}".format(site["bytes"], site["where"]))
+    return "\n".join(lines)
+
+
+def start_profiling(output="text", dump=None, memory=False):
+    """ Starts profiling the rest of the run, the report goes to stderr at exit
+        output is "text" or "json". dump names a file for cProfile stats
+        (read them with pstats), and memory adds tracemalloc's peak and top
+        allocation sites to the report.
+    """
+    profiler    = Profiler()
+    originals   = install_profiler(profiler)
+    sys.stdout  = CountingWriter(sys.stdout, profiler)
+    deep        = None
+    if dump:
+        import cProfile
+        deep = cProfile.Profile()
+        deep.enable()
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    def report():
+        if deep is not None:
+            deep.disable()
+            deep.dump_stats(dump)
+        sys.stdout.flush()
+        sys.stdout = sys.stdout.stream
+        remove_profiler(originals)
+        summary = profiler.summary()
+        if memory:
+            snapshot            = tracemalloc.take_snapshot()
+            summary["memory"]   = {
+                "peak_bytes":   tracemalloc.get_traced_memory()[1],
+                "top":          [{"where": str(stat.traceback), "bytes": stat.size}
+                                 for stat in snapshot.statistics("lineno")[:10]],
+                }
+            tracemalloc.stop()
+        if output == "json":
+            print(json.dumps(summary, indent=2), file=sys.stderr)
+        else:
+            print(format_profile(summary), file=sys.stderr)
+
+    atexit.register(report)
+    return profiler
+
+
 if __name__ == "__main__":
 
     datadir     = "data"
-    job_file    = "jobs.txt"
-    poc_file    = "pocs.txt"
-    
-    job_file_path = os.path.join(datadir, job_file)
-    poc_file_path = os.path.join(datadir, poc_file)
-    
-    try:
-        poc_list = list_from_file(os.path.join(datadir, poc_file))
-        job_list = list_from_file(os.path.join(datadir, job_file))
-    except:
-        print("Can't find the data files")
-        sys.exit(1)
-    
+    data_files  = {
+        "text":     ("jobs.txt", "pocs.txt"),
+        "sqlite":   ("jobs" + SQLITE_SUFFIX, "pocs" + SQLITE_SUFFIX),
+        }
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-a", "--add", help="add data, requires -j or -p", action="store_true")
@@ -347,13 +3739,166 @@ if __name__ == "__main__":
     parser.add_argument("-p", "--poc", help="use the POC info", type=str, nargs='?', const=True, default=None)
     parser.add_argument("-s", "--search", help="SEARCH for", default="")
     parser.add_argument("-u", "--update", help="update data, requires -j or -p and record number", action="store_true")
-    parser.add_argument("-r", "--record", help="record number for update", type=int, nargs='?', const=True, default=None)
+    parser.add_argument("-r", "--record", help="record number, or a list and ranges like 3,5,9-200",
+                        nargs='?', const=True, default=None)
     parser.add_argument("-d", "--delete", help="delete data, requires -j or -p and record number", action="store_true")
+    parser.add_argument("--set", help="with -u, set field=value on every record of -r without asking for each field",
+                        metavar="FIELD=VALUE", action="append", default=[])
+    parser.add_argument("--serve", help="keep the data loaded and answer requests on data/{}".format(SERVER_SOCKET),
+                        action="store_true")
+    parser.add_argument("--no-server", help="don't forward reads to a running --serve server", action="store_true")
+    parser.add_argument("--dedupe", help="find contacts that are the same person by email, phone or name, and merge them",
+                        action="store_true")
+    parser.add_argument("--archive", help="move inactive jobs, and with --days those older, into data/jobs.txt{}.NNNNNN.gz".format(ARCHIVE_SUFFIX),
+                        action="store_true")
+    parser.add_argument("--days", help="with --archive, also move jobs last contacted more than DAYS days ago; "
+                        "with --due, how long after the last contact a follow-up is due (default {})".format(DUE_DAYS),
+                        type=int, default=None)
+    parser.add_argument("--due", help="list the most overdue follow-ups across jobs and contacts, -j or -p for one kind",
+                        action="store_true")
+    parser.add_argument("--top", help="with --due, how many follow-ups to list", type=int, default=DUE_TOP)
+    parser.add_argument("--stats", help="print pipeline statistics for the jobs and contacts", action="store_true")
+    parser.add_argument("--check", help="with --stats, count everything again and report any drift from the saved statistics",
+                        action="store_true")
+    parser.add_argument("--include-archive", help="also search the archived jobs", action="store_true")
+    parser.add_argument("--join", help="print jobs with their contact's phone and email, -s or -q to pick jobs",
+                        action="store_true")
+    parser.add_argument("--fuzzy", help="rank records with words spelled like the search from -s, -j or -p",
+                        action="store_true")
+    parser.add_argument("--watch", help="print the matches of -s, -j, -p or -q, then new ones as they arrive, "
+                        "checking every WATCH seconds (default {})".format(WATCH_INTERVAL),
+                        type=float, nargs='?', const=WATCH_INTERVAL, default=None)
+    parser.add_argument("-q", "--query", help="field query, like 'company=helical active=yes last_contact>=20230401'",
+                        default=None)
+    parser.add_argument("--limit", help="print at most LIMIT matches, then stop reading", type=int, default=None)
+    parser.add_argument("--offset", help="skip the first OFFSET matches", type=int, default=0)
+    parser.add_argument("--scan", help="search by scanning the raw data file instead of the index", action="store_true")
+    parser.add_argument("--import", help="add every row of a CSV or JSONL file, requires -j or -p", dest="import_file", default=None)
+    parser.add_argument("--export", help="write the records of -j or -p, picked by -s or -q, as JSONL or CSV",
+                        choices=EXPORT_FORMATS, default=None)
+    parser.add_argument("--output", help="file for --export, default - for stdout", default="-")
+    parser.add_argument("--gzip", help="gzip the --export output, the default for an --output ending in .gz",
+                        action="store_true")
+    parser.add_argument("--compact", help="fold the change logs back into the data files, -j or -p for just one", action="store_true")
+    parser.add_argument("--engine", help="storage engine holding the data, default text or ${}".format(ENGINE_ENV),
+                        choices=sorted(data_files), default=os.environ.get(ENGINE_ENV) or "text")
+    parser.add_argument("--migrate", help="copy every record from --engine's files into this engine's files",
+                        choices=sorted(data_files), default=None)
+    parser.add_argument("--workers", help="processes for scanning searches, by default picked from file size and CPU count, 1 with --limit or --offset",
+                        type=int, default=None)
+    parser.add_argument("--profile", help="report phase timings and counters on stderr, as text or json",
+                        nargs='?', const="text", choices=["text", "json"], default=os.environ.get(PROFILE_ENV) or None)
+    parser.add_argument("--profile-dump", help="with --profile, also write cProfile stats to this file",
+                        default=os.environ.get(PROFILE_DUMP_ENV) or None)
+    parser.add_argument("--profile-memory", help="with --profile, also report tracemalloc peak and top allocations",
+                        action="store_true", default=bool(os.environ.get(PROFILE_MEMORY_ENV)))
 
     
 
     args = parser.parse_args()
 
+    job_file_path = os.path.join(datadir, data_files[args.engine][0])
+    poc_file_path = os.path.join(datadir, data_files[args.engine][1])
+
+    if not (os.path.isfile(job_file_path) and os.path.isfile(poc_file_path)):
+        print("Can't find the data files")
+        sys.exit(1)
+
+    # -r 7 is one record, -r 3,5,9-200 is a batch
+    record_ranges = None
+    if isinstance(args.record, str):
+        try:
+            record_ranges = parse_ranges(args.record)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        if record_ranges[0][0] == record_ranges[0][1] and len(record_ranges) == 1:
+            args.record     = record_ranges[0][0]
+            record_ranges   = None
+
+    # reads go to a running --serve server when there is one
+    socket_path = None if args.no_server or args.scan or args.include_archive else os.path.join(datadir, SERVER_SOCKET)
+
+    if args.serve:
+        print(f"Serving {job_file_path} and {poc_file_path} on {socket_path}")
+        if not serve({"job": job_file_path, "poc": poc_file_path}, args.engine, os.path.join(datadir, SERVER_SOCKET)):
+            print("A server is already running")
+        sys.exit(1)
+
+    if args.profile:
+        start_profiling("json" if args.profile == "json" else "text", args.profile_dump, args.profile_memory)
+
+    # A paged search streams the file and stops early instead of loading the index
+    paged     = args.limit is not None or args.offset != 0
+    use_index = not paged and not args.scan
+    # and in one process, a pool would scan whole ranges past the end of the page
+    workers   = 1 if paged else args.workers
+
+    if args.compact:
+        compact_both = args.job is None and args.poc is None
+        for selected, file_path in ((args.job is not None, job_file_path), (args.poc is not None, poc_file_path)):
+            if (selected or compact_both) and open_engine(file_path).compact():
+                print(f"Compacted {file_path}")
+        sys.exit(1)
+
+    if args.migrate:
+        targets = [os.path.join(datadir, name) for name in data_files[args.migrate]]
+        for _list_type, source, target in zip(("job", "poc"), (job_file_path, poc_file_path), targets):
+            if source == target:
+                print(f"{source} already uses the {args.migrate} engine")
+                continue
+            copied = migrate(source, target, _list_type)
+            if copied is None:
+                print(f"{target} already has records, move it aside first")
+            else:
+                print(f"Copied {copied} {_list_type}(s) from {source} to {target}")
+        sys.exit(1)
+
+    if args.import_file:
+        if args.poc or args.job:
+            _list_type  = "poc" if args.poc else "job"
+            file_path   = poc_file_path if args.poc else job_file_path
+            written, errors = import_records(args.import_file, file_path, _list_type)
+            for error in errors[:20]:
+                print(error)
+            if errors:
+                print(f"{len(errors)} problem(s) found, nothing imported")
+            else:
+                print(f"Imported {len(written)} {_list_type}(s)")
+        else:
+            print("Please specify -j for Job or -p for POC when using the --import option.")
+        sys.exit(1)
+
+    if args.export:
+        if args.poc or args.job:
+            _list_type  = "poc" if args.poc else "job"
+            file_path   = poc_file_path if args.poc else job_file_path
+            value       = args.poc if args.poc else args.job
+            engine      = open_engine(file_path, _list_type)
+            fields      = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+            if args.query is not None:
+                try:
+                    clauses = parse_query(args.query, fields)
+                except ValueError as e:
+                    print(e)
+                    sys.exit(1)
+                lines   = engine.query(clauses)
+                matches = compile_query(clauses, fields)
+            else:
+                search  = value if isinstance(value, str) else args.search
+                lines   = engine.search(search, use_index, workers)
+                matches = lambda line: search.lower() in line.lower()
+            if args.include_archive:
+                lines = itertools.chain(lines, archive_lines(file_path, matches))
+            lines       = itertools.islice(lines, args.offset, None if args.limit is None else args.offset + args.limit)
+            exported    = export_records(lines, _list_type, args.export, args.output,
+                                         args.gzip or args.output.endswith(".gz"))
+            if args.output != "-":
+                print(f"Exported {exported} {_list_type}(s) to {args.output}")
+        else:
+            print("Please specify -j for Job or -p for POC when using the --export option.")
+        sys.exit(1)
+
     if args.add:
         if args.poc:
             create_new_record("poc", poc_file_path)
@@ -363,6 +3908,24 @@ if __name__ == "__main__":
             print("Please specify -j for Job or -p for POC when using the --add option.")
         sys.exit(1)
             
+    if (args.delete or args.update) and (record_ranges or (args.update and args.set)):
+        _list_type  = "poc" if args.poc else "job"
+        file_path   = poc_file_path if args.poc else job_file_path
+        if not (args.poc or args.job):
+            print("Please specify -j for Job or -p for POC when using -r with a list or range.")
+        elif record_ranges is None and type(args.record) is not int:
+            print("Please give the record numbers with -r when using --set.")
+        elif args.update and not args.set:
+            print("Please give --set field=value when updating more than one record.")
+        else:
+            try:
+                assignments = parse_assignments(args.set, JOB_FIELDS if _list_type == "job" else POC_FIELDS) if args.update else None
+            except ValueError as e:
+                print(e)
+                sys.exit(1)
+            batch_change(_list_type, record_ranges or [(args.record, args.record)], file_path, assignments)
+        sys.exit(1)
+
     if args.delete:
         if args.poc:
             delete_record(args.record, poc_file_path, 'poc')
@@ -382,13 +3945,136 @@ if __name__ == "__main__":
             print("and -r <RECORD NUMBER> when using the --update option.")
         sys.exit(1)
         
+    if args.archive:
+        archived, segment = archive_jobs(job_file_path, args.days)
+        print(f"Archived {archived} job(s) to {segment}" if archived else "No jobs to archive")
+        sys.exit(1)
+
+    if args.dedupe:
+        dedupe_contacts(poc_file_path)
+        sys.exit(1)
+
+    if args.stats:
+        if args.check:
+            for file_path, _list_type in ((job_file_path, "job"), (poc_file_path, "poc")):
+                state, drift = check_stats(file_path, _list_type)
+                if state == "missing":
+                    print(f"{file_path}: no saved statistics, counted afresh")
+                elif state == "stale":
+                    print(f"{file_path}: saved statistics were stale, recounted")
+                elif drift:
+                    print(f"{file_path}: {len(drift)} statistic(s) had drifted, now corrected")
+                    for line in drift:
+                        print("   ", line)
+                else:
+                    print(f"{file_path}: statistics match")
+        print_stats(load_stats(job_file_path, "job"), load_stats(poc_file_path, "poc"))
+        sys.exit(1)
+
+    if args.due:
+        selected    = [("Job", "job", job_file_path, args.job), ("Person of Concern", "poc", poc_file_path, args.poc)]
+        chosen      = [entry for entry in selected if entry[3] is not None] or selected
+        days        = DUE_DAYS if args.days is None else args.days
+        follow_ups  = due_follow_ups([entry[:3] for entry in chosen], days, args.top)
+        found       = print_records((f"{label} ({overdue} days overdue)\n", record) for overdue, label, record in follow_ups)
+        if found == 0:
+            print("No follow-ups due")
+        sys.exit(1)
+
+    if args.join:
+        table = contact_table(open_engine(poc_file_path, "poc").load_store())
+        if args.query is not None:
+            try:
+                jobs = query_records(job_file_path, "job", args.query, include_archive=args.include_archive)
+            except ValueError as e:
+                print(e)
+                sys.exit(1)
+        else:
+            job_search  = args.job if isinstance(args.job, str) else args.search
+            jobs        = iter_records(job_file_path, "job", job_search, use_index=use_index, workers=workers,
+                                       include_archive=args.include_archive)
+        unmatched = []
+        print_records(labelled("Job\n", join_contacts(jobs, table, unmatched)), args.limit, args.offset)
+        if unmatched:
+            print(f"{len(unmatched)} job(s) with no matching contact: {', '.join(map(str, unmatched))}")
+        sys.exit(1)
+
+    if args.fuzzy:
+        selected    = [("Job", "job", job_file_path, args.job), ("Person of Concern", "poc", poc_file_path, args.poc)]
+        chosen      = [entry for entry in selected if entry[3] is not None] or selected
+        results     = []
+        for label, _list_type, file_path, value in chosen:
+            search = value if isinstance(value, str) else args.search
+            if tokenize(search):
+                results.append([(score, label, record) for score, record in fuzzy_records(file_path, _list_type, search)])
+        if not results:
+            print("Please give words to search for with -s, -j or -p when using the --fuzzy option.")
+            sys.exit(1)
+        ranked  = heapq.merge(*results, key=lambda result: -result[0])
+        found   = print_records(((f"{label} ({score:.2f})\n", record) for score, label, record in ranked),
+                                args.limit, args.offset)
+        if found == 0:
+            print("No matches found")
+        sys.exit(1)
+
+    if args.watch is not None:
+        selected    = [("Job\n", "job", job_file_path, args.job), ("Person of Concern\n", "poc", poc_file_path, args.poc)]
+        chosen      = [entry for entry in selected if entry[3] is not None] or selected
+        sections    = []
+        for label, _list_type, file_path, value in chosen:
+            fields = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+            if args.query is not None:
+                try:
+                    matches = compile_query(parse_query(args.query, fields), fields)
+                except ValueError as e:
+                    print(f"{_list_type}: {e}")
+                    sys.exit(1)
+            else:
+                needle  = (value if isinstance(value, str) else args.search).lower()
+                matches = lambda line, needle=needle: needle in line.lower()
+            sections.append((label, _list_type, open_engine(file_path, _list_type).follow(), matches))
+        try:
+            watch(sections, args.watch)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(1)
+
+    if args.query is not None:
+        selected    = [("Job\n", "job", job_file_path), ("Person of Concern\n", "poc", poc_file_path)]
+        chosen      = [entry for entry in selected
+                       if (entry[1] == "job" and args.job is not None) or (entry[1] == "poc" and args.poc is not None)]
+        sections    = []
+        errors      = []
+        for label, _list_type, file_path in chosen or selected:
+            try:
+                parse_query(args.query, JOB_FIELDS if _list_type == "job" else POC_FIELDS)
+                sections.append((label, _list_type, file_path))
+            except ValueError as e:
+                errors.append(f"{_list_type}: {e}")
+        # without -j or -p a query only has to make sense for one of them
+        if errors and (chosen or not sections):
+            for error in errors:
+                print(error)
+            sys.exit(1)
+        found = forward(socket_path, args.engine, [(label, _list_type, "query", args.query)
+                                                   for label, _list_type, _ in sections], args.limit, args.offset)
+        if found is None:
+            results = [labelled(label, query_records(file_path, _list_type, args.query, include_archive=args.include_archive))
+                       for label, _list_type, file_path in sections]
+            found   = print_records(itertools.chain(*results), args.limit, args.offset)
+        if found == 0:
+            print("No matches found")
+        sys.exit(1)
+
     if args.job is not None:
         if args.job == True:
             job_search = args.search
         else:
             job_search = args.job
-        for job in parse_list(job_list, "job", job_search):
-            print("Jobs\n", job, "\n")
+        if forward(socket_path, args.engine, [("Jobs\n", "job", "search", job_search)], args.limit, args.offset) is None:
+            jobs = iter_records(job_file_path, "job", job_search, use_index=use_index, workers=workers,
+                                include_archive=args.include_archive)
+            print_records(labelled("Jobs\n", jobs), args.limit, args.offset)
         sys.exit(1)
     
     if args.poc is not None:
@@ -396,18 +4082,25 @@ if __name__ == "__main__":
             poc_search = args.search
         else:
             poc_search = args.poc
-        for poc in parse_list(poc_list, "poc", poc_search):
-            print("Person of Concerns\n", poc, "\n")
+        if forward(socket_path, args.engine, [("Person of Concerns\n", "poc", "search", poc_search)],
+                   args.limit, args.offset) is None:
+            pocs = iter_records(poc_file_path, "poc", poc_search, use_index=use_index, workers=workers,
+                                include_archive=args.include_archive)
+            print_records(labelled("Person of Concerns\n", pocs), args.limit, args.offset)
         sys.exit(1)
         
     if args.search:
-        found = 0
-        for job in parse_list(job_list, "job", args.search):
-            print("Job\n", job, "\n")
-            found += 1
-        for poc in parse_list(poc_list, "poc", args.search):
-            print("Person of Concern\n", poc, "\n")
-            found += 1
+        found = forward(socket_path, args.engine, [("Job\n", "job", "search", args.search),
+                                                   ("Person of Concern\n", "poc", "search", args.search)],
+                        args.limit, args.offset)
+        if found is None:
+            jobs    = iter_records(job_file_path, "job", args.search, use_index=use_index, workers=workers,
+                                   include_archive=args.include_archive)
+            pocs    = iter_records(poc_file_path, "poc", args.search, use_index=use_index, workers=workers,
+                                   include_archive=args.include_archive)
+            found   = print_records(itertools.chain(labelled("Job\n", jobs),
+                                                    labelled("Person of Concern\n", pocs)),
+                                    args.limit, args.offset)
         if found == 0:
             print("No matches found")
         sys.exit(1)
@@ -416,15 +4109,19 @@ if __name__ == "__main__":
 
         if type(args.record) == bool and args.record == True:
             print("arg was True")
-            for poc in parse_list(poc_list, "poc", ""):
-                print("poc - ", poc, "\n")
-            for job in parse_list(job_list, "job", ""):
-                print("job - ", job, "\n")
-        else:
-            for job in parse_list(job_list, "job", args.record, "record_number"):
-                print("Job\n", job, "\n")
-            for poc in parse_list(poc_list, "poc", args.record, "record_number"):
-                print("Person of Concern\n", poc, "\n")
+            pocs = iter_records(poc_file_path, "poc", "", include_archive=args.include_archive)
+            jobs = iter_records(job_file_path, "job", "", include_archive=args.include_archive)
+            print_records(itertools.chain(labelled("poc - ", pocs), labelled("job - ", jobs)),
+                          args.limit, args.offset)
+        elif record_ranges is not None:
+            jobs = build_records(open_engine(job_file_path, "job").select(record_ranges), "job")
+            pocs = build_records(open_engine(poc_file_path, "poc").select(record_ranges), "poc")
+            print_records(itertools.chain(labelled("Job\n", jobs), labelled("Person of Concern\n", pocs)),
+                          args.limit, args.offset)
+        elif forward(socket_path, args.engine, [("Job\n", "job", "get", args.record),
+                                                ("Person of Concern\n", "poc", "get", args.record)]) is None:
+            jobs = iter_records(job_file_path, "job", args.record, "record_number", include_archive=args.include_archive)
+            pocs = iter_records(poc_file_path, "poc", args.record, "record_number", include_archive=args.include_archive)
+            print_records(itertools.chain(labelled("Job\n", jobs), labelled("Person of Concern\n", pocs)))
 
         sys.exit(1)
-
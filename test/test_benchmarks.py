@@ -0,0 +1,36 @@
+# name    :	tests/test_benchmarks.py
+# desc    :	Test the benchmark dataset generator and regression check
+import sys
+sys.argv.append('-b')
+
+import unittest
+import os.path
+import tempfile
+
+import job_seeker
+from benchmarks import generate, compare
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_write_dataset_is_seeded(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            paths_a = generate.write_dataset(first, 50, seed=3)
+            paths_b = generate.write_dataset(second, 50, seed=3)
+            for path_a, path_b in zip(paths_a, paths_b):
+                with open(path_a) as a, open(path_b) as b:
+                    self.assertTrue(a.read() == b.read())
+
+    def test_write_dataset_parses(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jobs, pocs = generate.write_dataset(directory, 25)
+            self.assertTrue(len(job_seeker.parse_list(
+                job_seeker.list_from_file(jobs), "job", "")) == 25)
+            self.assertTrue(len(job_seeker.parse_list(
+                job_seeker.list_from_file(pocs), "poc", "")) == 25)
+
+    def test_compare_flags_regression(self):
+        baseline    = {"results": {"10": {"fast": {"best": 0.1}, "slow": {"best": 0.1}}}}
+        current     = {"results": {"10": {"fast": {"best": 0.1}, "slow": {"best": 0.2}, "added": {"best": 1}}}}
+        rows        = {row["case"]: row["status"] for row in compare.compare(baseline, current, 10)}
+        self.assertTrue(rows == {"fast": "ok", "slow": "REGRESSION", "added": "new"})
@@ -11,6 +11,11 @@ import unittest
 from unittest.mock import patch
 import os.path
 import tempfile
+import subprocess
+import threading
+import time
+import json
+import bisect
 from datetime import datetime as dt
 
 
@@ -95,6 +100,7 @@ class TestJobSeeker(unittest.TestCase):
                                     ]
         self.test_line_job = "9; Junior Developer; Yes; PYthon, Javascript, Kubernetes, Docker; localcompany; local.comp.com; James Battersey; 2023; 2023"
         self.test_line_poc = "12; Killian; Run Fast; 8666544646; kill@run.com; 2023; 2023"
+        self.poc_line_4     = "4; Jason Bourne; Blackrock; 555-898-9944; jason@blackrock.quiet.com; 20070305; 20220118"
         
         self.job_record_file = os.path.join(self.test_dir.name, "jobs.txt")
         with open(self.job_record_file, 'w') as f:
@@ -281,24 +287,1153 @@ class TestJobSeeker(unittest.TestCase):
                   "y",
                 ]
         _string = "4; Harry Potter; company five; 555-865865; harry_potter@five.com; 20230401; 20230112"          
+        with open(self.poc_record_file) as f:
+            original = f.read()
         with patch('builtins.input', side_effect=_input):
             job_seeker.update_record('poc', 4, self.poc_record_file)
+        lines = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue(lines[-1] == _string)
+        # the change goes to the log, the data file is left alone until compaction
+        with open(self.poc_record_file) as f:
+            self.assertTrue(f.read() == original)
+        self.assertTrue(job_seeker.compact(self.poc_record_file))
         with open (self.poc_record_file) as f:
             lines = f.readlines()
-            self.assertTrue(lines[-1] == _string)        
-    
+            self.assertTrue(lines[-1] == _string + "\n")
+
+    def test_update_record_longer(self):
+        _input = ["Jason Charles Bourne the Third", "", "", "", "", "", "y"]
+        _string = "4; Jason Charles Bourne the Third; Blackrock; 555-898-9944; jason@blackrock.quiet.com; 20070305; 20220118"
+        with patch('builtins.input', side_effect=_input):
+            job_seeker.update_record('poc', 4, self.poc_record_file)
+        lines = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue(len(lines) == 4)
+        self.assertTrue(lines[-1] == _string)
+        self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", 4)[1] == _string)
+
+    def test_update_record_exact_number(self):
+        with open(self.poc_record_file, 'a') as f:
+            f.write("10; Ten Person; Ten Inc; 1010; ten@ten.com; 2023; 2023\n")
+        with patch('builtins.input', side_effect=["One Person", "", "", "", "", "", "y"]):
+            job_seeker.update_record('poc', 10, self.poc_record_file)
+        lines = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue(lines[0].startswith("1; Frank Green Zappa"))
+        self.assertTrue(lines[-1] == "10; One Person; Ten Inc; 1010; ten@ten.com; 2023; 2023")
+
     def test_delete_record(self):
         with patch('builtins.input', side_effect=["y"]):
             job_seeker.delete_record(4, self.poc_record_file, 'poc')
-        with open (self.poc_record_file) as f:
-            lines = f.readlines()
-            self.assertTrue(lines[-1] == "3; Shannon Docherty; JustInTime; 545488844; shannon@JIT.com; 2023; 2023") 
+        lines = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue(lines[-1] == "3; Shannon Docherty; JustInTime; 545488844; shannon@JIT.com; 2023; 2023")
+        self.assertTrue(job_seeker.parse_list(None, "poc", 4, "record_number", filename=self.poc_record_file) == [])
+
+    def test_missing_record_number(self):
+        # -d or -u without -r passes no record number
+        for record_number in (None, True):
+            self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", record_number) == (None, None))
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            job_seeker.delete_record(None, self.poc_record_file, 'poc')
+            job_seeker.update_record('poc', None, self.poc_record_file)
+        self.assertTrue(out.getvalue().count("No poc found with record number None") == 2)
+        self.assertTrue(len(job_seeker.list_from_file(self.poc_record_file)) == 4)
+
+    def test_parse_list_record_number(self):
+        _list = job_seeker.parse_list(None, "poc", 3, "record_number", filename=self.poc_record_file)
+        self.assertTrue(len(_list) == 1)
+        self.assertTrue(_list[0].name == "Shannon Docherty")
     
     def test_append_to_file(self):
         job_seeker.append_to_file(self.test_line_job, self.job_record_file)
         with open (self.job_record_file) as f:
             lines = f.readlines()
             self.assertTrue(lines[-1] == self.test_line_job + "\n")
+
+    def test_search_index_matches_scan(self):
+        _list = job_seeker.list_from_file(self.job_record_file)
+        for search in ["python", "PYTH", "docker; company", "20230321", "nomatch", "; 2023"]:
+            expected    = [str(j) for j in job_seeker.parse_list(_list, "job", search)]
+            result      = [str(j) for j in job_seeker.parse_list(None, "job", search, filename=self.job_record_file)]
+            self.assertEqual(result, expected)
+        self.assertTrue(os.path.exists(self.job_record_file + job_seeker.INDEX_SUFFIX))
+
+    def test_index_rebuilt_when_stale(self):
+        job_seeker.load_index(self.poc_record_file, "poc")
+        # an appended line is read after the lines the index covers
+        with open(self.poc_record_file, 'a') as f:
+            f.write("7; Jimi Hendrix; Purple Haze; 555-1967; jimi@haze.com; 1967; 1970\n")
+        index = job_seeker.open_index(self.poc_record_file)
+        self.assertTrue(index is not None and index["lines"] == 4)
+        _list = job_seeker.parse_list(None, "poc", "hendrix", filename=self.poc_record_file)
+        self.assertTrue(len(_list) == 1)
+        self.assertTrue(_list[0].record_number == "7")
+        # a change to what it covers makes it stale
+        with open(self.poc_record_file) as f:
+            data = f.read()
+        with open(self.poc_record_file, 'w') as f:
+            f.write(data.replace("Killian", "Kilian"))
+        self.assertTrue(job_seeker.open_index(self.poc_record_file) is None)
+        self.assertTrue(len(job_seeker.parse_list(None, "poc", "kilian", filename=self.poc_record_file)) == 1)
+        self.assertTrue(job_seeker.open_index(self.poc_record_file)["lines"] == 5)
+        # as does an edit in place far from the end, the file the same size
+        with open(self.poc_record_file, 'a') as f:
+            for number in range(100, 500):
+                f.write("{}; Person{}; Co; 555; p@co.com; 2023; 2023\n".format(number, number))
+        job_seeker.save_index(self.poc_record_file, job_seeker.build_index(self.poc_record_file, "poc"))
+        with open(self.poc_record_file, 'r+') as f:
+            data = f.read()
+            f.seek(0)
+            f.write(data.replace("Person120;", "Zerson120;"))
+        stat = os.stat(self.poc_record_file)
+        os.utime(self.poc_record_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertTrue(job_seeker.open_index(self.poc_record_file) is None)
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "zerson120")) ==
+                        list(job_seeker.scan_file(self.poc_record_file, "zerson120")) != [])
+        # as do too many appended lines
+        with patch('job_seeker.INDEX_TAIL_BYTES', 10), open(self.poc_record_file, 'a') as f:
+            f.write("8; Janis Joplin; Cheap Thrills; 555-1968; janis@thrills.com; 1968; 1970\n")
+            f.flush()
+            self.assertTrue(job_seeker.open_index(self.poc_record_file) is None)
+
+    def test_index_follows_edits(self):
+        job_seeker.load_index(self.poc_record_file, "poc")
+        job_seeker.append_to_file(self.test_line_poc, self.poc_record_file)
+        self.assertTrue(job_seeker.open_index(self.poc_record_file) is not None)
+        self.assertTrue(len(list(job_seeker.search_index(self.poc_record_file, "poc", "kill@run"))) == 2)
+
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(2, self.poc_record_file, 'poc')
+        # the delete only went to the change log, the index still describes the data file
+        index = job_seeker.open_index(self.poc_record_file)
+        self.assertTrue(index is not None and index["lines"] == 4)
+        self.assertTrue(len(list(job_seeker.search_index(self.poc_record_file, "poc", "kill@run"))) == 1)
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "bourne")) == [
+            "4; Jason Bourne; Blackrock; 555-898-9944; jason@blackrock.quiet.com; 20070305; 20220118"])
+
+        _input = ["Harry Potter", "", "", "", "", "", "y"]
+        with patch('builtins.input', side_effect=_input):
+            job_seeker.update_record('poc', 4, self.poc_record_file)
+        self.assertTrue(job_seeker.open_index(self.poc_record_file) is not None)
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "bourne")) == [])
+        self.assertTrue(len(list(job_seeker.search_index(self.poc_record_file, "poc", "potter"))) == 1)
+
+    def test_iter_records_is_lazy(self):
+        with open(self.job_record_file, 'a') as f:
+            # builder can't handle this line, so reaching it would raise
+            f.write("7; broken\n")
+        jobs = job_seeker.iter_records(self.job_record_file, "job", "", use_index=False)
+        self.assertTrue(next(jobs).record_number == "2")
+        with self.assertRaises(IndexError):
+            list(jobs)
+
+    def test_print_records_limit_offset(self):
+        pocs    = job_seeker.iter_records(self.poc_record_file, "poc", "2023", use_index=False)
+        output  = io.StringIO()
+        with patch('sys.stdout', output):
+            found = job_seeker.print_records(job_seeker.labelled("POC\n", pocs), limit=2, offset=1)
+        self.assertTrue(found == 2)
+        text = output.getvalue()
+        self.assertTrue("Killian" in text)
+        self.assertTrue("Shannon Docherty" in text)
+        self.assertFalse("Frank Green Zappa" in text)
+        self.assertFalse("Jason Bourne" in text)
+
+    def test_scan_file_matches_filter_lines(self):
+        scan_file = os.path.join(self.test_dir.name, "scan.txt")
+        with open(scan_file, 'wb') as f:
+            f.write("1; Alpha; PYTHON dev\r\n#2; python comment\n\n3; Beta; Python\n".encode("utf-8"))
+            f.write("4; \u212aelvin; Zürich\n5; ZÜRICH; Thermo\n   6; Gamma; spaced python   \n7; last python".encode("utf-8"))
+        expected_lines = job_seeker.list_from_file(scan_file)
+        for chunk_size in [1, 16, job_seeker.SCAN_CHUNK]:
+            with patch('job_seeker.SCAN_CHUNK', chunk_size):
+                for search in ["python", "PYTHON DEV", "kelvin", "zürich", "; 5", "python   ", "nomatch"]:
+                    expected    = list(job_seeker.filter_lines(expected_lines, search))
+                    result      = list(job_seeker.scan_file(scan_file, search))
+                    self.assertEqual(result, expected)
+
+    def test_scan_file_empty(self):
+        empty_file = os.path.join(self.test_dir.name, "empty.txt")
+        open(empty_file, 'w').close()
+        self.assertTrue(list(job_seeker.scan_file(empty_file, "python")) == [])
+
+    def test_record_store(self):
+        store = job_seeker.RecordStore(job_seeker.POC)
+        store.append(job_seeker.string_to_list(self.test_line_poc))
+        store.append(["13", "Null", "Run Fast", "0123", "x@run.com", "0123", "Null"])
+        self.assertTrue(len(store) == 2)
+        self.assertTrue(store.columns[store.positions["record_number"]].typecode == "q")
+        first, second = list(store)
+        self.assertTrue(first.record_number == "12")
+        self.assertTrue(first.first_contact == "2023")
+        self.assertTrue(second.first_contact == "0123")
+        self.assertTrue(second.last_contact == "Null")
+        self.assertTrue(first.company is second.company)
+        self.assertTrue(str(first) == str(job_seeker.builder(self.test_line_poc, "poc")))
+        second.last_contact = "20230501"
+        self.assertTrue(second.last_contact == "20230501")
+        with self.assertRaises(IndexError):
+            store.append(["14", "short"])
+        self.assertTrue(len(store) == 2)
+
+    def test_load_store(self):
+        store = job_seeker.load_store(self.poc_record_file, "poc")
+        self.assertTrue([p.name for p in store] == ["Frank Green Zappa", "Killian", "Shannon Docherty", "Jason Bourne"])
+        with self.assertRaises(AttributeError):
+            store.view(0).nickname = "Zappa"
+
+    def test_snapshot(self):
+        names = ["Frank Green Zappa", "Killian", "Shannon Docherty", "Jason Bourne"]
+        job_seeker.load_store(self.poc_record_file, "poc")
+        self.assertTrue(os.path.exists(self.poc_record_file + job_seeker.SNAPSHOT_SUFFIX))
+        with patch('job_seeker.read_lines') as read_lines:
+            store = job_seeker.load_store(self.poc_record_file, "poc")
+            self.assertFalse(read_lines.called)
+        self.assertTrue([p.name for p in store] == names and store.view(3).record_number == "4")
+        self.assertTrue([p.name for p in job_seeker.iter_records(self.poc_record_file, "poc", "")] == names)
+        # any change to the file or its log makes the snapshot stale
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(2, self.poc_record_file, 'poc')
+        self.assertTrue([p.name for p in job_seeker.load_store(self.poc_record_file, "poc")] ==
+                        ["Frank Green Zappa", "Shannon Docherty", "Jason Bourne"])
+        with open(self.poc_record_file + job_seeker.SNAPSHOT_SUFFIX, 'wb') as f:
+            f.write(b"torn")
+        self.assertTrue(len(job_seeker.load_store(self.poc_record_file, "poc")) == 3)
+
+    def test_index_read_by_seek(self):
+        job_seeker.load_index(self.poc_record_file, "poc")
+        index = job_seeker.open_index(self.poc_record_file)
+        self.assertTrue("data" not in index and index["lines"] == 4)
+        terms = job_seeker.read_region(index, "terms")
+        self.assertTrue(terms.startswith(b"\n") and b"\nkillian\n" in terms)
+        # record numbers are found through their own region, not as words
+        self.assertTrue(b"\n2\n" not in terms and job_seeker.read_region(index, "numbers") == b"\n1\n2\n3\n4\n")
+        number = job_seeker.word_number(terms, "killian")
+        self.assertTrue(list(job_seeker.postings_of(index, "term_postings", number)) == [1])
+        self.assertTrue(list(job_seeker.word_numbers(terms, "illia")) == [number])
+        self.assertTrue(job_seeker.term_candidates(index, {"zzqxj"}) == set())
+        self.assertTrue(list(job_seeker.word_numbers(job_seeker.read_region(index, "numbers"), "2")) == [1])
+        self.assertTrue([job_seeker.record_number_of(line) for line in
+                         job_seeker.search_index(self.poc_record_file, "poc", "2")] == [1, 2, 3, 4])
+
+    def test_index_finds_every_line(self):
+        with open(self.poc_record_file, 'a') as f:
+            f.write("2; Killian Again; Run Faster; 555; k2@run.com; 2023; 2023\n")
+            f.write("x; Killian Unnumbered; Run; 556; k3@run.com; 2023; 2023\n")
+        found = list(job_seeker.search_index(self.poc_record_file, "poc", "killian"))
+        self.assertTrue(len(found) == 3 and found[2].startswith("x; Killian Unnumbered"))
+        self.assertTrue(len(list(job_seeker.search_index(self.poc_record_file, "poc", "unnumbered"))) == 1)
+        self.assertTrue(len(job_seeker.parse_list(None, "poc", 2, "-r", filename=self.poc_record_file)) == 2)
+        self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", 2)[1].startswith("2; Killian Again"))
+        # the same once the index covers the new lines
+        os.remove(job_seeker.index_path(self.poc_record_file))
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "killian")) == found)
+        self.assertTrue(len(job_seeker.parse_list(None, "poc", 2, "-r", filename=self.poc_record_file)) == 2)
+        # either duplicate can be changed
+        self.assertTrue(job_seeker.open_engine(self.poc_record_file, "poc").update(found[0], found[0].replace("Run Fast", "Ranch")))
+        self.assertTrue(len(list(job_seeker.search_index(self.poc_record_file, "poc", "ranch"))) == 1)
+
+    def test_record_number_found_by_seek(self):
+        with open(self.poc_record_file, 'a') as f:
+            for number in range(5, 2001):
+                f.write("{}; Name {}; Co; 555; n@co.com; 2023; 2023\n".format(number, number))
+        job_seeker.load_index(self.poc_record_file, "poc")
+        index = job_seeker.open_index(self.poc_record_file)
+        keys  = job_seeker.read_region(index, "record_number.keys", "q")
+        for key in (0, 1, 2, 777, 2000, 2001):
+            for right in (False, True):
+                expected = (bisect.bisect_right if right else bisect.bisect_left)(keys, key)
+                self.assertTrue(job_seeker.bisect_region(index, "record_number.keys", key, right) == expected)
+        # a lookup reads a handful of keys, not the region
+        with patch('job_seeker.os.pread', wraps=os.pread) as pread, \
+             patch('job_seeker.read_region', wraps=job_seeker.read_region) as read_region:
+            self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", 777)[1].startswith("777; Name 777"))
+        self.assertTrue(0 < pread.call_count <= 24)
+        self.assertTrue(all(call.args[1] != "record_number.keys" for call in read_region.call_args_list))
+
+    def test_defaults_only_when_missing(self):
+        with patch('job_seeker.dt') as mock_dt:
+            j = job_seeker.Job(self.job_data_1)
+            p = job_seeker.POC(self.poc_data_1)
+            self.assertFalse(mock_dt.now.called)
+        self.assertTrue(j.first_contact == "20230201")
+        self.assertTrue(p.last_contact == "20230201")
+
+    def test_change_log_compaction(self):
+        with open(self.poc_record_file, 'a') as f:
+            f.write("# keep this comment\n5; Emma Peel; Avengers; 555-1965; emma@avengers.com; 1965; 1968\n")
+        with patch('builtins.input', side_effect=["", "", "", "steed@avengers.com", "", "", "y"]):
+            job_seeker.update_record('poc', 5, self.poc_record_file)
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(2, self.poc_record_file, 'poc')
+        self.assertTrue(os.path.exists(self.poc_record_file + job_seeker.LOG_SUFFIX))
+        before = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue(len(before) == 4)
+        self.assertTrue(before[-1] == "5; Emma Peel; Avengers; 555-1965; steed@avengers.com; 1965; 1968")
+
+        self.assertTrue(job_seeker.compact(self.poc_record_file))
+        self.assertFalse(os.path.exists(self.poc_record_file + job_seeker.LOG_SUFFIX))
+        self.assertFalse(job_seeker.compact(self.poc_record_file))
+        self.assertTrue(job_seeker.list_from_file(self.poc_record_file) == before)
+        with open(self.poc_record_file) as f:
+            self.assertTrue("# keep this comment\n" in f.readlines())
+        self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", 5)[1] == before[-1])
+
+    def test_compaction_threshold(self):
+        with patch('job_seeker.COMPACT_LOG_BYTES', 1):
+            with patch('builtins.input', side_effect=["y"]):
+                job_seeker.delete_record(2, self.poc_record_file, 'poc')
+        self.assertFalse(os.path.exists(self.poc_record_file + job_seeker.LOG_SUFFIX))
+        with open(self.poc_record_file) as f:
+            self.assertFalse("Killian" in f.read())
+
+    def test_torn_log_entry_is_skipped(self):
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(2, self.poc_record_file, 'poc')
+        with open(self.poc_record_file + job_seeker.LOG_SUFFIX, 'a') as f:
+            f.write("update; 0; 1234abcd; 1; Frank Zap")
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(3, self.poc_record_file, 'poc')
+        names = [p.name for p in job_seeker.parse_list(None, "poc", "", filename=self.poc_record_file)]
+        self.assertTrue(names == ["Frank Green Zappa", "Jason Bourne"])
+
+    def test_stale_log_is_ignored(self):
+        log = self.poc_record_file + job_seeker.LOG_SUFFIX
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(2, self.poc_record_file, 'poc')
+        with open(log) as f:
+            pending = f.read()
+        # a crash between replacing the data file and removing the log leaves it behind
+        self.assertTrue(job_seeker.compact(self.poc_record_file))
+        with open(log, 'w') as f:
+            f.write(pending)
+        names = [p.name for p in job_seeker.parse_list(None, "poc", "", filename=self.poc_record_file)]
+        self.assertTrue(names == ["Frank Green Zappa", "Shannon Docherty", "Jason Bourne"])
+        self.assertTrue(job_seeker.compact(self.poc_record_file))
+        self.assertTrue(len(job_seeker.list_from_file(self.poc_record_file)) == 3)
+        # a pending entry whose line was edited in place by another tool is skipped
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(3, self.poc_record_file, 'poc')
+        with open(self.poc_record_file, 'r+') as f:
+            text = f.read()
+            f.seek(0)
+            f.write(text.replace("Shannon", "Sharron"))
+        self.assertTrue(len(job_seeker.list_from_file(self.poc_record_file)) == 3)
+        # and a new change starts the log again
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(1, self.poc_record_file, 'poc')
+        self.assertTrue([p.name for p in job_seeker.parse_list(None, "poc", "", filename=self.poc_record_file)] ==
+                        ["Sharron Docherty", "Jason Bourne"])
+
+    def test_searches_apply_change_log(self):
+        with patch('builtins.input', side_effect=["Shannon Python", "", "", "", "", "", "y"]):
+            job_seeker.update_record('poc', 3, self.poc_record_file)
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(1, self.poc_record_file, 'poc')
+        _list = job_seeker.list_from_file(self.poc_record_file)
+        for search in ["python", "shannon", "2023", "zappa", "; 2"]:
+            expected = [str(p) for p in job_seeker.parse_list(_list, "poc", search)]
+            for use_index in [True, False]:
+                result = [str(p) for p in job_seeker.iter_records(self.poc_record_file, "poc", search, use_index=use_index)]
+                self.assertEqual(result, expected)
+
+    def test_append_lines_group_commit(self):
+        lines = ["0; Writer {}; Co; 555; w@co.com; 2023; 2023".format(i) for i in range(50)]
+        with patch.object(job_seeker.os, 'fsync') as mock_fsync:
+            written = job_seeker.append_lines(lines, self.poc_record_file, renumber_taken=True)
+        self.assertTrue(mock_fsync.call_count == 1)
+        self.assertTrue([job_seeker.record_number_of(line) for line in written] == list(range(5, 55)))
+        self.assertTrue(job_seeker.list_from_file(self.poc_record_file)[-1] == written[-1])
+
+    def test_commit_change_detects_lost_update(self):
+        old_line = "2; Killian; Run Fast; 8666544646; kill@run.com; 2023; 2023"
+        self.assertTrue(job_seeker.commit_change(self.poc_record_file, "poc", old_line, old_line.replace("Killian", "Kilian")))
+        self.assertFalse(job_seeker.commit_change(self.poc_record_file, "poc", old_line, None))
+        self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", 2)[1].startswith("2; Kilian;"))
+
+    def test_concurrent_writers(self):
+        workers     = 6
+        per_worker  = 20
+        code        = ("import sys, job_seeker\n"
+                       "for i in range({}):\n"
+                       "    job_seeker.append_lines(['0; w' + sys.argv[1] + ' ' + str(i) + '; Co; 555; w@co.com; 2023; 2023'],\n"
+                       "                            sys.argv[2], renumber_taken=True)\n"
+                       "job_seeker.commit_change(sys.argv[2], 'poc', sys.argv[3], sys.argv[3] + ' w' + sys.argv[1])\n"
+                       ).format(per_worker)
+        shared_line = "3; Shannon Docherty; JustInTime; 545488844; shannon@JIT.com; 2023; 2023"
+        env         = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        start       = time.monotonic()
+        procs       = [subprocess.Popen([sys.executable, "-c", code, str(w), self.poc_record_file, shared_line], env=env)
+                       for w in range(workers)]
+        for proc in procs:
+            self.assertTrue(proc.wait(timeout=60) == 0)
+        elapsed     = time.monotonic() - start
+
+        lines           = job_seeker.list_from_file(self.poc_record_file)
+        record_numbers  = [job_seeker.record_number_of(line) for line in lines]
+        self.assertTrue(len(lines) == 4 + workers * per_worker)
+        self.assertTrue(sorted(record_numbers) == list(range(1, 5 + workers * per_worker)),
+                        "duplicate record numbers after {:.0f} appends/s".format(workers * per_worker / elapsed))
+        # only one of the racing updates to record 3 may win
+        self.assertTrue(len([line for line in lines if line.startswith(shared_line + " w")]) == 1)
+
+    def test_import_csv(self):
+        csv_file = os.path.join(self.test_dir.name, "pocs.csv")
+        with open(csv_file, 'w') as f:
+            f.write("name,company,phone,email,first_contact,last_contact\n")
+            f.write("Ada Lovelace,Analytical,555-1815,ada@engine.org,20230101,20230301\n")
+            f.write('"Hopper, Grace",Navy,,grace@navy.mil,,20230302\n')
+        written, errors = job_seeker.import_records(csv_file, self.poc_record_file, "poc")
+        self.assertTrue(errors == [])
+        self.assertTrue(written[0] == "5; Ada Lovelace; Analytical; 555-1815; ada@engine.org; 20230101; 20230301")
+        hopper = job_seeker.builder(job_seeker.list_from_file(self.poc_record_file)[-1], "poc")
+        self.assertTrue(hopper.record_number == "6")
+        self.assertTrue(hopper.name == "Hopper, Grace")
+        self.assertTrue(hopper.phone == "Null")
+        self.assertTrue(hopper.first_contact == job_seeker.convert_date(dt.now()))
+
+    def test_import_jsonl(self):
+        jsonl_file = os.path.join(self.test_dir.name, "jobs.jsonl")
+        with open(jsonl_file, 'w') as f:
+            for i in range(3):
+                f.write('{"title": "Engineer %d", "company": "Helical", "active": "y", "last_contact": 20230401}\n' % i)
+        written, errors = job_seeker.import_records(jsonl_file, self.job_record_file, "job")
+        self.assertTrue(errors == [])
+        self.assertTrue([job_seeker.record_number_of(line) for line in written] == [7, 8, 9])
+        self.assertTrue(len(job_seeker.parse_list(None, "job", "helical", filename=self.job_record_file)) == 3)
+
+    def test_import_rejects_bad_rows(self):
+        jsonl_file = os.path.join(self.test_dir.name, "pocs.jsonl")
+        with open(jsonl_file, 'w') as f:
+            f.write('{"name": "Good Row", "first_contact": "20230101"}\n')
+            f.write('{"name": "Semi; Colon", "last_contact": "2023"}\n')
+            f.write('{"nickname": "Unknown"}\n')
+        with open(self.poc_record_file) as f:
+            original = f.read()
+        written, errors = job_seeker.import_records(jsonl_file, self.poc_record_file, "poc")
+        self.assertTrue(written == [])
+        self.assertTrue(len(errors) == 3)
+        self.assertTrue(errors[0].startswith("row 2: "))
+        self.assertTrue(errors[2] == "row 3: unknown field(s) nickname")
+        with open(self.poc_record_file) as f:
+            self.assertTrue(f.read() == original)
+
+    def test_import_rejects_malformed_rows(self):
+        jsonl_file = os.path.join(self.test_dir.name, "pocs.jsonl")
+        with open(jsonl_file, 'w') as f:
+            f.write('{"name": "Good Row"}\n')
+            f.write('{"name": "Torn\n')
+            f.write('["not", "an", "object"]\n')
+        written, errors = job_seeker.import_records(jsonl_file, self.poc_record_file, "poc")
+        self.assertTrue(written == [] and len(errors) == 2)
+        self.assertTrue(errors[0].startswith("row 2: not valid JSON"))
+        self.assertTrue(errors[1] == "row 3: not an object of field values")
+        csv_file = os.path.join(self.test_dir.name, "pocs.csv")
+        with open(csv_file, 'w') as f:
+            f.write("name,company\n")
+            f.write("Ada Lovelace,Analytical\n")
+            f.write("Grace Hopper,Navy,extra\n")
+        written, errors = job_seeker.import_records(csv_file, self.poc_record_file, "poc")
+        self.assertTrue(written == [] and errors == ["row 3: more columns than the header"])
+        self.assertTrue(len(job_seeker.list_from_file(self.poc_record_file)) == 4)
+
+    def test_next_record_number_cached(self):
+        self.assertTrue(job_seeker.get_next_record_number(self.poc_record_file) == 5)
+        self.assertTrue(os.path.exists(self.poc_record_file + job_seeker.META_SUFFIX))
+        with patch('job_seeker.scan_high_water', side_effect=AssertionError("rescanned")):
+            self.assertTrue(job_seeker.get_next_record_number(self.poc_record_file) == 5)
+            job_seeker.append_to_file(self.test_line_poc, self.poc_record_file)
+            self.assertTrue(job_seeker.get_next_record_number(self.poc_record_file) == 13)
+
+    def test_next_record_number_stale_or_corrupt(self):
+        job_seeker.get_next_record_number(self.poc_record_file)
+        with open(self.poc_record_file, 'a') as f:
+            f.write("\n#40; a comment\n20; Added; By hand; 555; hand@edit.com; 2023; 2023\n")
+        self.assertTrue(job_seeker.get_next_record_number(self.poc_record_file) == 21)
+        with open(self.poc_record_file + job_seeker.META_SUFFIX, 'w') as f:
+            f.write("{not json")
+        self.assertTrue(job_seeker.get_next_record_number(self.poc_record_file) == 21)
+
+    def test_compaction_keeps_high_water(self):
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(4, self.poc_record_file, 'poc')
+        job_seeker.compact(self.poc_record_file)
+        self.assertTrue(job_seeker.get_next_record_number(self.poc_record_file) == 5)
+
+    def test_byte_ranges_are_line_aligned(self):
+        with open(self.job_record_file, 'rb') as f:
+            data = f.read()
+        for count in (1, 2, 3, 7, 50):
+            ranges = job_seeker.byte_ranges(self.job_record_file, count)
+            self.assertTrue(ranges[0][0] == 0 and ranges[-1][1] == len(data))
+            for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+                self.assertTrue(end == next_start and data[start - 1:start] in (b"", b"\n"))
+
+    def test_parallel_scan_matches_serial(self):
+        with patch('builtins.input', side_effect=["y", "Sarge", "", "", "", "", "", "y"]):
+            job_seeker.delete_record(3, self.poc_record_file, 'poc')
+            job_seeker.update_record("poc", 4, self.poc_record_file)
+        for search in ("com", "sarge", "@", "zzz"):
+            serial      = list(job_seeker.scan_file(self.poc_record_file, search, workers=1))
+            parallel    = list(job_seeker.scan_file(self.poc_record_file, search, workers=2))
+            self.assertTrue(serial == parallel)
+        self.assertTrue(list(job_seeker.scan_file(self.poc_record_file, "a", workers=3)) ==
+                        job_seeker.list_from_file(self.poc_record_file))
+
+    def test_scan_workers_by_size(self):
+        self.assertTrue(job_seeker.scan_workers(1000) == 1)
+        with patch('job_seeker.usable_cpus', return_value=4):
+            self.assertTrue(job_seeker.scan_workers(job_seeker.PARALLEL_RANGE_BYTES * 2) == 2)
+            self.assertTrue(job_seeker.scan_workers(job_seeker.PARALLEL_RANGE_BYTES * 100) == 4)
+
+    def test_paged_search_scans_in_one_process(self):
+        data_dir = os.path.join(self.test_dir.name, "data")
+        os.mkdir(data_dir)
+        os.replace(self.job_record_file, os.path.join(data_dir, "jobs.txt"))
+        os.replace(self.poc_record_file, os.path.join(data_dir, "pocs.txt"))
+        # a process pool would fail, so a page must come from the serial scan
+        code    = ("import concurrent.futures, runpy, sys\n"
+                   "concurrent.futures.ProcessPoolExecutor = None\n"
+                   "sys.argv = ['job_seeker.py', '-p', '-s', 'a', '--workers', '2', '--limit', '1', '--no-server']\n"
+                   "runpy.run_path({!r}, run_name='__main__')\n").format(os.path.abspath(job_seeker.__file__))
+        result  = subprocess.run([sys.executable, "-c", code], cwd=self.test_dir.name,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        self.assertTrue(result.stdout.count(b"Person of Concerns") == 1, result.stderr)
+
+    def sqlite_pocs(self):
+        db_file = os.path.join(self.test_dir.name, "pocs" + job_seeker.SQLITE_SUFFIX)
+        self.assertTrue(job_seeker.migrate(self.poc_record_file, db_file, "poc") == 4)
+        return db_file
+
+    def test_sqlite_engine_matches_text(self):
+        db_file = self.sqlite_pocs()
+        self.assertTrue(job_seeker.list_from_file(db_file) == job_seeker.list_from_file(self.poc_record_file))
+        text    = job_seeker.open_engine(self.poc_record_file, "poc")
+        sqlite  = job_seeker.open_engine(db_file)
+        self.assertTrue(isinstance(sqlite, job_seeker.SqliteEngine))
+        for search in ("", "a", "JIT", "555-898", "jason@", "; 2023", "nobody"):
+            self.assertTrue(list(sqlite.search(search)) == list(text.search(search)), search)
+        self.assertTrue(sqlite.get(4) == text.get(4))
+        self.assertTrue(sqlite.get(9) is None and sqlite.get(True) is None)
+        records = job_seeker.parse_list([], "poc", "blackrock", filename=db_file)
+        self.assertTrue(len(records) == 1 and records[0].name == "Jason Bourne")
+
+    def test_sqlite_engine_changes(self):
+        db_file = self.sqlite_pocs()
+        engine  = job_seeker.open_engine(db_file)
+        old     = engine.get(2)
+        self.assertTrue(engine.update(old, old.replace("Killian", "Kilian")))
+        self.assertFalse(engine.delete(old))
+        self.assertTrue(list(engine.search("kilian")) == [old.replace("Killian", "Kilian")])
+        self.assertTrue(list(engine.search("killian")) == [])
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(4, db_file, 'poc')
+        self.assertTrue(engine.get(4) is None)
+        # deleted numbers are not handed out again
+        written = engine.insert(["4; Ada; Engine; 555; ada@engine.org; 2023; 2023"], renumber_taken=True)
+        self.assertTrue(written == ["5; Ada; Engine; 555; ada@engine.org; 2023; 2023"])
+        self.assertTrue(engine.next_record_number() == 6)
+
+    def test_migrate_back_to_text(self):
+        db_file     = self.sqlite_pocs()
+        text_file   = os.path.join(self.test_dir.name, "copy.txt")
+        self.assertTrue(job_seeker.migrate(db_file, text_file, "poc") == 4)
+        self.assertTrue(job_seeker.list_from_file(text_file) == job_seeker.list_from_file(self.poc_record_file))
+        self.assertTrue(job_seeker.migrate(db_file, text_file, "poc") is None)
+        self.assertTrue(job_seeker.migrate(self.poc_record_file, db_file, "poc") is None)
+
+    def query_lines(self, filename, _list_type, query):
+        fields = JOB_FIELDS if _list_type == "job" else POC_FIELDS
+        return list(job_seeker.query_index(filename, _list_type, job_seeker.parse_query(query, fields)))
+
+    def test_parse_query(self):
+        clauses = job_seeker.parse_query("company='Run Fast' active=YES last_contact>=20230401 bourne", JOB_FIELDS)
+        self.assertTrue(clauses == [("company", "=", "run fast"), ("active", "=", "y"),
+                                    ("last_contact", ">=", 20230401), (None, "~", "bourne")])
+        for bad in ("colour=red", "title>=x", "last_contact<2023", "first_contact=soon", "name='open"):
+            with self.assertRaises(ValueError):
+                job_seeker.parse_query(bad, JOB_FIELDS)
+
+    def test_query_index(self):
+        self.assertTrue(self.query_lines(self.job_record_file, "job", "first_contact<=20230321") ==
+                        ["6; Mister-Programmer-guy; Yes; Just the business; DolphinExperience; DE.com; Haley; 20230321; 20230321"])
+        self.assertTrue(self.query_lines(self.job_record_file, "job", "first_contact<20230321") == [])
+        self.assertTrue(len(self.query_lines(self.job_record_file, "job", "active=y")) == 4)
+        self.assertTrue(len(self.query_lines(self.job_record_file, "job", "active=no")) == 0)
+        self.assertTrue(len(self.query_lines(self.job_record_file, "job", "company=happy")) == 0)
+        self.assertTrue(len(self.query_lines(self.job_record_file, "job", "company='happy cow dev ltd' python")) == 1)
+        self.assertTrue([job_seeker.record_number_of(line) for line in
+                         self.query_lines(self.poc_record_file, "poc", "record_number>1 record_number<=3")] == [2, 3])
+        self.assertTrue(len(self.query_lines(self.poc_record_file, "poc", "record_number!=2 email!=x")) == 3)
+
+    def test_query_index_follows_changes(self):
+        self.assertTrue(len(self.query_lines(self.poc_record_file, "poc", "last_contact=20220118")) == 1)
+        with patch('builtins.input', side_effect=["", "Helical", "", "", "", "20230501", "y"]):
+            job_seeker.update_record("poc", 4, self.poc_record_file)
+        self.assertTrue(self.query_lines(self.poc_record_file, "poc", "last_contact=20220118") == [])
+        updated = self.query_lines(self.poc_record_file, "poc", "company=helical last_contact>20230430")
+        self.assertTrue(len(updated) == 1 and updated[0].startswith("4; Jason Bourne; Helical"))
+        # the index answers the same once it is built from the compacted file
+        job_seeker.compact(self.poc_record_file)
+        self.assertTrue(self.query_lines(self.poc_record_file, "poc", "company=helical last_contact>20230430") == updated)
+
+    def test_sqlite_query_matches_text(self):
+        db_file = self.sqlite_pocs()
+        for query in ("company=blackrock", "last_contact>=20220101 record_number>2", "record_number<3 zappa",
+                      "first_contact=2023", "name!=killian com"):
+            try:
+                clauses = job_seeker.parse_query(query, POC_FIELDS)
+            except ValueError:
+                continue
+            self.assertTrue(list(job_seeker.open_engine(db_file).query(clauses)) ==
+                            list(job_seeker.query_index(self.poc_record_file, "poc", clauses)), query)
+        records = list(job_seeker.query_records(db_file, "poc", "company=Blackrock"))
+        self.assertTrue(len(records) == 1 and records[0].name == "Jason Bourne")
+
+    def test_trigrams(self):
+        self.assertTrue(job_seeker.trigrams("hary") == {"  h", " ha", "har", "ary", "ry "})
+        trigram_index = job_seeker.build_trigrams(["hary", "harrison", "styles", "hary"])
+        similar = dict(job_seeker.similar_words(trigram_index, "harry"))
+        self.assertTrue(set(similar) == {"hary", "harrison"} and similar["hary"] > similar["harrison"])
+        self.assertTrue(list(job_seeker.similar_words(trigram_index, "zappa")) == [])
+
+    def test_fuzzy_index(self):
+        job_seeker.append_to_file("5; Hary Styles; Just Drink It; 055-68854-4456; Hary@JDI.com; 2023; 2021",
+                                  self.poc_record_file)
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "harry")) == [])
+        found = job_seeker.fuzzy_index(self.poc_record_file, "poc", "harry")
+        self.assertTrue([job_seeker.record_number_of(line) for _, line in found] == [5])
+        self.assertTrue(os.path.exists(self.poc_record_file + job_seeker.FUZZY_SUFFIX))
+        found = job_seeker.fuzzy_index(self.poc_record_file, "poc", "jasen bourne")
+        self.assertTrue(found[0][1] == self.poc_line_4 and found[0][0] > 0.5)
+        # a change to the data makes the trigram index follow the search index
+        job_seeker.append_to_file("6; Harriet Vane; Shrewsbury; 555; h@vane.org; 2023; 2023", self.poc_record_file)
+        found = job_seeker.fuzzy_index(self.poc_record_file, "poc", "harry")
+        self.assertTrue(sorted(job_seeker.record_number_of(line) for _, line in found) == [5, 6])
+        self.assertTrue(job_seeker.record_number_of(found[0][1]) == 5)
+
+    def test_sqlite_fuzzy_matches_text(self):
+        db_file = self.sqlite_pocs()
+        for search in ("jasen burne", "shanon", "musik federashun", "killain", "nobody"):
+            self.assertTrue(job_seeker.open_engine(db_file).fuzzy(search) ==
+                            job_seeker.fuzzy_index(self.poc_record_file, "poc", search), search)
+        records = list(job_seeker.fuzzy_records(db_file, "poc", "shanon doherty"))
+        self.assertTrue(len(records) == 1 and records[0][1].name == "Shannon Docherty")
+
+    def test_tail_follower(self):
+        follower = job_seeker.TailFollower(self.poc_record_file, "poc")
+        job_seeker.load_index(self.poc_record_file, "poc")
+        reloaded, changes = follower.poll()
+        self.assertTrue(reloaded and list(changes) == [1, 2, 3, 4])
+        self.assertTrue(follower.poll() == (False, {}))
+        # another tool appends, the last line only half written
+        with open(self.poc_record_file, 'a') as f:
+            f.write("5; Hary Styles; Just Drink It; 055; hary@jdi.com; 2023; 2021\n6; Ada")
+        self.assertTrue(follower.poll() == (False, {5: "5; Hary Styles; Just Drink It; 055; hary@jdi.com; 2023; 2021"}))
+        with open(self.poc_record_file, 'a') as f:
+            f.write(" Lovelace; Engine; 1; ada@engine.org; 2023; 2023\n")
+        self.assertTrue(follower.poll() == (False, {6: "6; Ada Lovelace; Engine; 1; ada@engine.org; 2023; 2023"}))
+        with open(self.poc_record_file, 'a') as f:
+            f.write("7; Charles Babbage; Engine; 2; cb@engine.org; 2023; 2023\n")
+        follower.poll()
+        job_seeker.open_engine(self.poc_record_file).delete(self.poc_line_4)
+        self.assertTrue(follower.poll() == (False, {4: None}))
+        job_seeker.compact(self.poc_record_file)
+        reloaded, changes = follower.poll()
+        self.assertTrue(reloaded and list(changes) == [1, 2, 3, 5, 6, 7])
+        # rewritten in place at the same size, far from the end
+        job_seeker.append_lines(["{}; Person{}; Co; 555; p@co.com; 2023; 2023".format(number, number)
+                                 for number in range(100, 500)], self.poc_record_file)
+        follower.poll()
+        with open(self.poc_record_file, 'r+') as f:
+            data = f.read()
+            f.seek(0)
+            f.write(data.replace("Killian", "Kellian"))
+        stat = os.stat(self.poc_record_file)
+        os.utime(self.poc_record_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded, changes = follower.poll()
+        self.assertTrue(reloaded and changes[2].startswith("2; Kellian;"))
+
+    def test_watch_prints_new_matches(self):
+        db_file     = self.sqlite_pocs()
+        sections    = [("poc", "poc", job_seeker.TailFollower(self.poc_record_file, "poc"), lambda line: "engine" in line.lower()),
+                       ("db", "poc", job_seeker.open_engine(db_file).follow(), lambda line: "engine" in line.lower())]
+        line        = "5; Ada Lovelace; Engine; 1; ada@engine.org; 2023; 2023"
+
+        def add(seconds):
+            job_seeker.append_to_file(line, self.poc_record_file)
+            job_seeker.append_to_file(line, db_file)
+
+        with patch('sys.stdout', new_callable=io.StringIO) as output, patch('job_seeker.time.sleep', side_effect=add):
+            job_seeker.watch(sections, polls=3)
+        self.assertTrue(output.getvalue().count("name: Ada Lovelace") == 2)
+        self.assertTrue("poc record_number: 5" in output.getvalue() and "db record_number: 5" in output.getvalue())
+
+    def test_export_round_trips_through_import(self):
+        lines = [self.poc_line_4, "7; Ada Lovelace; Engine, \"Analytical\"; 555; ada@engine.org; 20230101; 20230102"]
+        for export_format, suffix in (("csv", ".csv"), ("jsonl", ".jsonl")):
+            path = os.path.join(self.test_dir.name, "export" + suffix)
+            self.assertTrue(job_seeker.export_records(iter(lines), "poc", export_format, path) == 2)
+            copy = os.path.join(self.test_dir.name, "copy" + suffix + ".txt")
+            with open(copy, 'w') as f:
+                f.write("")
+            written, errors = job_seeker.import_records(path, copy, "poc")
+            self.assertTrue(errors == [] and written == [job_seeker.renumber(line, rn) for rn, line in enumerate(lines, 1)],
+                            export_format)
+
+    def test_export_gzip_chunks_and_filters(self):
+        import gzip
+        path    = os.path.join(self.test_dir.name, "jobs.jsonl.gz")
+        lines   = job_seeker.open_engine(self.job_record_file, "job").search("python")
+        with patch('job_seeker.EXPORT_CHUNK', 100):
+            self.assertTrue(job_seeker.export_records(lines, "job", "jsonl", path, compress=True) == 3)
+        with gzip.open(path, 'rt', encoding="utf-8") as f:
+            records = [json.loads(text) for text in f]
+        self.assertTrue([record["record_number"] for record in records] == ["2", "3", "5"])
+        self.assertTrue(records[-1]["company"] == "Happy Cow Dev Ltd" and set(records[0]) == set(JOB_FIELDS))
+        # a chunk is written whenever the buffer passes EXPORT_CHUNK
+        stream = io.BytesIO()
+        with patch('job_seeker.EXPORT_CHUNK', 100), patch.object(stream, 'write', wraps=stream.write) as write:
+            job_seeker.export_lines(job_seeker.list_from_file(self.job_record_file), JOB_FIELDS, "csv", stream)
+        self.assertTrue(write.call_count == 4 and stream.getvalue().startswith(b"record_number,title,active"))
+
+    def test_parse_ranges(self):
+        ranges = job_seeker.parse_ranges("9-200, 3,5,4, 150-250")
+        self.assertTrue(ranges == [(3, 5), (9, 250)])
+        self.assertTrue(job_seeker.format_ranges(ranges) == "3-5,9-250")
+        self.assertTrue([job_seeker.in_ranges(ranges, rn) for rn in (2, 3, 6, 9, 250, 251)] ==
+                        [False, True, False, True, True, False])
+        for bad in ("", "3,,5", "5-3", "x", "3-"):
+            with self.assertRaises(ValueError):
+                job_seeker.parse_ranges(bad)
+
+    def test_batch_change(self):
+        job_seeker.load_index(self.poc_record_file, "poc")
+        job_seeker.open_engine(self.poc_record_file).update(self.poc_line_4, self.poc_line_4.replace("Blackrock", "Helical"))
+        with patch('builtins.input', side_effect=["y"]), patch('sys.stdout', new_callable=io.StringIO):
+            job_seeker.batch_change("poc", job_seeker.parse_ranges("2-4,9"), self.poc_record_file,
+                                    job_seeker.parse_assignments(["company=Closed Ltd", "last_contact=20230601"], POC_FIELDS))
+        lines = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue(lines[1] == "2; Killian; Closed Ltd; 8666544646; kill@run.com; 2023; 20230601")
+        self.assertTrue(lines[3].startswith("4; Jason Bourne; Closed Ltd") and lines[0].startswith("1; Frank Green Zappa; United"))
+        # one rewrite folded the change log in as well
+        self.assertFalse(os.path.exists(self.poc_record_file + job_seeker.LOG_SUFFIX))
+        with patch('builtins.input', side_effect=["y"]), patch('sys.stdout', new_callable=io.StringIO):
+            job_seeker.batch_change("poc", [(1, 2)], self.poc_record_file)
+        self.assertTrue([job_seeker.record_number_of(line) for line in job_seeker.list_from_file(self.poc_record_file)] == [3, 4])
+        # the rewritten file has a new index
+        self.assertTrue(job_seeker.open_index(self.poc_record_file) is None)
+        self.assertTrue(self.query_lines(self.poc_record_file, "poc", "company='closed ltd' last_contact=20230601") ==
+                        job_seeker.list_from_file(self.poc_record_file))
+        with self.assertRaises(ValueError):
+            job_seeker.parse_assignments(["record_number=7"], POC_FIELDS)
+
+    def test_change_many_leaves_lost_updates(self):
+        db_file = self.sqlite_pocs()
+        for filename in (self.poc_record_file, db_file):
+            engine  = job_seeker.open_engine(filename, "poc")
+            lines   = list(engine.select([(2, 3)]))
+            self.assertTrue([job_seeker.record_number_of(line) for line in lines] == [2, 3], filename)
+            engine.update(lines[0], lines[0].replace("Killian", "Kilian"))
+            left_alone = engine.change_many([(line, None) for line in lines])
+            self.assertTrue(left_alone == [2] and engine.get(3) is None and engine.get(2) is not None, filename)
+
+    def test_sqlite_select_uses_index(self):
+        db_file = self.sqlite_pocs()
+        text    = job_seeker.open_engine(self.poc_record_file, "poc")
+        sqlite  = job_seeker.open_engine(db_file)
+        for ranges in ([], [(1, 1), (3, 9)], [(2, 2), (4, 4)]):
+            self.assertTrue(list(sqlite.select(ranges)) == list(text.select(ranges)), ranges)
+            with patch.object(job_seeker, "SQLITE_MAX_RANGES", 1):
+                self.assertTrue(list(sqlite.select(ranges)) == list(text.select(ranges)), ranges)
+        with sqlite.connect() as conn:
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM records WHERE record_number BETWEEN 1 AND 1 "
+                                "OR record_number BETWEEN 3 AND 9 ORDER BY id").fetchall()
+        self.assertTrue(any("records_record_number" in str(row) for row in plan), plan)
+
+    def test_batch_change_shared_record_number(self):
+        db_file = self.sqlite_pocs()
+        for filename in (self.poc_record_file, db_file):
+            engine = job_seeker.open_engine(filename, "poc")
+            engine.insert(["3; Sam Docherty; JustInTime; 555; sam@jit.com; 2023; 2023"])
+            with patch('builtins.input', side_effect=["y"]), patch('sys.stdout', new_callable=io.StringIO) as out:
+                job_seeker.batch_change("poc", [(2, 3)], filename, job_seeker.parse_assignments(["company=Acme"], POC_FIELDS))
+            self.assertTrue("3 poc(s) updated" in out.getvalue() and "left alone" not in out.getvalue(), filename)
+            threes = [line for line in job_seeker.list_from_file(filename) if job_seeker.record_number_of(line) == 3]
+            self.assertTrue(len(threes) == 2 and all("; Acme; " in line for line in threes), filename)
+
+    def test_duplicate_groups(self):
+        lines = ["1; Jason Minstrel; Pancake House; 555-886-9889; Jason.Minstrel@HOP.com; 20230321; 20230416",
+                 "2; Val; Jones; 555466654; val@thehunt.com; 20230315; 20230320",
+                 "3; J. Minstrel; Elsewhere; (555) 886 9889; jm@else.com; 20230101; 20230102",
+                 "4; Someone; Else; 123; jm@ELSE.com ; 20220101; 20230601",
+                 "5; Jason  minstrel; pancake house; Null; Null; 2023; 2023",
+                 "6; Jason Minstrel; Other Place; Null; Null; 2023; 2023"]
+        groups = job_seeker.duplicate_groups(iter(lines), POC_FIELDS)
+        # 3 shares a phone with 1, 4 an email with 3 and 5 a name and company with 1
+        self.assertTrue(groups == [[lines[0], lines[2], lines[3], lines[4]]])
+        self.assertTrue(job_seeker.merge_contacts(groups[0], POC_FIELDS) ==
+                        "1; Jason Minstrel; Pancake House; 555-886-9889; Jason.Minstrel@HOP.com; 20220101; 20230601")
+        self.assertTrue(job_seeker.merge_contacts(["7; Null; Run Fast; 2023; 2023", "8; Ada; x; 555; a@b.c; 2023; 20230101"],
+                                                  POC_FIELDS) == "7; Ada; Run Fast; 2023; 2023; 2023; 20230101")
+        # dates typed another way are compared as dates and kept as typed
+        self.assertTrue(job_seeker.merge_contacts(["1; Ada; x; 555; a@b.c; 2023-05-01; 2023-06", "2; Ada; x; 555; a@b.c; 20230201; 20230515"],
+                                                  POC_FIELDS) == "1; Ada; x; 555; a@b.c; 20230201; 2023-06")
+
+    def test_dedupe_contacts(self):
+        job_seeker.append_to_file("5; kIllian; run fast; 866-654-4646; KILL@run.com; 20220101; 20230701", self.poc_record_file)
+        job_seeker.append_to_file("6; Shannon Docherty; JustInTime; Null; Null; 20221231; 20230101", self.poc_record_file)
+        with patch('builtins.input', side_effect=["n"]), patch('sys.stdout', new_callable=io.StringIO) as output:
+            job_seeker.dedupe_contacts(self.poc_record_file)
+        self.assertTrue("Merge cancelled" in output.getvalue() and len(job_seeker.list_from_file(self.poc_record_file)) == 6)
+        with patch('builtins.input', side_effect=["y"]), patch('sys.stdout', new_callable=io.StringIO):
+            job_seeker.dedupe_contacts(self.poc_record_file)
+        lines = job_seeker.list_from_file(self.poc_record_file)
+        self.assertTrue([job_seeker.record_number_of(line) for line in lines] == [1, 2, 3, 4])
+        self.assertTrue(lines[1] == "2; Killian; Run Fast; 8666544646; kill@run.com; 20220101; 20230701")
+        self.assertTrue(lines[2] == "3; Shannon Docherty; JustInTime; 545488844; shannon@JIT.com; 20221231; 20230101")
+        with patch('sys.stdout', new_callable=io.StringIO) as output:
+            job_seeker.dedupe_contacts(self.poc_record_file)
+        self.assertTrue("No duplicate contacts found" in output.getvalue())
+
+    def test_archive_jobs(self):
+        recent = job_seeker.convert_date(job_seeker.dt.now())
+        with open(self.job_record_file, 'w') as f:
+            f.write("2; Automation Engineer; Yes; Excel, Python; sprint; sprint.com; Ulysees; 20230101; 20230301\n")
+            f.write("3; Junior Developer; Yes; Python, Docker; localcompany; local.com; James; 20230101; 20230302\n")
+            f.write("5; Lead Dev; Yes; Python; Happy Cow Dev Ltd; HCDL; Julian; 20230101; 20230303\n")
+            f.write("6; Programmer; Yes; Business; DolphinExperience; DE.com; Haley; {}; 20230101\n".format(recent))
+            f.write("7; Old Hand; no; cobol; Mainframes Inc; mf.com; Grace; 20200101; 20190101\n")
+            f.write("8; Retired; Yes; fortran; Punch Cards; pc.com; Ada; 20200102; 20190101\n")
+        archived, segment = job_seeker.archive_jobs(self.job_record_file)
+        self.assertTrue(archived == 1 and segment == self.job_record_file + ".archive.000001.gz")
+        archived, segment = job_seeker.archive_jobs(self.job_record_file, days=365)
+        self.assertTrue(archived == 4 and segment.endswith(".archive.000002.gz"))
+        self.assertTrue(job_seeker.archive_jobs(self.job_record_file, days=365) == (0, None))
+        self.assertTrue(job_seeker.archive_segments(self.job_record_file) == [self.job_record_file + ".archive.000001.gz", segment])
+        # only the recent active job is left in the hot file
+        self.assertTrue([job_seeker.record_number_of(line) for line in job_seeker.list_from_file(self.job_record_file)] == [6])
+        self.assertTrue([job_seeker.record_number_of(line) for line in job_seeker.archive_lines(self.job_record_file)] ==
+                        [7, 2, 3, 5, 8])
+        # deleted numbers stay taken
+        self.assertTrue(job_seeker.get_next_record_number(self.job_record_file) == 9)
+        # even once the .meta cache is gone, or stale after an outside append
+        os.remove(job_seeker.meta_path(self.job_record_file))
+        self.assertTrue(job_seeker.get_next_record_number(self.job_record_file) == 9)
+        with open(self.job_record_file, 'a') as f:
+            f.write("4; Tester; Yes; QA; Acme; acme.com; Bob; 20230101; 20230101\n")
+        self.assertTrue(job_seeker.get_next_record_number(self.job_record_file) == 9)
+
+    def test_only_no_is_inactive(self):
+        with open(self.job_record_file, 'w') as f:
+            f.write("2; Automation Engineer; Null; Python; sprint; sprint.com; Ulysees; 20230101; 20230301\n")
+            f.write("3; Junior Developer; maybe; Python; localcompany; local.com; James; 20230101; 20230302\n")
+            f.write("5; Lead Dev;  No ; Python; Happy Cow Dev Ltd; HCDL; Julian; 20230101; 20230303\n")
+            f.write("6; Programmer; n; Business; DolphinExperience; DE.com; Haley; 20230101; 20230304\n")
+        lines = job_seeker.list_from_file(self.job_record_file)
+        self.assertTrue([job_seeker.follow_up_date(line, JOB_FIELDS) for line in lines] == [20230101, 20230101, None, None])
+        self.assertTrue(job_seeker.count_records(lines, JOB_FIELDS)["active"] == {"y": 2, "n": 2})
+        self.assertTrue(job_seeker.archive_jobs(self.job_record_file)[0] == 2)
+        self.assertTrue([job_seeker.record_number_of(line) for line in job_seeker.list_from_file(self.job_record_file)] == [2, 3])
+
+    def test_include_archive(self):
+        with open(self.job_record_file, 'w') as f:
+            f.write("2; Automation Engineer; Yes; Excel, Python; sprint; sprint.com; Ulysees; 20230101; 20230301\n")
+            f.write("3; Junior Developer; Yes; Python, Docker; localcompany; local.com; James; 20230101; 20230302\n")
+            f.write("5; Lead Dev; Yes; Python; Happy Cow Dev Ltd; HCDL; Julian; 20230101; 20230303\n")
+            f.write("6; Programmer; Yes; Business; DolphinExperience; DE.com; Haley; 20230101; 20230304\n")
+            f.write("7; Old Hand; no; python, cobol; Mainframes Inc; mf.com; Grace; 20200101; 20190101\n")
+        job_seeker.archive_jobs(self.job_record_file)
+        hot = [job.record_number for job in job_seeker.iter_records(self.job_record_file, "job", "python")]
+        self.assertTrue(hot == ["2", "3", "5"])
+        found = [job.record_number for job in job_seeker.iter_records(self.job_record_file, "job", "python", include_archive=True)]
+        self.assertTrue(found == ["2", "3", "5", "7"])
+        self.assertTrue(len(list(job_seeker.iter_records(self.job_record_file, "job", "", include_archive=True))) == 5)
+        found = list(job_seeker.iter_records(self.job_record_file, "job", 7, "record_number", include_archive=True))
+        self.assertTrue(len(found) == 1 and found[0].company == "Mainframes Inc")
+        found = list(job_seeker.query_records(self.job_record_file, "job", "active=n", include_archive=True))
+        self.assertTrue([job.record_number for job in found] == ["7"])
+        self.assertTrue(list(job_seeker.query_records(self.job_record_file, "job", "active=n")) == [])
+
+    def test_normalise_date(self):
+        self.assertTrue(job_seeker.normalise_date("20230314") == 20230314)
+        self.assertTrue(job_seeker.normalise_date(" 2023-3-5 ") == 20230305)
+        self.assertTrue(job_seeker.normalise_date("202302") == 20230201)
+        self.assertTrue(job_seeker.normalise_date("2023") == 20230101)
+        self.assertTrue(job_seeker.normalise_date("20230230") is None)
+        self.assertTrue(job_seeker.normalise_date("soon") is None)
+        self.assertTrue(job_seeker.normalise_date(None) is None)
+
+    def test_due_follow_ups(self):
+        with open(self.job_record_file, 'w') as f:
+            f.write("2; Automation Engineer; Yes; Python; sprint; sprint.com; Ulysees; 20221201; 20221101\n")
+            f.write("3; Junior Developer; no; Python; localcompany; local.com; James; 20200101; 20200101\n")
+            f.write("5; Lead Dev; Yes; Python; Happy Cow Dev Ltd; HCDL; Julian; 20231230; 20231201\n")
+            f.write("6; Programmer; Yes; Business; DolphinExperience; DE.com; Haley; someday; 2023-06\n")
+        sections    = [("Job", "job", self.job_record_file), ("Person of Concern", "poc", self.poc_record_file)]
+        today       = job_seeker.dt(2024, 1, 1)
+        follow_ups  = job_seeker.due_follow_ups(sections, 14, 4, today)
+        # the inactive job is never due, the job with a bad last_contact counts from its first
+        self.assertTrue([(overdue, label, record.record_number) for overdue, label, record in follow_ups] ==
+                        [(699, "Person of Concern", "4"), (382, "Job", "2"), (351, "Person of Concern", "1"),
+                         (351, "Person of Concern", "2")])
+        self.assertTrue(len(job_seeker.due_follow_ups(sections, 14, 10, today)) == 6)
+        self.assertTrue(job_seeker.due_follow_ups(sections, 1000, 10, today) == [])
+        self.assertTrue(os.path.exists(self.poc_record_file + job_seeker.DUE_SUFFIX))
+
+    def test_due_queue_patched_by_update_and_delete(self):
+        sections    = [("Person of Concern", "poc", self.poc_record_file)]
+        today       = job_seeker.dt(2024, 1, 1)
+        self.assertTrue(job_seeker.due_follow_ups(sections, 14, 1, today)[0][2].record_number == "4")
+        with patch('builtins.input', side_effect=["", "", "", "", "", "20231225", "y"]):
+            job_seeker.update_record('poc', 4, self.poc_record_file)
+        # patched in place, still current for the file as it is now
+        queue = job_seeker.read_due_queue(self.poc_record_file, job_seeker.data_signature(self.poc_record_file))
+        self.assertTrue(queue is not None and queue["dates"][4] == 20231225)
+        self.assertTrue([record.record_number for _, _, record in job_seeker.due_follow_ups(sections, 14, 10, today)] ==
+                        ["1", "2", "3"])
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(1, self.poc_record_file, 'poc')
+        queue = job_seeker.read_due_queue(self.poc_record_file, job_seeker.data_signature(self.poc_record_file))
+        self.assertTrue(queue is not None and 1 not in queue["dates"])
+        self.assertTrue([record.record_number for _, _, record in job_seeker.due_follow_ups(sections, 14, 10, today)] ==
+                        ["2", "3"])
+
+    def test_count_records(self):
+        stats = job_seeker.count_records(job_seeker.list_from_file(self.poc_record_file), job_seeker.POC_FIELDS)
+        self.assertTrue(stats["records"] == 4 and stats["active"] == {})
+        self.assertTrue(stats["months"] == {202301: 3, 200703: 1})
+        self.assertTrue(stats["companies"]["Blackrock"] == 1 and len(stats["companies"]) == 4)
+        # "2023" counts as the first of January, so only Jason Bourne's contacts are apart
+        self.assertTrue(stats["gaps"] == 4 and stats["gap_days"] == 5433)
+
+    def test_stats_patched_by_add_update_delete(self):
+        job_seeker.load_stats(self.poc_record_file, "poc")
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.insert_new_item("5; Ada; Blackrock; 1; ada@br.com; 20230105; 20230110", self.poc_record_file, "poc")
+        with patch('builtins.input', side_effect=["", "Run Fast", "", "", "", "", "y"]):
+            job_seeker.update_record('poc', 4, self.poc_record_file)
+        with patch('builtins.input', side_effect=["y"]):
+            job_seeker.delete_record(1, self.poc_record_file, 'poc')
+        stats = job_seeker.read_stats(self.poc_record_file, job_seeker.data_signature(self.poc_record_file))
+        self.assertTrue(stats is not None and stats["records"] == 4)
+        self.assertTrue(stats["companies"] == {"Blackrock": 1, "Run Fast": 2, "JustInTime": 1})
+        self.assertTrue(stats["months"] == {202301: 3, 200703: 1} and stats["gap_days"] == 5438)
+        # compaction changes no records, so the statistics stay current
+        self.assertTrue(job_seeker.compact(self.poc_record_file))
+        self.assertTrue(job_seeker.read_stats(self.poc_record_file, job_seeker.data_signature(self.poc_record_file)) is not None)
+        self.assertTrue(job_seeker.check_stats(self.poc_record_file, "poc") == ("checked", []))
+
+    def test_summaries_patched_by_batch_writes(self):
+        job_seeker.load_stats(self.poc_record_file, "poc")
+        job_seeker.load_due_queue(self.poc_record_file, "poc")
+        current = lambda: (job_seeker.read_stats(self.poc_record_file, job_seeker.data_signature(self.poc_record_file)),
+                           job_seeker.read_due_queue(self.poc_record_file, job_seeker.data_signature(self.poc_record_file)))
+        engine  = job_seeker.open_engine(self.poc_record_file, "poc")
+        lines   = engine.load()
+        engine.change_many([(lines[0], None), (lines[1], lines[1].replace("Run Fast", "Ranch"))])
+        jsonl_file = os.path.join(self.test_dir.name, "pocs.jsonl")
+        with open(jsonl_file, 'w') as f:
+            f.write('{"name": "Ada", "company": "Engine", "first_contact": "20230105", "last_contact": "20230110"}\n')
+        self.assertTrue(len(job_seeker.import_records(jsonl_file, self.poc_record_file, "poc")[0]) == 1)
+        stats, queue = current()
+        self.assertTrue(stats is not None and queue is not None)
+        self.assertTrue(stats["records"] == 4 and stats["companies"]["Ranch"] == 1 and stats["companies"]["Engine"] == 1)
+        self.assertTrue(1 not in queue["dates"] and queue["dates"][5] == 20230110)
+        self.assertTrue(job_seeker.check_stats(self.poc_record_file, "poc") == ("checked", []))
+
+    def test_check_stats_reports_drift(self):
+        self.assertTrue(job_seeker.check_stats(self.poc_record_file, "poc") == ("missing", []))
+        signature   = job_seeker.data_signature(self.poc_record_file)
+        stats       = job_seeker.read_stats(self.poc_record_file, signature)
+        stats["companies"]["Run Fast"] = 3
+        del stats["months"][200703]
+        job_seeker.save_cache(job_seeker.stats_path(self.poc_record_file), stats, signature)
+        self.assertTrue(job_seeker.check_stats(self.poc_record_file, "poc") ==
+                        ("checked", ["companies 'Run Fast': saved 3, counted 1", "months 200703: saved 0, counted 1"]))
+        self.assertTrue(job_seeker.check_stats(self.poc_record_file, "poc") == ("checked", []))
+        # a change made some other way is counted again when next read
+        with open(self.poc_record_file, 'a') as f:
+            f.write("9; Nine; Nine Inc; 9; nine@nine.com; 20240101; 20240201\n")
+        self.assertTrue(job_seeker.check_stats(self.poc_record_file, "poc") == ("stale", []))
+        self.assertTrue(job_seeker.load_stats(self.poc_record_file, "poc")["records"] == 5)
+
+    def test_summaries_rebuilt_under_lock(self):
+        engine = job_seeker.open_engine(self.poc_record_file, "poc")
+        for load, rebuild in ((job_seeker.load_stats, "count_records"), (job_seeker.load_due_queue, "build_due_queue")):
+            writer  = threading.Thread(target=engine.insert,
+                                       args=(["{}; Late; Late Inc; 1; late@late.com; 20240101; 20240101".format(
+                                           engine.next_record_number())],))
+            real    = getattr(job_seeker, rebuild)
+            held    = []
+
+            def racing_rebuild(lines, fields):
+                # a write started while the file is being read waits for the rebuild
+                writer.start()
+                writer.join(0.5)
+                held.append(writer.is_alive())
+                return real(lines, fields)
+
+            with patch.object(job_seeker, rebuild, racing_rebuild):
+                load(self.poc_record_file, "poc")
+            writer.join()
+            self.assertTrue(held == [True], rebuild)
+        records = len(job_seeker.list_from_file(self.poc_record_file))
+        self.assertTrue(job_seeker.load_stats(self.poc_record_file, "poc")["records"] == records == 6)
+        self.assertTrue(len(job_seeker.load_due_queue(self.poc_record_file, "poc")["dates"]) == records)
+
+    def test_change_log_leaves_index_alone(self):
+        job_seeker.load_index(self.poc_record_file, "poc")
+        with open(job_seeker.index_path(self.poc_record_file), 'rb') as f:
+            saved = f.read()
+        offset, line    = job_seeker.find_record(self.poc_record_file, "poc", 4)
+        new_line        = line.replace("Jason Bourne", "Harry Potter")
+        self.assertTrue(job_seeker.commit_change(self.poc_record_file, "poc", line, new_line))
+        with open(job_seeker.index_path(self.poc_record_file), 'rb') as f:
+            self.assertTrue(f.read() == saved)
+        self.assertTrue(job_seeker.read_log(self.poc_record_file) == {offset: (4, new_line)})
+        self.assertTrue(job_seeker.find_record(self.poc_record_file, "poc", 4) == (offset, new_line))
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "potter")) == [new_line])
+        self.assertTrue(list(job_seeker.search_index(self.poc_record_file, "poc", "bourne")) == [])
+        self.assertTrue(list(job_seeker.select_index(self.poc_record_file, "poc", [(4, 4)])) == [new_line])
+        self.assertTrue(job_seeker.fuzzy_index(self.poc_record_file, "poc", "hary poter")[0][1] == new_line)
+
+    def test_find_contact(self):
+        pocs    = job_seeker.parse_list(["1; Martin  Freeman; Elsewhere; 111; m@else.com; 2023; 20230101",
+                                         "2; martin freeman; Company Number 7; 222; m@c7.com; 2023; 20220101",
+                                         "3; Martin Freeman; Elsewhere; 333; m@late.com; 2023; 20230301",
+                                         "4; Null; Nobody; 444; n@n.com; 2023; 2023",
+                                         "5; Martin Freeman; Elsewhere; 555; m@dash.com; 2023; 2023-04-01",
+                                         "6; Martin Freeman; Elsewhere; 666; m@soon.com; 2023; soon"], "poc", "")
+        table   = job_seeker.contact_table(pocs)
+        self.assertTrue(job_seeker.normalise_name("  Martin\tFREEMAN ") == "martin freeman")
+        self.assertTrue(job_seeker.find_contact(table, "Martin Freeman", "company number 7").phone == "222")
+        # dates are compared as dates, whichever way they were typed, and a last_contact that isn't one comes first
+        self.assertTrue(job_seeker.find_contact(table, "MARTIN FREEMAN", "Somewhere").phone == "555")
+        self.assertTrue(job_seeker.find_contact(table, "Martin Freeman", "Elsewhere").phone == "555")
+        self.assertTrue(job_seeker.find_contact(table, "Null", "Nobody") is None)
+        self.assertTrue(job_seeker.find_contact(table, "Haley", "DE") is None)
+
+    def test_join_contacts(self):
+        job_seeker.append_lines(["5; Julian Bishop; Happy Cow Dev Ltd; 555-0100; julian@hcdl.com; 2023; 2023"],
+                                self.poc_record_file)
+        pocs        = job_seeker.iter_records(self.poc_record_file, "poc", "")
+        table       = job_seeker.contact_table(pocs)
+        unmatched   = []
+        joined      = list(job_seeker.join_contacts(job_seeker.iter_records(self.job_record_file, "job", ""),
+                                                    table, unmatched))
+        self.assertTrue(len(joined) == 4)
+        self.assertTrue("poc_name: Julian Bishop" in joined[2] and
+                        joined[2].endswith("phone: 555-0100\nemail: julian@hcdl.com"))
+        self.assertTrue(unmatched == ["2", "3", "6"])
+        self.assertTrue(joined[0].endswith("contact: no match for Ulysees"))
+
+    def test_data_server(self):
+        server  = job_seeker.DataServer({"job": self.job_record_file, "poc": self.poc_record_file}, "text")
+        ask     = lambda **message: json.loads(server.respond(json.dumps(dict(message, engine="text")).encode()))
+        self.assertTrue(ask(op="search", type="poc", arg="")["lines"] == job_seeker.list_from_file(self.poc_record_file))
+        self.assertTrue(ask(op="search", type="poc", arg="a", stop=2)["lines"] ==
+                        job_seeker.list_from_file(self.poc_record_file)[:2])
+        self.assertTrue(ask(op="get", type="poc", arg=4)["lines"] == [self.poc_line_4])
+        self.assertTrue(ask(op="query", type="poc", arg="record_number>=3 company!=blackrock")["lines"][0].startswith("3;"))
+        self.assertFalse(ask(op="query", type="poc", arg="colour=red")["ok"])
+        self.assertFalse(ask(op="get", type="nothing", arg=1)["ok"])
+        self.assertFalse(json.loads(server.respond(b'{"op": "get", "type": "poc", "arg": 1, "engine": "sqlite"}'))["ok"])
+        self.assertFalse(json.loads(server.respond(b"not json"))["ok"])
+
+        # changes made by anyone else are picked up
+        job_seeker.append_lines(["5; Ada; Engine; 555; ada@engine.org; 2023; 2023"], self.poc_record_file)
+        self.assertTrue(ask(op="search", type="poc", arg="ada")["lines"] == ["5; Ada; Engine; 555; ada@engine.org; 2023; 2023"])
+        added = ask(op="add", type="poc", record={"name": "Grace", "company": "Navy", "first_contact": "20230101"})
+        self.assertTrue(added["lines"][0].startswith("6; Grace; Navy; Null; Null; 20230101; "))
+        self.assertFalse(ask(op="add", type="poc", record={"name": "Semi;colon"})["ok"])
+        self.assertTrue(ask(op="update", type="poc", record_number=6, record={"phone": "555-1906"})["ok"])
+        self.assertTrue(ask(op="get", type="poc", arg=6)["lines"][0].startswith("6; Grace; Navy; 555-1906;"))
+        # only the fields sent are checked, record 2's "2023" dates are left as they are
+        self.assertTrue(ask(op="update", type="poc", record_number=2, record={"phone": "555"})["lines"] ==
+                        ["2; Killian; Run Fast; 555; kill@run.com; 2023; 2023"])
+        self.assertFalse(ask(op="update", type="poc", record_number=2, record={"last_contact": "2023"})["ok"])
+        self.assertFalse(ask(op="update", type="poc", record_number=2, record=["phone"])["ok"])
+        self.assertTrue(ask(op="delete", type="poc", record_number=6)["ok"])
+        self.assertFalse(ask(op="delete", type="poc", record_number=6)["ok"])
+        self.assertTrue(ask(op="get", type="poc", arg=6)["lines"] == [])
+
+    def test_serve_and_forward(self):
+        data_dir = os.path.join(self.test_dir.name, "data")
+        os.mkdir(data_dir)
+        os.replace(self.job_record_file, os.path.join(data_dir, "jobs.txt"))
+        os.replace(self.poc_record_file, os.path.join(data_dir, "pocs.txt"))
+        script      = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_seeker.py")
+        socket_path = os.path.join(data_dir, job_seeker.SERVER_SOCKET)
+        run         = lambda *argv: subprocess.run([sys.executable, script] + list(argv), cwd=self.test_dir.name,
+                                                   stdout=subprocess.PIPE, timeout=60).stdout
+        local       = run("-s", "jason", "--no-server")
+        server      = subprocess.Popen([sys.executable, script, "--serve"], cwd=self.test_dir.name, stdout=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 30
+            while job_seeker.server_request(socket_path, [{"op": "ping"}]) is None:
+                self.assertTrue(server.poll() is None and time.monotonic() < deadline)
+                time.sleep(0.05)
+            job_seeker.server_request(socket_path, [{"op": "add", "type": "poc", "record": {"name": "Jason Isaacs"}}])
+            self.assertTrue(run("-s", "jason").startswith(local))
+            self.assertTrue(b"Jason Isaacs" in run("-s", "jason"))
+            self.assertTrue(run("-r", "5") == run("-r", "5", "--no-server"))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_profiler_counts_phases(self):
+        profiler    = job_seeker.Profiler()
+        originals   = job_seeker.install_profiler(profiler)
+        try:
+            with patch('sys.stdout', new_callable=io.StringIO):
+                records = job_seeker.iter_records(self.poc_record_file, "poc", "", use_index=False)
+                job_seeker.print_records(job_seeker.labelled("poc", records))
+        finally:
+            job_seeker.remove_profiler(originals)
+        self.assertTrue(job_seeker.read_lines is originals["read_lines"])
+        summary = profiler.summary()
+        self.assertTrue(summary["counters"]["lines_read"] == 4)
+        # scan_file falls back to filter_lines, each line still counts once
+        self.assertTrue(summary["counters"]["lines_matched"] == 4)
+        self.assertTrue(summary["counters"]["objects_built"] == 4)
+        self.assertTrue(summary["phases"]["split"]["calls"] == 4)
+        self.assertTrue(set(summary["phases"]) == {"read", "split", "build", "filter", "print"})
+
+    def test_profiler_counts_index_and_scan_reads(self):
+        engine = job_seeker.open_engine(self.poc_record_file, "poc")
+        for read in (lambda: engine.search("killian"), lambda: engine.search("killian", use_index=False),
+                     lambda: engine.query([("record_number", ">=", 3)]), lambda: engine.select([(2, 3)])):
+            profiler    = job_seeker.Profiler()
+            originals   = job_seeker.install_profiler(profiler)
+            try:
+                found = list(read())
+            finally:
+                job_seeker.remove_profiler(originals)
+            counters = profiler.summary()["counters"]
+            self.assertTrue(counters["lines_read"] >= len(found) > 0 and counters["lines_matched"] == len(found))
+
+    def test_profiler_times_are_exclusive(self):
+        profiler = job_seeker.Profiler()
+        with profiler.phase("outer"):
+            time.sleep(0.02)
+            with profiler.phase("inner"):
+                time.sleep(0.05)
+        self.assertTrue(profiler.seconds["inner"] >= 0.05)
+        self.assertTrue(0.02 <= profiler.seconds["outer"] < 0.05)
+
+    def test_profile_json_from_environment(self):
+        data_dir = os.path.join(self.test_dir.name, "data")
+        os.mkdir(data_dir)
+        os.replace(self.job_record_file, os.path.join(data_dir, "jobs.txt"))
+        os.replace(self.poc_record_file, os.path.join(data_dir, "pocs.txt"))
+        script  = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_seeker.py")
+        env     = dict(os.environ, JOB_SEEKER_PROFILE="json")
+        result  = subprocess.run([sys.executable, script, "-p", "-s", "blackrock"], cwd=self.test_dir.name,
+                                 env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        summary = json.loads(result.stderr.decode())
+        self.assertTrue(b"Jason Bourne" in result.stdout)
+        self.assertTrue(summary["counters"]["objects_built"] == 1)
+        self.assertTrue(summary["counters"]["bytes_written"] == len(result.stdout))
     
     
 if __name__ == '__main__':